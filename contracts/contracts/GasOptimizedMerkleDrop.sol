@@ -0,0 +1,156 @@
+/* Please read and review the Terms and Conditions governing this
+   Merkle Drop by visiting the Trustlines Foundation homepage. Any
+   interaction with this smart contract, including but not limited to
+   claiming Trustlines Network Tokens, is subject to these Terms and
+   Conditions.
+ */
+
+pragma solidity ^0.5.8;
+
+import "./ERC20Interface.sol";
+
+
+// The MerkleDrop with cheaper withdrawals. The proofs are read from calldata instead
+// of being copied to memory, and the leaf and parent hashes are computed in the
+// scratch space instead of in memory allocated by abi.encode. It verifies the same
+// leaves and roots as MerkleDrop and the python merkle-drop package.
+
+contract GasOptimizedMerkleDrop {
+
+    bytes32 public root;
+    ERC20Interface public droppedToken;
+    uint public decayStartTime;
+    uint public decayDurationInSeconds;
+
+    uint public initialBalance;
+    uint public remainingValue;  // The total of not withdrawn entitlements, not considering decay
+    uint public spentTokens;  // The total tokens spent by the contract, burnt or withdrawn
+
+    mapping (address => bool) public withdrawn;
+
+    event Withdraw(address recipient, uint value, uint originalValue);
+    event Burn(uint value);
+
+    constructor(ERC20Interface _droppedToken, uint _initialBalance, bytes32 _root, uint _decayStartTime, uint _decayDurationInSeconds) public {
+        // The _initialBalance should be equal to the sum of airdropped tokens
+        droppedToken = _droppedToken;
+        initialBalance = _initialBalance;
+        remainingValue = _initialBalance;
+        root = _root;
+        decayStartTime = _decayStartTime;
+        decayDurationInSeconds = _decayDurationInSeconds;
+    }
+
+    function withdraw(uint value, bytes32[] calldata proof) external {
+        // Internal functions cannot take calldata arrays before Solidity 0.6,
+        // so the proof is verified here like in verifyEntitled
+        bytes32 currentHash = leafHash(msg.sender, value);
+        for (uint i = 0; i < proof.length; i += 1) {
+            currentHash = parentHash(currentHash, proof[i]);
+        }
+        require(currentHash == root, "The proof could not be verified.");
+        require(! withdrawn[msg.sender], "You have already withdrawn your entitled token.");
+
+        burnUnusableTokens();
+
+        uint valueToSend = decayedEntitlementAtTime(value, now, false);
+        assert(valueToSend <= value);
+        require(droppedToken.balanceOf(address(this)) >= valueToSend, "The MerkleDrop does not have tokens to drop yet / anymore.");
+        require(valueToSend != 0, "The decayed entitled value is now zero.");
+
+        withdrawn[msg.sender] = true;
+        remainingValue -= value;
+        spentTokens += valueToSend;
+
+        require(droppedToken.transfer(msg.sender, valueToSend));
+        emit Withdraw(msg.sender, valueToSend, value);
+    }
+
+    function verifyEntitled(address recipient, uint value, bytes32[] calldata proof) external view returns (bool) {
+        bytes32 currentHash = leafHash(recipient, value);
+        for (uint i = 0; i < proof.length; i += 1) {
+            currentHash = parentHash(currentHash, proof[i]);
+        }
+        return currentHash == root;
+    }
+
+    function decayedEntitlementAtTime(uint value, uint time, bool roundUp) public view returns (uint) {
+        if (time <= decayStartTime) {
+            return value;
+        } else if (time >= decayStartTime + decayDurationInSeconds) {
+            return 0;
+        } else {
+            uint timeDecayed = time - decayStartTime;
+            uint valueDecay = decay(value, timeDecayed, decayDurationInSeconds, !roundUp);
+            assert(valueDecay <= value);
+            return value - valueDecay;
+        }
+    }
+
+    function burnUnusableTokens() public {
+        if (now <= decayStartTime) {
+            return;
+        }
+
+        // The amount of tokens that should be held within the contract after burning
+        uint targetBalance = decayedEntitlementAtTime(remainingValue, now, true);
+
+        // toBurn = (initial balance - target balance) - what we already removed from initial balance
+        uint currentBalance = initialBalance - spentTokens;
+        assert(targetBalance <= currentBalance);
+        uint toBurn = currentBalance - targetBalance;
+
+        spentTokens += toBurn;
+        burn(toBurn);
+    }
+
+    function deleteContract() public {
+        require(now >= decayStartTime + decayDurationInSeconds, "The storage cannot be deleted before the end of the merkle drop.");
+        burnUnusableTokens();
+
+        selfdestruct(address(0));
+    }
+
+    function leafHash(address recipient, uint value) internal pure returns (bytes32 hash) {
+        // The same as keccak256(abi.encodePacked(recipient, value)): the address is stored
+        // right aligned in the first word, so its 20 bytes are directly followed by the value
+        // solium-disable-next-line security/no-inline-assembly
+        assembly {
+            mstore(0x00, and(recipient, 0xffffffffffffffffffffffffffffffffffffffff))
+            mstore(0x20, value)
+            hash := keccak256(0x0c, 0x34)
+        }
+    }
+
+    function parentHash(bytes32 a, bytes32 b) internal pure returns (bytes32 hash) {
+        // The same as keccak256(abi.encode(a, b)) with the smaller hash first
+        if (a > b) {
+            (a, b) = (b, a);
+        }
+        // solium-disable-next-line security/no-inline-assembly
+        assembly {
+            mstore(0x00, a)
+            mstore(0x20, b)
+            hash := keccak256(0x00, 0x40)
+        }
+    }
+
+    function burn(uint value) internal {
+        if (value == 0) {
+            return;
+        }
+        emit Burn(value);
+        droppedToken.burn(value);
+    }
+
+    function decay(uint value, uint timeToDecay, uint totalDecayTime, bool roundUp) internal pure returns (uint) {
+        uint decay;
+
+        if (roundUp) {
+            decay = (value*timeToDecay+totalDecayTime-1)/totalDecayTime;
+        } else {
+            decay = value*timeToDecay/totalDecayTime;
+        }
+        return decay >= value ? value : decay;
+    }
+}
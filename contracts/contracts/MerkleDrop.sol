@@ -23,6 +23,11 @@ contract MerkleDrop {
 
     mapping (address => bool) public withdrawn;
 
+    // The steps of a multiproof, see verifyMultiProof
+    uint8 constant HASH_WITH_PROOF = 0;
+    uint8 constant HASH_WITH_NODE = 1;
+    uint8 constant PROMOTE = 2;
+
     event Withdraw(address recipient, uint value, uint originalValue);
     event Burn(uint value);
 
@@ -62,6 +67,18 @@ contract MerkleDrop {
         return verifyProof(leaf, proof);
     }
 
+    function verifyMultiProof(address[] memory recipients, uint[] memory values, bytes32[] memory proof, bytes memory proofFlags) public view returns (bool) {
+        // The recipients have to be in the order of the leaves, sorted by address and value,
+        // with the proof and flags made with the python merkle-drop package
+        require(recipients.length == values.length, "The numbers of recipients and values differ.");
+
+        bytes32[] memory nodes = new bytes32[](recipients.length + proofFlags.length);
+        for (uint i = 0; i < recipients.length; i += 1) {
+            nodes[i] = keccak256(abi.encodePacked(recipients[i], values[i]));
+        }
+        return verifyMultiProofOfLeaves(nodes, recipients.length, proof, proofFlags);
+    }
+
     function decayedEntitlementAtTime(uint value, uint time, bool roundUp) public view returns (uint) {
         if (time <= decayStartTime) {
             return value;
@@ -109,6 +126,47 @@ contract MerkleDrop {
         return currentHash == root;
     }
 
+    function verifyMultiProofOfLeaves(bytes32[] memory nodes, uint numberOfLeaves, bytes32[] memory proof, bytes memory proofFlags) internal view returns (bool) {
+        // The nodes start with the leaves and are used as a queue. Every flag takes the next node
+        // and hashes it with the next hash of the proof or with the node after it, or promotes it
+        // unchanged, and appends the result. So the nodes are processed level by level.
+        if (numberOfLeaves == 0) {
+            return false;
+        }
+
+        uint nodePosition = 0;
+        uint proofPosition = 0;
+        for (uint i = 0; i < proofFlags.length; i += 1) {
+            uint numberOfNodes = numberOfLeaves + i;
+            if (nodePosition == numberOfNodes) {
+                return false;
+            }
+            bytes32 currentHash = nodes[nodePosition];
+            nodePosition += 1;
+
+            uint8 flag = uint8(proofFlags[i]);
+            if (flag == HASH_WITH_PROOF) {
+                if (proofPosition == proof.length) {
+                    return false;
+                }
+                currentHash = parentHash(currentHash, proof[proofPosition]);
+                proofPosition += 1;
+            } else if (flag == HASH_WITH_NODE) {
+                if (nodePosition == numberOfNodes) {
+                    return false;
+                }
+                currentHash = parentHash(currentHash, nodes[nodePosition]);
+                nodePosition += 1;
+            } else if (flag != PROMOTE) {
+                return false;
+            }
+            nodes[numberOfNodes] = currentHash;
+        }
+
+        // Every node but the root and every hash of the proof have to be used
+        return nodePosition == nodes.length - 1 && proofPosition == proof.length && nodes[nodes.length - 1] == root;
+    }
+
     function parentHash(bytes32 a, bytes32 b) internal pure returns (bytes32) {
         if (a < b) {
             return keccak256(abi.encode(a, b));
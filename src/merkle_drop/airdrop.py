@@ -1,8 +1,76 @@
-from typing import Dict, List
+from typing import Iterator, List, Mapping, Optional, Tuple
 
-from .merkle_tree import Item
+from .hashing import ADDRESS_LENGTH, HASH_LENGTH, VALUE_LENGTH, hash_leaves
+from .merkle_tree import (
+    FlatTree,
+    Item,
+    bisect_packed,
+    build_packed_tree,
+    compute_root_from_leaf_hashes,
+    update_tree,
+)
 
-AirdropData = Dict[bytes, int]
+
+class AirdropData(Mapping[bytes, int]):
+    """Read only mapping of canonical addresses to values
+
+    The entries are kept in two packed buffers instead of a dict:
+    `packed_addresses` holds the sorted 20 byte addresses and `packed_values`
+    the corresponding values as 32 byte big endian integers, e.g. as memory
+    mapped from a snapshot file. Addresses are looked up by bisection.
+    """
+
+    def __init__(self, packed_addresses: bytes, packed_values: bytes):
+        if (
+            len(packed_addresses) // ADDRESS_LENGTH
+            != len(packed_values) // VALUE_LENGTH
+        ):
+            raise ValueError("Number of addresses and values differ")
+        self.packed_addresses = packed_addresses
+        self.packed_values = packed_values
+
+    @classmethod
+    def from_mapping(cls, airdrop_data: Mapping[bytes, int]) -> "AirdropData":
+        addresses = sorted(airdrop_data)
+        if any(len(address) != ADDRESS_LENGTH for address in addresses):
+            raise ValueError("Address must be a canonical address")
+
+        try:
+            packed_values = b"".join(
+                airdrop_data[address].to_bytes(VALUE_LENGTH, "big")
+                for address in addresses
+            )
+        except OverflowError as e:
+            raise ValueError("value is negative or too large") from e
+
+        return cls(b"".join(addresses), packed_values)
+
+    def __getitem__(self, address: bytes) -> int:
+        index = bisect_packed(self.packed_addresses, ADDRESS_LENGTH, address)
+        if index == len(self) or self._get_address(index) != address:
+            raise KeyError(address)
+        return self._get_value(index)
+
+    def __iter__(self) -> Iterator[bytes]:
+        return (self._get_address(index) for index in range(len(self)))
+
+    def __len__(self) -> int:
+        return len(self.packed_addresses) // ADDRESS_LENGTH
+
+    def iter_items(self) -> Iterator[Item]:
+        """iterate over the entries in address order without any lookups"""
+        return (
+            Item(self._get_address(index), self._get_value(index))
+            for index in range(len(self))
+        )
+
+    def _get_address(self, index: int) -> bytes:
+        offset = index * ADDRESS_LENGTH
+        return bytes(self.packed_addresses[offset : offset + ADDRESS_LENGTH])
+
+    def _get_value(self, index: int) -> int:
+        offset = index * VALUE_LENGTH
+        return int.from_bytes(self.packed_values[offset : offset + VALUE_LENGTH], "big")
 
 
 def get_item(address: bytes, airdrop_data: AirdropData) -> Item:
@@ -10,8 +78,92 @@ def get_item(address: bytes, airdrop_data: AirdropData) -> Item:
 
 
 def to_items(airdrop_data: AirdropData) -> List[Item]:
-    return [Item(address, value) for address, value in airdrop_data.items()]
+    return list(airdrop_data.iter_items())
 
 
 def get_balance(address: bytes, airdrop_data: AirdropData) -> int:
     return airdrop_data.get(address, 0)
+
+
+def build_airdrop_tree(airdrop_data: AirdropData, workers: int = 1) -> FlatTree:
+    """build the merkle tree directly from the packed, already sorted entries"""
+    return build_packed_tree(
+        airdrop_data.packed_addresses, airdrop_data.packed_values, workers
+    )
+
+
+def compute_airdrop_root(airdrop_data: AirdropData) -> bytes:
+    """compute the merkle root without building the tree"""
+    return compute_root_from_leaf_hashes(iter_leaf_hashes(airdrop_data))
+
+
+def iter_leaf_hashes(
+    airdrop_data: AirdropData, batch_size: int = 65536
+) -> Iterator[bytes]:
+    """hash the leaves in batches of `batch_size` entries in address order"""
+    for start in range(0, len(airdrop_data), batch_size):
+        end = start + batch_size
+        leaf_hashes = hash_leaves(
+            airdrop_data.packed_addresses[
+                start * ADDRESS_LENGTH : end * ADDRESS_LENGTH
+            ],
+            airdrop_data.packed_values[start * VALUE_LENGTH : end * VALUE_LENGTH],
+        )
+        for offset in range(0, len(leaf_hashes), HASH_LENGTH):
+            yield leaf_hashes[offset : offset + HASH_LENGTH]
+
+
+def update_airdrop_data(
+    airdrop_data: AirdropData, changes: Mapping[bytes, Optional[int]]
+) -> AirdropData:
+    """apply changes as for `update_tree`, copying unchanged entries in bulk"""
+    address_parts = []
+    value_parts = []
+    old_index = 0
+
+    for address in sorted(changes):
+        index = bisect_packed(airdrop_data.packed_addresses, ADDRESS_LENGTH, address)
+        exists = (
+            index < len(airdrop_data) and airdrop_data._get_address(index) == address
+        )
+
+        address_parts.append(
+            airdrop_data.packed_addresses[
+                old_index * ADDRESS_LENGTH : index * ADDRESS_LENGTH
+            ]
+        )
+        value_parts.append(
+            airdrop_data.packed_values[old_index * VALUE_LENGTH : index * VALUE_LENGTH]
+        )
+        old_index = index + 1 if exists else index
+
+        value = changes[address]
+        if value is None:
+            if not exists:
+                raise ValueError("Can not remove missing address")
+        else:
+            if len(address) != ADDRESS_LENGTH:
+                raise ValueError("Address must be a canonical address")
+            try:
+                value_parts.append(value.to_bytes(VALUE_LENGTH, "big"))
+            except OverflowError as e:
+                raise ValueError("value is negative or too large") from e
+            address_parts.append(address)
+
+    address_parts.append(airdrop_data.packed_addresses[old_index * ADDRESS_LENGTH :])
+    value_parts.append(airdrop_data.packed_values[old_index * VALUE_LENGTH :])
+
+    return AirdropData(b"".join(address_parts), b"".join(value_parts))
+
+
+def update_airdrop(
+    airdrop_data: AirdropData,
+    tree: FlatTree,
+    changes: Mapping[bytes, Optional[int]],
+) -> Tuple[AirdropData, FlatTree]:
+    """update the airdrop data together with its tree"""
+    updated_tree = update_tree(tree, changes)
+    updated_airdrop_data = update_airdrop_data(airdrop_data, changes)
+    # Share the address buffer as for a newly built tree
+    updated_airdrop_data.packed_addresses = updated_tree.addresses
+    return updated_airdrop_data, updated_tree
@@ -0,0 +1,218 @@
+"""ASGI application serving the entitlement API of merkle_drop.server
+
+It serves the same `/entitlement/<address>` and `/entitlements` endpoints
+with the same JSON responses as the Flask application, but without blocking a worker per
+connection, e.g. with `uvicorn merkle_drop.asgi:app` or under gunicorn with
+`--worker-class uvicorn.workers.UvicornWorker`.
+
+It shares the state of merkle_drop.server, so it is initialized the same
+way, with `merkle_drop.server.init` or `merkle_drop.server.init_from_snapshot`.
+It also serves the same metrics on `/metrics`, see merkle_drop.metrics.
+"""
+import logging
+import time
+from typing import Any, Awaitable, Callable, List, MutableMapping, Optional, Tuple
+
+from merkle_drop import metrics, server
+from merkle_drop.entitlement import (
+    MAX_REQUEST_SIZE_PER_ADDRESS,
+    InvalidAddressError,
+    InvalidBatchError,
+    encode_json,
+    get_encoded_entitlement,
+    iter_encoded_entitlements,
+    parse_batch,
+)
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+
+ENTITLEMENT_PATH = "/entitlement/"
+BATCH_PATH = "/entitlements"
+
+# The size of the parts of a streamed response
+STREAM_CHUNK_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+cors_origins: List[str] = []
+
+
+def init_cors(origins="*"):
+    """enable CORS for the given origin or list of origins, like init_cors
+    of merkle_drop.server with the default arguments of flask-cors"""
+    global cors_origins
+    cors_origins = [origins] if isinstance(origins, str) else list(origins)
+
+
+async def app(scope: Scope, receive: Receive, send: Send) -> None:
+    if scope["type"] == "lifespan":
+        await _handle_lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        raise ValueError(f"Unsupported ASGI scope type {scope['type']}")
+
+    start_time = time.perf_counter()
+    content_type = b"application/json"
+    # The endpoints are named like the ones of the Flask application
+    if scope["path"] == BATCH_PATH:
+        endpoint = "get_entitlements_for"
+        if scope["method"] != "POST":
+            status, body = _error(405, "Method not allowed")
+        else:
+            status = await _handle_batch_request(scope, receive, send)
+            metrics.observe_request(endpoint, status, start_time)
+            return
+    elif scope["path"] == metrics.METRICS_PATH and metrics.available:
+        endpoint = "get_metrics"
+        if scope["method"] not in ("GET", "HEAD"):
+            status, body = _error(405, "Method not allowed")
+        else:
+            status = 200
+            body, metrics_content_type = metrics.generate_metrics()
+            content_type = metrics_content_type.encode("latin-1")
+    else:
+        if scope["path"].startswith(ENTITLEMENT_PATH):
+            endpoint = "get_entitlement_for"
+        else:
+            endpoint = "unknown"
+        status, body = _handle_request(scope["method"], scope["path"])
+
+    await _send_response(scope, send, status, body, content_type)
+    metrics.observe_request(endpoint, status, start_time)
+
+
+async def _send_response(
+    scope: Scope,
+    send: Send,
+    status: int,
+    body: bytes,
+    content_type: bytes = b"application/json",
+) -> None:
+    await _send_response_start(scope, send, status, body, content_type)
+    await send(
+        {
+            "type": "http.response.body",
+            "body": b"" if scope["method"] == "HEAD" else body,
+        }
+    )
+
+
+async def _send_response_start(
+    scope: Scope,
+    send: Send,
+    status: int,
+    body: Optional[bytes] = None,
+    content_type: bytes = b"application/json",
+) -> None:
+    headers = [(b"content-type", content_type), *_cors_headers(scope)]
+    if body is not None:
+        headers.append((b"content-length", str(len(body)).encode()))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+
+
+def _handle_request(method: str, path: str) -> Tuple[int, bytes]:
+    address = path[len(ENTITLEMENT_PATH) :]
+    if not path.startswith(ENTITLEMENT_PATH) or not address or "/" in address:
+        return _error(404, "Not found")
+    if method not in ("GET", "HEAD"):
+        return _error(405, "Method not allowed")
+
+    state = server.state
+    start_time = time.perf_counter()
+    try:
+        assert state is not None, "The server is not initialized"
+        encoded_entitlement = get_encoded_entitlement(state, address, int(time.time()))
+    except InvalidAddressError as e:
+        return _error(400, str(e))
+    except Exception:
+        logger.exception(f"Exception on {method} {path}")
+        return _error(500, "There was an internal server error")
+
+    metrics.observe_proof(start_time)
+    metrics.observe_cache(state.entitlement_cache)
+    return 200, encoded_entitlement
+
+
+async def _handle_batch_request(scope: Scope, receive: Receive, send: Send) -> int:
+    # Use the same state for the whole response
+    state = server.state
+    max_batch_size = server.max_batch_size
+    body = await _read_body(receive, max_batch_size * MAX_REQUEST_SIZE_PER_ADDRESS)
+
+    try:
+        addresses = parse_batch(body, max_batch_size)
+    except (InvalidAddressError, InvalidBatchError) as e:
+        await _send_response(scope, send, *_error(400, str(e)))
+        return 400
+
+    if state is None:
+        logger.error("The server is not initialized")
+        await _send_response(
+            scope, send, *_error(500, "There was an internal server error")
+        )
+        return 500
+
+    await _send_response_start(scope, send, 200)
+    chunk: List[bytes] = []
+    chunk_size = 0
+    for part in iter_encoded_entitlements(
+        state, addresses, int(time.time()), metrics.observe_proof
+    ):
+        chunk.append(part)
+        chunk_size += len(part)
+        if chunk_size >= STREAM_CHUNK_SIZE:
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": b"".join(chunk),
+                    "more_body": True,
+                }
+            )
+            chunk = []
+            chunk_size = 0
+    metrics.observe_cache(state.entitlement_cache)
+    await send({"type": "http.response.body", "body": b"".join(chunk)})
+    return 200
+
+
+async def _read_body(receive: Receive, max_size: int) -> bytes:
+    """read the request body, but at most one byte more than `max_size`"""
+    body = bytearray()
+    more_body = True
+    while more_body and len(body) <= max_size:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return bytes(body[: max_size + 1])
+
+
+def _error(status: int, message: str) -> Tuple[int, bytes]:
+    return status, encode_json({"error": status, "message": message}) + b"\n"
+
+
+def _cors_headers(scope: Scope) -> List[Tuple[bytes, bytes]]:
+    if not cors_origins:
+        return []
+    if "*" in cors_origins:
+        return [(b"access-control-allow-origin", b"*")]
+
+    origin = dict(scope["headers"]).get(b"origin", b"").decode("latin-1")
+    if origin in cors_origins:
+        return [
+            (b"access-control-allow-origin", origin.encode("latin-1")),
+            (b"vary", b"Origin"),
+        ]
+    return []
+
+
+async def _handle_lifespan(receive: Receive, send: Send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
@@ -0,0 +1,103 @@
+import hashlib
+import os
+import tempfile
+from typing import Optional, Tuple
+
+from .airdrop import AirdropData, build_airdrop_tree
+from .load_csv import load_airdrop_file
+from .merkle_tree import FlatTree
+from .snapshot import load_snapshot, write_snapshot
+
+DEFAULT_MAX_CACHE_SIZE = 2 * 1024 ** 3
+
+CACHE_FILE_SUFFIX = ".snapshot"
+
+
+def get_default_cache_directory() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "merkle-drop")
+
+
+def hash_file(file_name: str) -> str:
+    file_hash = hashlib.sha256()
+    with open(file_name, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+class BuildCache:
+    """On disk cache of parsed airdrop files and their merkle trees
+
+    Entries are snapshots named after the sha256 hash of the airdrop file
+    content. The least recently used entries are deleted when the total
+    size of the cache exceeds `max_size` bytes.
+    """
+
+    def __init__(
+        self, directory: Optional[str] = None, max_size: int = DEFAULT_MAX_CACHE_SIZE
+    ):
+        if directory is None:
+            directory = get_default_cache_directory()
+        self.directory = directory
+        self.max_size = max_size
+
+    def load(
+        self, airdrop_file_name: str, workers: int = 1
+    ) -> Tuple[AirdropData, FlatTree]:
+        cache_file_name = os.path.join(
+            self.directory, hash_file(airdrop_file_name) + CACHE_FILE_SUFFIX
+        )
+
+        try:
+            snapshot = load_snapshot(cache_file_name)
+        except (OSError, ValueError):
+            # Missing or unusable, e.g. written by another snapshot version
+            pass
+        else:
+            # Mark the entry as recently used
+            os.utime(cache_file_name)
+            return snapshot.airdrop_data, snapshot.tree
+
+        airdrop_data = load_airdrop_file(airdrop_file_name, workers)
+        tree = build_airdrop_tree(airdrop_data, workers)
+        self._store(cache_file_name, airdrop_data, tree)
+        self._evict(keep=cache_file_name)
+
+        return airdrop_data, tree
+
+    def _store(
+        self, cache_file_name: str, airdrop_data: AirdropData, tree: FlatTree
+    ) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        file_descriptor, temporary_file_name = tempfile.mkstemp(
+            dir=self.directory, suffix=".tmp"
+        )
+        os.close(file_descriptor)
+        try:
+            # The decay parameters are not part of the airdrop file
+            write_snapshot(temporary_file_name, airdrop_data, tree, 0, 0)
+            os.replace(temporary_file_name, cache_file_name)
+        except BaseException:
+            os.remove(temporary_file_name)
+            raise
+
+    def _evict(self, keep: str) -> None:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(CACHE_FILE_SUFFIX) and entry.path != keep:
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = os.path.getsize(keep) + sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Already evicted by another process
+                pass
+            total_size -= size
@@ -1,4 +1,8 @@
+import json
+import os
 import sys
+import time
+from typing import Iterable, List, NamedTuple, Optional, Tuple
 
 import click
 import pendulum
@@ -16,11 +20,37 @@ from deploy_tools.cli import (
 from deploy_tools.deploy import build_transaction_options
 from eth_utils import encode_hex, is_checksum_address, to_canonical_address
 
-from .airdrop import get_balance, get_item, to_items
+from .airdrop import (
+    AirdropData,
+    build_airdrop_tree,
+    compute_airdrop_root,
+    get_balance,
+    get_item,
+    update_airdrop,
+)
+from .cache import DEFAULT_MAX_CACHE_SIZE, BuildCache
 from .deploy import deploy_merkle_drop, sum_of_airdropped_tokens
-from .load_csv import load_airdrop_file
-from .merkle_tree import build_tree, compute_merkle_root, create_proof
+from .hashing import checksum_encode
+from .load_csv import load_airdrop_file, load_diff_file
+from .loadtest import create_request_paths, run_load_test, start_local_server
+from .merkle_tree import (
+    FlatTree,
+    Item,
+    create_all_proofs,
+    create_proof,
+    create_proof_at_index,
+)
+from .out_of_core import DEFAULT_MEMORY_BUDGET, build_snapshot_out_of_core
+from .snapshot import load_snapshot, write_snapshot
 from .status import get_merkle_drop_status
+from .synthetic import (
+    DISTRIBUTIONS,
+    SyntheticAirdrop,
+    generate_synthetic_airdrop_data,
+    validate_synthetic_airdrop,
+    write_synthetic_airdrop_file,
+)
+from .verify import verify_proofs_file
 
 
 def validate_address(ctx, param, value):
@@ -29,6 +59,18 @@ def validate_address(ctx, param, value):
     return to_canonical_address(value)
 
 
+def validate_root(ctx, param, value):
+    if value is None:
+        return None
+    try:
+        root_hash = bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    except ValueError as e:
+        raise click.BadParameter("Not a hexadecimal Merkle root") from e
+    if len(root_hash) != 32:
+        raise click.BadParameter("A Merkle root has 32 bytes")
+    return root_hash
+
+
 def validate_date(ctx, param, value):
     if value is None:
         return None
@@ -40,11 +82,58 @@ def validate_date(ctx, param, value):
         ) from e
 
 
+def get_decay_start_time(
+    decay_start_time: Optional[int], decay_start_date: Optional[pendulum.DateTime]
+) -> int:
+    if decay_start_date is not None:
+        if decay_start_time is not None:
+            raise click.BadParameter(
+                "Both --decay-start-date and --decay-start-time have been specified"
+            )
+        return int(decay_start_date.timestamp())
+
+    if decay_start_time is None:
+        raise click.BadParameter(
+            "Please specify a decay start date with --decay-start-date or --decay-start-time"
+        )
+    return decay_start_time
+
+
 airdrop_file_argument = click.argument(
     "airdrop_file_name", type=click.Path(exists=True, dir_okay=False)
 )
 
 
+decay_start_time_option = click.option(
+    "--decay-start-time",
+    "decay_start_time",
+    help="The start time for the decay of the tokens",
+    type=int,
+    required=False,
+)
+
+
+decay_start_date_option = click.option(
+    "--decay-start-date",
+    "decay_start_date",
+    help='The start date for the decay of the tokens (e.g. "2020-09-28", "2020-09-28T13:56")',
+    type=str,
+    required=False,
+    metavar="DATE",
+    callback=validate_date,
+)
+
+
+decay_duration_option = click.option(
+    "--decay-duration",
+    "decay_duration",
+    help="The duration of the decay",
+    type=int,
+    required=False,
+    default=63_072_000,  # two years in seconds
+)
+
+
 merkle_drop_address_option = click.option(
     "--merkle-drop-address",
     help='The address of the merkle drop contract, "0x" prefixed string',
@@ -56,21 +145,103 @@ merkle_drop_address_option = click.option(
 
 EXIT_OK_CODE = 0
 EXIT_ERROR_CODE = 1
+# Reporting millions of mismatches does not help anybody
+MAX_REPORTED_ERRORS = 20
+
+
+class Settings(NamedTuple):
+    build_cache: Optional[BuildCache]
+    jobs: int
+
+
+def get_settings() -> Settings:
+    settings = click.get_current_context().find_object(Settings)
+    assert settings is not None, "The settings are set by the main command"
+    return settings
+
+
+def load_airdrop_data(airdrop_file_name: str) -> AirdropData:
+    settings = get_settings()
+    if settings.build_cache is None:
+        return load_airdrop_file(airdrop_file_name, settings.jobs)
+
+    airdrop_data, _ = settings.build_cache.load(airdrop_file_name, settings.jobs)
+    return airdrop_data
+
+
+def compute_root(airdrop_file_name: str) -> bytes:
+    settings = get_settings()
+    if settings.build_cache is None:
+        # Only the root is needed, so the tree is not built
+        return compute_airdrop_root(load_airdrop_file(airdrop_file_name, settings.jobs))
+
+    _, tree = settings.build_cache.load(airdrop_file_name, settings.jobs)
+    return tree.root_hash
+
+
+def load_airdrop_data_and_root(airdrop_file_name: str) -> Tuple[AirdropData, bytes]:
+    settings = get_settings()
+    if settings.build_cache is None:
+        airdrop_data = load_airdrop_file(airdrop_file_name, settings.jobs)
+        return airdrop_data, compute_airdrop_root(airdrop_data)
+
+    airdrop_data, tree = settings.build_cache.load(airdrop_file_name, settings.jobs)
+    return airdrop_data, tree.root_hash
+
+
+def load_airdrop_data_and_tree(airdrop_file_name: str) -> Tuple[AirdropData, FlatTree]:
+    settings = get_settings()
+    if settings.build_cache is None:
+        airdrop_data = load_airdrop_file(airdrop_file_name, settings.jobs)
+        return airdrop_data, build_airdrop_tree(airdrop_data, settings.jobs)
+
+    return settings.build_cache.load(airdrop_file_name, settings.jobs)
 
 
 @click.group()
-def main():
-    pass
+@click.option(
+    "--cache/--no-cache",
+    help="Cache parsed airdrop files and their Merkle trees between invocations",
+    default=False,
+    show_default=True,
+    envvar="MERKLE_DROP_CACHE",
+)
+@click.option(
+    "--cache-dir",
+    "cache_directory",
+    help="The directory of the cache [default: $XDG_CACHE_HOME/merkle-drop]",
+    type=click.Path(file_okay=False, writable=True),
+    envvar="MERKLE_DROP_CACHE_DIR",
+)
+@click.option(
+    "--cache-size",
+    help="The maximum total size of the cache in bytes",
+    type=int,
+    default=DEFAULT_MAX_CACHE_SIZE,
+    show_default=True,
+    envvar="MERKLE_DROP_CACHE_SIZE",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    help="The number of processes used to build Merkle trees",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+)
+@click.pass_context
+def main(ctx, cache: bool, cache_directory: Optional[str], cache_size: int, jobs: int):
+    ctx.obj = Settings(
+        build_cache=BuildCache(cache_directory, cache_size) if cache else None,
+        jobs=jobs,
+    )
 
 
 @main.command(short_help="Compute Merkle root")
 @airdrop_file_argument
 def root(airdrop_file_name: str) -> None:
 
-    airdrop_data = load_airdrop_file(airdrop_file_name)
-    merkle_root = compute_merkle_root(to_items(airdrop_data))
-
-    click.echo(f"{encode_hex(merkle_root)}")
+    click.echo(f"{encode_hex(compute_root(airdrop_file_name))}")
 
 
 @main.command(short_help="Balance of address")
@@ -78,7 +249,7 @@ def root(airdrop_file_name: str) -> None:
 @airdrop_file_argument
 def balance(address: bytes, airdrop_file_name: str) -> None:
 
-    airdrop_data = load_airdrop_file(airdrop_file_name)
+    airdrop_data = load_airdrop_data(airdrop_file_name)
     balance = get_balance(address, airdrop_data)
 
     click.echo(f"{balance}")
@@ -88,16 +259,441 @@ def balance(address: bytes, airdrop_file_name: str) -> None:
 @click.argument("address", callback=validate_address)
 @airdrop_file_argument
 def proof(address: bytes, airdrop_file_name: str) -> None:
-    airdrop_data = load_airdrop_file(airdrop_file_name)
+    airdrop_data, tree = load_airdrop_data_and_tree(airdrop_file_name)
     try:
-        proof = create_proof(
-            get_item(address, airdrop_data), build_tree(to_items(airdrop_data))
-        )
+        proof = create_proof(get_item(address, airdrop_data), tree)
         click.echo(" ".join(encode_hex(hash_) for hash_ in proof))
     except KeyError as e:
         raise click.BadParameter("The address is not eligible to get a proof") from e
 
 
+@main.command(short_help="Create Merkle proofs for many addresses")
+@airdrop_file_argument
+@click.option(
+    "--addresses",
+    "addresses_file",
+    help="File with one checksum address per line to create proofs for "
+    "[default: all addresses of the airdrop file]",
+    type=click.File("r"),
+)
+@click.option(
+    "--output",
+    "output_file",
+    help="The file to write the proofs to as JSON lines",
+    type=click.File("w"),
+    default="-",
+    show_default=True,
+)
+def proofs(airdrop_file_name: str, addresses_file, output_file) -> None:
+    airdrop_data, tree = load_airdrop_data_and_tree(airdrop_file_name)
+
+    entries: Iterable[Tuple[Item, List[bytes]]]
+    if addresses_file is None:
+        # The leaves are in the order of the airdrop data
+        entries = zip(airdrop_data.iter_items(), create_all_proofs(tree))
+    else:
+        entries = (
+            get_proof_entry(address, airdrop_data, tree)
+            for address in read_addresses(addresses_file)
+        )
+
+    for (address, value), proof in entries:
+        entry = {
+            "address": checksum_encode(address),
+            "value": str(value),
+            "proof": [encode_hex(hash_) for hash_ in proof],
+        }
+        output_file.write(json.dumps(entry) + "\n")
+
+
+def get_proof_entry(
+    address: bytes, airdrop_data: AirdropData, tree: FlatTree
+) -> Tuple[Item, List[bytes]]:
+    index = tree.find_address(address)
+    if index is None:
+        return Item(address, 0), []
+    return Item(address, airdrop_data[address]), create_proof_at_index(index, tree)
+
+
+def read_addresses(addresses_file):
+    for line_number, line in enumerate(addresses_file, start=1):
+        address = line.strip()
+        if not address:
+            continue
+        if not is_checksum_address(address):
+            raise click.BadParameter(
+                f"Not a valid checksum address in line {line_number}: {address}",
+                param_hint="--addresses",
+            )
+        yield to_canonical_address(address)
+
+
+@main.command("verify-proofs", short_help="Verify exported Merkle proofs")
+@click.argument("proofs_file_name", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--root",
+    "root_hash",
+    help="The Merkle root to verify the proofs against",
+    callback=validate_root,
+)
+@click.option(
+    "--airdrop-file",
+    "airdrop_file_name",
+    help="Compute the Merkle root to verify the proofs against from this airdrop file",
+    type=click.Path(exists=True, dir_okay=False),
+)
+def verify_proofs(
+    proofs_file_name: str, root_hash: Optional[bytes], airdrop_file_name: Optional[str]
+) -> None:
+    airdrop_data = None
+    if airdrop_file_name is not None:
+        if root_hash is not None:
+            raise click.UsageError("Expected only one of --root and --airdrop-file")
+        airdrop_data, root_hash = load_airdrop_data_and_root(airdrop_file_name)
+    elif root_hash is None:
+        raise click.UsageError("Expected one of --root and --airdrop-file")
+
+    verification = verify_proofs_file(
+        proofs_file_name, root_hash, get_settings().jobs, airdrop_data
+    )
+
+    click.echo(f"Verified proofs: {verification.number_of_proofs}")
+    entries_without_proof = verification.entries_without_proof
+    click.echo(f"Entries without proof: {len(entries_without_proof)}")
+    if airdrop_data is None and entries_without_proof:
+        click.secho(
+            "The addresses of entries without proof are not checked against the "
+            "airdrop without --airdrop-file:",
+            fg="yellow",
+        )
+        for line_number, checksum_address in entries_without_proof[
+            :MAX_REPORTED_ERRORS
+        ]:
+            click.secho(f"{checksum_address} in line {line_number}", fg="yellow")
+        if len(entries_without_proof) > MAX_REPORTED_ERRORS:
+            click.secho(
+                f"... and {len(entries_without_proof) - MAX_REPORTED_ERRORS} more",
+                fg="yellow",
+            )
+
+    if verification.errors:
+        for error in verification.errors[:MAX_REPORTED_ERRORS]:
+            click.secho(error, fg="red")
+        if len(verification.errors) > MAX_REPORTED_ERRORS:
+            click.secho(
+                f"... and {len(verification.errors) - MAX_REPORTED_ERRORS} more errors",
+                fg="red",
+            )
+        sys.exit(EXIT_ERROR_CODE)
+
+    click.secho("All proofs match the Merkle root.", fg="green")
+
+
+@main.command(short_help="Build a snapshot of the airdrop for the server")
+@airdrop_file_argument
+@click.option(
+    "--output",
+    "snapshot_file_name",
+    help="The file to write the snapshot to",
+    type=click.Path(dir_okay=False, writable=True),
+    required=True,
+)
+@click.option(
+    "--work-dir",
+    "work_directory",
+    help="Build out of core for airdrops larger than the memory, keeping "
+    "intermediate files in this directory. An interrupted build continues "
+    "when started again with the same directory.",
+    type=click.Path(file_okay=False, writable=True),
+)
+@click.option(
+    "--memory-budget",
+    help="The memory in bytes to use for an out of core build",
+    type=click.IntRange(min=1),
+    default=DEFAULT_MEMORY_BUDGET,
+    show_default=True,
+)
+@decay_start_time_option
+@decay_start_date_option
+@decay_duration_option
+def build(
+    airdrop_file_name: str,
+    snapshot_file_name: str,
+    work_directory: Optional[str],
+    memory_budget: int,
+    decay_start_time: int,
+    decay_start_date: pendulum.DateTime,
+    decay_duration: int,
+) -> None:
+    decay_start_time = get_decay_start_time(decay_start_time, decay_start_date)
+
+    if work_directory is not None:
+        root_hash = build_snapshot_out_of_core(
+            airdrop_file_name,
+            snapshot_file_name,
+            work_directory,
+            decay_start_time,
+            decay_duration,
+            memory_budget,
+        )
+    else:
+        airdrop_data, tree = load_airdrop_data_and_tree(airdrop_file_name)
+        write_snapshot(
+            snapshot_file_name, airdrop_data, tree, decay_start_time, decay_duration
+        )
+        root_hash = tree.root_hash
+
+    click.echo(f"Merkle root: {encode_hex(root_hash)}")
+
+
+@main.command(
+    "apply-diff", short_help="Apply changes to a snapshot without a full rebuild"
+)
+@click.argument("snapshot_file_name", type=click.Path(exists=True, dir_okay=False))
+@click.argument("diff_file_name", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--output",
+    "output_file_name",
+    help="The file to write the updated snapshot to",
+    type=click.Path(dir_okay=False, writable=True),
+    required=True,
+)
+def apply_diff(
+    snapshot_file_name: str, diff_file_name: str, output_file_name: str
+) -> None:
+    if os.path.exists(output_file_name) and os.path.samefile(
+        output_file_name, snapshot_file_name
+    ):
+        # The snapshot is memory mapped and must not be overwritten
+        raise click.BadParameter(
+            "Can not overwrite the snapshot being updated", param_hint="--output"
+        )
+
+    snapshot = load_snapshot(snapshot_file_name)
+    changes = load_diff_file(diff_file_name)
+
+    airdrop_data, tree = update_airdrop(snapshot.airdrop_data, snapshot.tree, changes)
+    write_snapshot(
+        output_file_name,
+        airdrop_data,
+        tree,
+        snapshot.decay_start_time,
+        snapshot.decay_duration_in_seconds,
+    )
+
+    click.echo(f"Merkle root: {encode_hex(tree.root_hash)}")
+
+
+@main.command("gen-synthetic", short_help="Generate a synthetic airdrop for benchmarks")
+@click.argument("number_of_entries", type=click.IntRange(min=1))
+@click.option(
+    "--output",
+    "output_file_name",
+    help="The file to write the airdrop to, CSV files ending in .gz, .bz2 or .xz "
+    "are compressed",
+    type=click.Path(dir_okay=False, writable=True),
+    required=True,
+)
+@click.option(
+    "--format",
+    "output_format",
+    help="Write an airdrop file or a snapshot as written by build",
+    type=click.Choice(["csv", "snapshot"]),
+    default="csv",
+    show_default=True,
+)
+@click.option(
+    "--seed",
+    help="The same seed always generates the same airdrop",
+    type=click.IntRange(min=0, max=2 ** 256 - 1),
+    default=0,
+    show_default=True,
+)
+@click.option(
+    "--distribution",
+    help="The distribution of the values between the min and max value, "
+    "constant uses the max value",
+    type=click.Choice(DISTRIBUTIONS),
+    default="uniform",
+    show_default=True,
+)
+@click.option("--min-value", type=click.IntRange(min=0), default=1, show_default=True)
+@click.option(
+    "--max-value", type=click.IntRange(min=0), default=10 ** 24, show_default=True
+)
+@decay_start_time_option
+@decay_start_date_option
+@decay_duration_option
+def gen_synthetic(
+    number_of_entries: int,
+    output_file_name: str,
+    output_format: str,
+    seed: int,
+    distribution: str,
+    min_value: int,
+    max_value: int,
+    decay_start_time: Optional[int],
+    decay_start_date: Optional[pendulum.DateTime],
+    decay_duration: int,
+) -> None:
+    """Generate NUMBER_OF_ENTRIES pseudo-random entries, using --jobs processes"""
+    airdrop = SyntheticAirdrop(
+        number_of_entries, seed, distribution, min_value, max_value
+    )
+    try:
+        validate_synthetic_airdrop(airdrop)
+    except ValueError as e:
+        raise click.UsageError(str(e)) from e
+    jobs = get_settings().jobs
+
+    if output_format == "csv":
+        write_synthetic_airdrop_file(output_file_name, airdrop, jobs)
+        return
+
+    decay_start_time = get_decay_start_time(decay_start_time, decay_start_date)
+    airdrop_data = generate_synthetic_airdrop_data(airdrop, jobs)
+    tree = build_airdrop_tree(airdrop_data, jobs)
+    write_snapshot(
+        output_file_name, airdrop_data, tree, decay_start_time, decay_duration
+    )
+    click.echo(f"Merkle root: {encode_hex(tree.root_hash)}")
+
+
+@main.command(short_help="Measure the performance of the server under load")
+@airdrop_file_argument
+@click.option(
+    "--url",
+    help="The URL of the server to test [default: start the server locally with "
+    "the airdrop file]",
+)
+@click.option(
+    "--concurrency",
+    "-c",
+    help="The number of concurrent connections",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+)
+@click.option(
+    "--requests",
+    "-n",
+    "number_of_requests",
+    help="The total number of requests",
+    type=click.IntRange(min=1),
+    default=10000,
+    show_default=True,
+)
+@click.option(
+    "--eligible",
+    help="The weight of requests for addresses of the airdrop",
+    type=click.FloatRange(min=0),
+    default=0.8,
+    show_default=True,
+)
+@click.option(
+    "--ineligible",
+    help="The weight of requests for valid addresses not in the airdrop",
+    type=click.FloatRange(min=0),
+    default=0.15,
+    show_default=True,
+)
+@click.option(
+    "--malformed",
+    help="The weight of requests for invalid addresses",
+    type=click.FloatRange(min=0),
+    default=0.05,
+    show_default=True,
+)
+@click.option(
+    "--seed",
+    help="The seed for choosing the addresses",
+    type=int,
+    default=0,
+    show_default=True,
+)
+@click.option(
+    "--timeout",
+    help="The timeout of a request in seconds",
+    type=click.FloatRange(min=0),
+    default=10.0,
+    show_default=True,
+)
+@click.option(
+    "--precompute",
+    help="Precompute all responses in the local server",
+    is_flag=True,
+)
+@click.option(
+    "--response-cache-size",
+    help="The number of responses to cache in the local server",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+)
+@click.option(
+    "--output",
+    "output_file",
+    help="Write the results as JSON to this file, - for stdout",
+    type=click.File("w"),
+)
+def loadtest(
+    airdrop_file_name: str,
+    url: Optional[str],
+    concurrency: int,
+    number_of_requests: int,
+    eligible: float,
+    ineligible: float,
+    malformed: float,
+    seed: int,
+    timeout: float,
+    precompute: bool,
+    response_cache_size: int,
+    output_file,
+) -> None:
+    address_mix = {
+        "eligible": eligible,
+        "ineligible": ineligible,
+        "malformed": malformed,
+    }
+    if sum(address_mix.values()) == 0:
+        raise click.UsageError("At least one kind of address needs a weight above 0")
+
+    try:
+        request_paths = create_request_paths(
+            load_airdrop_data(airdrop_file_name), number_of_requests, address_mix, seed
+        )
+    except ValueError as e:
+        raise click.UsageError(str(e)) from e
+
+    if url is None:
+        # The decay does not change the work of the server
+        with start_local_server(
+            airdrop_file_name,
+            int(time.time()),
+            63_072_000,
+            precompute=precompute,
+            cache_size=response_cache_size,
+        ) as local_url:
+            results = run_load_test(local_url, request_paths, concurrency, timeout)
+    else:
+        results = run_load_test(url, request_paths, concurrency, timeout)
+
+    latency = results["latency_seconds"]
+    click.echo(
+        f"Requests: {results['requests']} in {results['duration_seconds']:.2f} s, "
+        f"{results['throughput']:.1f} per second"
+    )
+    click.echo(
+        f"Latency p50/p95/p99/max: {latency['p50'] * 1000:.2f}/"
+        f"{latency['p95'] * 1000:.2f}/{latency['p99'] * 1000:.2f}/"
+        f"{latency['max'] * 1000:.2f} ms"
+    )
+    click.echo(f"Errors: {results['errors']} ({results['error_rate']:.2%})")
+    if output_file is not None:
+        json.dump(results, output_file, indent=2)
+        output_file.write("\n")
+
+
 @main.command(short_help="Deploy the MerkleDrop contract")
 @keystore_option
 @gas_option
@@ -119,30 +715,9 @@ def proof(address: bytes, airdrop_file_name: str) -> None:
     type=click.Path(exists=True, dir_okay=False),
     required=True,
 )
-@click.option(
-    "--decay-start-time",
-    "decay_start_time",
-    help="The start time for the decay of the tokens",
-    type=int,
-    required=False,
-)
-@click.option(
-    "--decay-start-date",
-    "decay_start_date",
-    help='The start date for the decay of the tokens (e.g. "2020-09-28", "2020-09-28T13:56")',
-    type=str,
-    required=False,
-    metavar="DATE",
-    callback=validate_date,
-)
-@click.option(
-    "--decay-duration",
-    "decay_duration",
-    help="The duration of the decay",
-    type=int,
-    required=False,
-    default=63_072_000,  # two years in seconds
-)
+@decay_start_time_option
+@decay_start_date_option
+@decay_duration_option
 def deploy(
     keystore: str,
     jsonrpc: str,
@@ -157,17 +732,7 @@ def deploy(
     decay_duration: int,
 ) -> None:
 
-    if decay_start_date is not None and decay_start_time is not None:
-        raise click.BadParameter(
-            "Both --decay-start-date and --decay-start-time have been specified"
-        )
-    if decay_start_date is None and decay_start_time is None:
-        raise click.BadParameter(
-            "Please specify a decay start date with --decay-start-date or --decay-start-time"
-        )
-
-    if decay_start_date is not None:
-        decay_start_time = int(decay_start_date.timestamp())
+    decay_start_time = get_decay_start_time(decay_start_time, decay_start_date)
 
     web3 = connect_to_json_rpc(jsonrpc)
     private_key = retrieve_private_key(keystore)
@@ -179,13 +744,11 @@ def deploy(
         gas=gas, gas_price=gas_price, nonce=nonce
     )
 
-    airdrop_data = load_airdrop_file(airdrop_file_name)
-    airdrop_items = to_items(airdrop_data)
-    merkle_root = compute_merkle_root(airdrop_items)
+    airdrop_data, merkle_root = load_airdrop_data_and_root(airdrop_file_name)
 
     constructor_args = (
         token_address,
-        sum_of_airdropped_tokens(airdrop_items),
+        sum_of_airdropped_tokens(airdrop_data.iter_items()),
         merkle_root,
         decay_start_time,
         decay_duration,
@@ -289,8 +852,7 @@ def check_root(jsonrpc: str, merkle_drop_address: str, airdrop_file_name: str):
     click.echo(f"Merkle root at contract: '{merkle_root_contract}'")
 
     click.echo("Calculate Merkle root by airdrop file...")
-    airdrop_data = load_airdrop_file(airdrop_file_name)
-    merkle_root_file = compute_merkle_root(to_items(airdrop_data)).hex()
+    merkle_root_file = compute_root(airdrop_file_name).hex()
     click.echo(f"Merkle root by airdrop file: '{merkle_root_file}'")
 
     if merkle_root_contract == merkle_root_file:
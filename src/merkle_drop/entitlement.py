@@ -0,0 +1,264 @@
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from eth_utils import encode_hex, is_address, to_canonical_address, to_checksum_address
+
+from .airdrop import AirdropData, get_balance
+from .merkle_tree import FlatTree, create_proof_at_index
+
+
+class PrecomputedEntitlement(NamedTuple):
+    """The JSON encoded entitlement around the current token balance"""
+
+    prefix: bytes
+    original_token_balance: int
+    suffix: bytes
+
+
+class EntitlementCache:
+    """Least recently used cache of precomputed entitlements
+
+    It is keyed by canonical address and holds at most `max_size` entries.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[bytes, PrecomputedEntitlement]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, address: bytes) -> Optional[PrecomputedEntitlement]:
+        with self._lock:
+            entry = self._entries.get(address)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(address)
+            return entry
+
+    def put(self, address: bytes, entry: PrecomputedEntitlement) -> None:
+        with self._lock:
+            self._entries[address] = entry
+            self._entries.move_to_end(address)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+
+class EntitlementState(NamedTuple):
+    """The immutable state shared by the servers of the entitlement API"""
+
+    airdrop_data: AirdropData
+    tree: FlatTree
+    decay_start_time: int
+    decay_duration_in_seconds: int
+    # By checksum address, see `precompute_entitlements`
+    precomputed_entitlements: Optional[Dict[str, PrecomputedEntitlement]] = None
+    entitlement_cache: Optional[EntitlementCache] = None
+
+
+class InvalidAddressError(ValueError):
+    pass
+
+
+class InvalidBatchError(ValueError):
+    pass
+
+
+DEFAULT_MAX_BATCH_SIZE = 1000
+
+# Enough for a JSON list of addresses with some whitespace
+MAX_REQUEST_SIZE_PER_ADDRESS = 128
+
+
+def get_entitlement(state: EntitlementState, address: str, now: int) -> Dict[str, Any]:
+    """the entitlement of the address at the time `now` as served by the API"""
+    if not is_address(address):
+        raise InvalidAddressError("The address is not in checksum-case or invalid")
+    canonical_address = to_canonical_address(address)
+
+    eligible_tokens = get_balance(canonical_address, state.airdrop_data)
+    if eligible_tokens == 0:
+        proof = []
+        decayed_tokens = 0
+    else:
+        index = state.tree.find_address(canonical_address)
+        assert index is not None
+        proof = create_proof_at_index(index, state.tree)
+        decayed_tokens = decay_tokens(state, eligible_tokens, now)
+
+    return {
+        "address": to_checksum_address(address),
+        "originalTokenBalance": str(eligible_tokens),
+        "currentTokenBalance": str(decayed_tokens),
+        "proof": [encode_hex(hash_) for hash_ in proof],
+    }
+
+
+def get_encoded_entitlement(state: EntitlementState, address: str, now: int) -> bytes:
+    """the JSON encoded entitlement, using a precomputed or cached one if available"""
+    return _get_encoded_entitlement_entry(state, address, now) + b"\n"
+
+
+def _get_encoded_entitlement_entry(
+    state: EntitlementState, address: str, now: int
+) -> bytes:
+    precomputed_entitlement = None
+    if state.precomputed_entitlements is not None:
+        precomputed_entitlement = state.precomputed_entitlements.get(address)
+    if precomputed_entitlement is None and state.entitlement_cache is not None:
+        precomputed_entitlement = _get_cached_entitlement(
+            state, state.entitlement_cache, address
+        )
+    if precomputed_entitlement is None:
+        return encode_json(get_entitlement(state, address, now))
+
+    prefix, original_token_balance, suffix = precomputed_entitlement
+    current_token_balance = decay_tokens(state, original_token_balance, now)
+    return prefix + str(current_token_balance).encode() + suffix
+
+
+def _get_cached_entitlement(
+    state: EntitlementState, entitlement_cache: EntitlementCache, address: str
+) -> Optional[PrecomputedEntitlement]:
+    if not is_address(address):
+        raise InvalidAddressError("The address is not in checksum-case or invalid")
+    canonical_address = to_canonical_address(address)
+
+    entry = entitlement_cache.get(canonical_address)
+    if entry is None:
+        # Only eligible addresses are cached, the others are cheap to answer
+        original_token_balance = get_balance(canonical_address, state.airdrop_data)
+        if original_token_balance == 0:
+            return None
+        index = state.tree.find_address(canonical_address)
+        assert index is not None
+        entry = _precompute_entitlement(
+            to_checksum_address(canonical_address),
+            original_token_balance,
+            create_proof_at_index(index, state.tree),
+        )
+        entitlement_cache.put(canonical_address, entry)
+    return entry
+
+
+def parse_batch(body: bytes, max_batch_size: int) -> List[str]:
+    """the addresses of a batch request, which is a JSON list of addresses"""
+    if len(body) > max_batch_size * MAX_REQUEST_SIZE_PER_ADDRESS:
+        raise InvalidBatchError(f"Expected at most {max_batch_size} addresses")
+
+    try:
+        addresses = json.loads(body)
+    except ValueError as e:
+        raise InvalidBatchError("Expected a JSON list of addresses") from e
+
+    if not isinstance(addresses, list) or not all(
+        isinstance(address, str) for address in addresses
+    ):
+        raise InvalidBatchError("Expected a JSON list of addresses")
+    if len(addresses) > max_batch_size:
+        raise InvalidBatchError(f"Expected at most {max_batch_size} addresses")
+
+    for address in addresses:
+        if not is_address(address):
+            raise InvalidAddressError(
+                f"The address {address} is not in checksum-case or invalid"
+            )
+
+    return addresses
+
+
+def iter_encoded_entitlements(
+    state: EntitlementState,
+    addresses: List[str],
+    now: int,
+    observe_entitlement: Optional[Callable[[float], None]] = None,
+) -> Iterator[bytes]:
+    """the parts of the JSON list of the entitlements of the addresses
+
+    All entitlements are decayed to the same time `now`. The addresses have
+    to be valid, as checked by `parse_batch`. `observe_entitlement` is
+    called with the `time.perf_counter` start time after every entitlement,
+    like `metrics.observe_proof`.
+    """
+    yield b"["
+    for index, address in enumerate(addresses):
+        if index > 0:
+            yield b","
+        start_time = time.perf_counter()
+        encoded_entitlement = _get_encoded_entitlement_entry(state, address, now)
+        if observe_entitlement is not None:
+            observe_entitlement(start_time)
+        yield encoded_entitlement
+    yield b"]\n"
+
+
+def encode_entitlement(entitlement: Dict[str, Any]) -> bytes:
+    return encode_json(entitlement) + b"\n"
+
+
+def encode_json(value: Any) -> bytes:
+    """encode like flask.jsonify without the trailing newline
+
+    The keys are sorted and there is no whitespace between the tokens."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":")).encode()
+
+
+def precompute_entitlements(
+    airdrop_data: AirdropData, tree: FlatTree
+) -> Dict[str, PrecomputedEntitlement]:
+    """encode the entitlements of all eligible addresses up front
+
+    Only the current token balance changes over time, so the parts of the
+    encoded entitlement before and after it are stored. They are keyed by
+    the checksum address, which clients normally request. Other spellings
+    of an address are handled by `get_entitlement`.
+    """
+    precomputed_entitlements = {}
+    for index, (address, value) in enumerate(airdrop_data.iter_items()):
+        # Addresses without tokens get no proof
+        if value == 0:
+            continue
+        checksum_address = to_checksum_address(address)
+        precomputed_entitlements[checksum_address] = _precompute_entitlement(
+            checksum_address, value, create_proof_at_index(index, tree)
+        )
+
+    return precomputed_entitlements
+
+
+def _precompute_entitlement(
+    checksum_address: str, original_token_balance: int, proof: List[bytes]
+) -> PrecomputedEntitlement:
+    # The same encoding as of `encode_json`, with the keys in sorted order
+    prefix = f'{{"address":"{checksum_address}","currentTokenBalance":"'
+    suffix = (
+        f'","originalTokenBalance":"{original_token_balance}",'
+        f'"proof":{encode_json([encode_hex(hash_) for hash_ in proof]).decode()}}}'
+    )
+    return PrecomputedEntitlement(
+        prefix.encode(), original_token_balance, suffix.encode()
+    )
+
+
+# See also MerkleDrop.sol:61
+def decay_tokens(state: EntitlementState, tokens: int, now: int) -> int:
+    if now <= state.decay_start_time:
+        return tokens
+    elif now >= state.decay_start_time + state.decay_duration_in_seconds:
+        return 0
+    else:
+        time_decayed = now - state.decay_start_time
+        decay = math.ceil(tokens * time_decayed / state.decay_duration_in_seconds)
+        assert decay <= tokens
+        return tokens - decay
@@ -0,0 +1,88 @@
+"""Batched keccak256 hashing of packed leaves and tree levels.
+
+A whole level is passed as one buffer of concatenated records and hashed
+in a single loop, without creating an object per node. The fastest
+available keccak256 implementation is used: pysha3 if it is installed,
+otherwise pycryptodome, otherwise the one of eth_utils.
+"""
+from typing import Callable
+
+ADDRESS_LENGTH = 20
+VALUE_LENGTH = 32
+HASH_LENGTH = 32
+
+
+def _select_keccak() -> Callable[[bytes], bytes]:
+    try:
+        from Crypto.Hash import keccak as pycryptodome_keccak
+    except ImportError:
+        pass
+    else:
+        return lambda data: pycryptodome_keccak.new(digest_bits=256, data=data).digest()
+
+    from eth_utils import keccak as eth_utils_keccak
+
+    return eth_utils_keccak
+
+
+keccak = _select_keccak()
+
+
+def checksum_encode(address: bytes) -> str:
+    """the checksum address of a canonical address
+
+    The same as eth_utils.to_checksum_address, which takes a lot longer
+    because of its conversions and validations."""
+    hex_address = address.hex()
+    hex_hash = keccak(hex_address.encode()).hex()
+    return "0x" + "".join(
+        character.upper() if hash_character in "89abcdef" else character
+        for character, hash_character in zip(hex_address, hex_hash)
+    )
+
+
+def hash_leaves(addresses: bytes, values: bytes) -> bytes:
+    """Hash packed 20 byte addresses with their packed 32 byte values"""
+    number_of_leaves = len(addresses) // ADDRESS_LENGTH
+    if (
+        len(addresses) != number_of_leaves * ADDRESS_LENGTH
+        or len(values) != number_of_leaves * VALUE_LENGTH
+    ):
+        raise ValueError("Addresses and values do not have the same number of records")
+
+    # Memory views of snapshots and cache files can not be concatenated
+    addresses = bytes(addresses)
+    values = bytes(values)
+    _keccak = keccak
+    return b"".join(
+        _keccak(
+            addresses[index * ADDRESS_LENGTH : (index + 1) * ADDRESS_LENGTH]
+            + values[index * VALUE_LENGTH : (index + 1) * VALUE_LENGTH]
+        )
+        for index in range(number_of_leaves)
+    )
+
+
+def hash_parents(level: bytes) -> bytes:
+    """Hash the pairs of a level of packed hashes to the next level
+
+    The last hash of a level with an odd number of hashes is promoted.
+    """
+    if len(level) % HASH_LENGTH != 0:
+        raise ValueError("The level length is not a multiple of the hash length")
+
+    level = bytes(level)
+    _keccak = keccak
+    parents = []
+    for offset in range(0, len(level) - HASH_LENGTH, 2 * HASH_LENGTH):
+        left_hash = level[offset : offset + HASH_LENGTH]
+        right_hash = level[offset + HASH_LENGTH : offset + 2 * HASH_LENGTH]
+        if left_hash < right_hash:
+            parents.append(_keccak(left_hash + right_hash))
+        else:
+            parents.append(_keccak(right_hash + left_hash))
+
+    if len(level) // HASH_LENGTH % 2 != 0:
+        parents.append(level[-HASH_LENGTH:])
+
+    return b"".join(parents)
@@ -1,37 +1,346 @@
+import bz2
+import concurrent.futures
 import csv
-from typing import Dict
+import gzip
+import heapq
+import io
+import itertools
+import lzma
+import os
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+)
 
-from eth_utils import is_address, to_canonical_address
+from eth_utils import is_address, to_canonical_address, to_checksum_address
 
+from .airdrop import AirdropData
+from .hashing import ADDRESS_LENGTH, VALUE_LENGTH
 
-def load_airdrop_file(airdrop_file: str) -> Dict[bytes, int]:
-    with open(airdrop_file) as file:
+LINE_NUMBER_LENGTH = 8
+# Records of valid lines are packed into 60 bytes, sorting by address and
+# then by line number
+RECORD_LENGTH = ADDRESS_LENGTH + LINE_NUMBER_LENGTH + VALUE_LENGTH
+# The number of records sorted at once when loading an airdrop file
+_RUN_SIZE = 65536
+
+
+class AirdropFileError(ValueError):
+    """Raised with the errors of all invalid lines of an airdrop file"""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+_COMPRESSED_FILE_OPENERS: Dict[str, Callable[..., TextIO]] = {
+    ".gz": gzip.open,
+    ".bz2": bz2.open,
+    ".xz": lzma.open,
+}
+
+
+def open_airdrop_file(airdrop_file: str, mode: str = "rt") -> TextIO:
+    """open the airdrop file, (de)compressing it based on its suffix"""
+    _, suffix = os.path.splitext(airdrop_file)
+    opener = _COMPRESSED_FILE_OPENERS.get(suffix, open)
+    return opener(airdrop_file, mode, newline="")
+
+
+def read_airdrop_file(airdrop_file: str) -> Iterator[Tuple[bytes, int]]:
+    """yield the canonical address and the value of every line of the file
+
+    Every line is validated as it is read, but duplicate addresses are not
+    detected here, since that would require to keep all addresses in memory.
+    """
+    with open_airdrop_file(airdrop_file) as file:
+        yield from parse_address_value_pairs(csv.reader(file))
+
+
+def load_airdrop_file(airdrop_file: str, workers: int = 1) -> AirdropData:
+    """load the airdrop file, reporting all invalid lines at once
+
+    With more than one worker, an uncompressed file is split into chunks at
+    line boundaries, which are parsed and validated in a process pool.
+
+    The valid lines are packed into records, which are sorted in runs and
+    merged into the packed airdrop data, skipping duplicate addresses. At
+    the peak, the records of all lines and the airdrop data are in memory,
+    i.e. about 112 bytes per line.
+    """
+    errors: List[Tuple[int, str]] = []
+    if workers > 1 and not is_compressed(airdrop_file):
+        records = _read_records_in_parallel(airdrop_file, workers, errors)
+    else:
+        records = _read_records(airdrop_file, errors)
+
+    runs = []
+    run = []
+    for line_number, address, value in records:
+        try:
+            run.append(encode_record(line_number, address, value))
+        except OverflowError:
+            errors.append(
+                (
+                    line_number,
+                    f"Expected value below 2 ** 256 in line {line_number}, "
+                    f"but got {value}",
+                )
+            )
+            continue
+        if len(run) == _RUN_SIZE:
+            run.sort()
+            runs.append(b"".join(run))
+            run = []
+    run.sort()
+    runs.append(b"".join(run))
+    del run
+
+    packed_addresses = bytearray()
+    packed_values = bytearray()
+    for record in skip_duplicate_records(
+        heapq.merge(*(_iter_packed_records(run) for run in runs)), errors
+    ):
+        packed_addresses += record[:ADDRESS_LENGTH]
+        packed_values += record[ADDRESS_LENGTH + LINE_NUMBER_LENGTH :]
+    del runs
+
+    if errors:
+        raise AirdropFileError([message for _, message in sorted(errors)])
+
+    return AirdropData(bytes(packed_addresses), bytes(packed_values))
+
+
+def encode_record(line_number: int, address: bytes, value: int) -> bytes:
+    """pack a valid line, raising OverflowError if the value is too large"""
+    return (
+        address
+        + line_number.to_bytes(LINE_NUMBER_LENGTH, "big")
+        + value.to_bytes(VALUE_LENGTH, "big")
+    )
+
+
+def skip_duplicate_records(
+    records: Iterable[bytes], errors: List[Tuple[int, str]]
+) -> Iterator[bytes]:
+    """yield the first of the sorted records of every address
+
+    The records of the same address after the first are reported as errors
+    together with their line number."""
+    previous_address = None
+    for record in records:
+        address = record[:ADDRESS_LENGTH]
+        if address == previous_address:
+            line_number = int.from_bytes(
+                record[ADDRESS_LENGTH : ADDRESS_LENGTH + LINE_NUMBER_LENGTH], "big"
+            )
+            errors.append(
+                (
+                    line_number,
+                    f"Got address {to_checksum_address(address)} multiple times "
+                    f"in line {line_number}",
+                )
+            )
+            continue
+        previous_address = address
+        yield record
+
+
+def _iter_packed_records(packed_records: bytes) -> Iterator[bytes]:
+    return (
+        packed_records[offset : offset + RECORD_LENGTH]
+        for offset in range(0, len(packed_records), RECORD_LENGTH)
+    )
+
+
+def load_diff_file(diff_file: str) -> Dict[bytes, Optional[int]]:
+    """load changes to an airdrop, reporting all invalid lines at once
+
+    Every line contains an address and its new value, or an empty value
+    to remove the address from the airdrop.
+    """
+    errors = []
+    changes: Dict[bytes, Optional[int]] = {}
+    with open_airdrop_file(diff_file) as file:
         reader = csv.reader(file)
-        address_value_pairs = list(reader)
+        for address_value_pair in reader:
+            line_number = reader.line_num
+            is_removal = len(address_value_pair) == 2 and address_value_pair[1] == ""
+            try:
+                address, value = parse_address_value_pair(
+                    [address_value_pair[0], "0"] if is_removal else address_value_pair,
+                    line_number,
+                )
+            except ValueError as e:
+                errors.append(str(e))
+                continue
 
-    validate_address_value_pairs(address_value_pairs)
-    return {
-        to_canonical_address(address): int(value)
-        for address, value in address_value_pairs
-    }
+            if address in changes:
+                errors.append(
+                    f"Got address {to_checksum_address(address)} multiple times "
+                    f"in line {line_number}"
+                )
+            else:
+                changes[address] = None if is_removal else value
 
+    if errors:
+        raise AirdropFileError(errors)
 
-def validate_address_value_pairs(address_value_pairs):
-    addresses = set()
-    for address_value_pair in address_value_pairs:
-        if len(address_value_pair) != 2:
-            raise ValueError(
-                f"Expected two values per line, but got {len(address_value_pairs)}"
+    return changes
+
+
+def is_compressed(airdrop_file: str) -> bool:
+    _, suffix = os.path.splitext(airdrop_file)
+    return suffix in _COMPRESSED_FILE_OPENERS
+
+
+def _read_records(
+    airdrop_file: str, errors: List[Tuple[int, str]]
+) -> Iterator[Tuple[int, bytes, int]]:
+    with open_airdrop_file(airdrop_file) as file:
+        reader = csv.reader(file)
+        for address_value_pair in reader:
+            try:
+                address, value = parse_address_value_pair(
+                    address_value_pair, reader.line_num
+                )
+            except ValueError as e:
+                errors.append((reader.line_num, str(e)))
+            else:
+                yield reader.line_num, address, value
+
+
+def _read_records_in_parallel(
+    airdrop_file: str, workers: int, errors: List[Tuple[int, str]]
+) -> Iterator[Tuple[int, bytes, int]]:
+    chunks = split_into_chunks(airdrop_file, workers)
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        parsed_chunks = executor.map(
+            _parse_chunk,
+            itertools.repeat(airdrop_file),
+            (start for start, _ in chunks),
+            (end for _, end in chunks),
+        )
+
+        lines_before_chunk = 0
+        for parsed_chunk in parsed_chunks:
+            for chunk_line_number, address_value_pair in parsed_chunk.invalid_lines:
+                line_number = lines_before_chunk + chunk_line_number
+                try:
+                    parse_address_value_pair(address_value_pair, line_number)
+                except ValueError as e:
+                    errors.append((line_number, str(e)))
+
+            for index, (chunk_line_number, value) in enumerate(
+                zip(parsed_chunk.line_numbers, parsed_chunk.values)
+            ):
+                address = parsed_chunk.addresses[
+                    index * ADDRESS_LENGTH : (index + 1) * ADDRESS_LENGTH
+                ]
+                yield lines_before_chunk + chunk_line_number, address, value
+
+            lines_before_chunk += parsed_chunk.number_of_lines
+
+
+def split_into_chunks(
+    airdrop_file: str, number_of_chunks: int
+) -> List[Tuple[int, int]]:
+    """split the file into byte ranges, each starting at the start of a line"""
+    file_size = os.path.getsize(airdrop_file)
+    boundaries = [0]
+    with open(airdrop_file, "rb") as file:
+        for chunk in range(1, number_of_chunks):
+            file.seek(max(boundaries[-1], file_size * chunk // number_of_chunks))
+            # The rest of the line belongs to the previous chunk
+            file.readline()
+            boundaries.append(file.tell())
+    boundaries.append(file_size)
+
+    return [
+        (start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end
+    ]
+
+
+class _ParsedChunk(NamedTuple):
+    number_of_lines: int
+    addresses: bytes
+    values: List[int]
+    # The line numbers are relative to the start of the chunk
+    line_numbers: List[int]
+    invalid_lines: List[Tuple[int, Sequence[str]]]
+
+
+def _parse_chunk(airdrop_file: str, start: int, end: int) -> _ParsedChunk:
+    with open(airdrop_file, "rb") as file:
+        file.seek(start)
+        text = file.read(end - start).decode()
+
+    addresses = []
+    values = []
+    line_numbers = []
+    invalid_lines: List[Tuple[int, Sequence[str]]] = []
+    reader = csv.reader(io.StringIO(text, newline=""))
+    for address_value_pair in reader:
+        try:
+            address, value = parse_address_value_pair(
+                address_value_pair, reader.line_num
             )
+        except ValueError:
+            # Reported with the line number in the whole file by the caller
+            invalid_lines.append((reader.line_num, address_value_pair))
+        else:
+            addresses.append(address)
+            values.append(value)
+            line_numbers.append(reader.line_num)
+
+    return _ParsedChunk(
+        reader.line_num, b"".join(addresses), values, line_numbers, invalid_lines
+    )
+
+
+def parse_address_value_pairs(
+    address_value_pairs: Iterable[Sequence[str]],
+) -> Iterator[Tuple[bytes, int]]:
+    for line_number, address_value_pair in enumerate(address_value_pairs, start=1):
+        yield parse_address_value_pair(address_value_pair, line_number)
 
-        address, value = address_value_pair
-        if not is_address(address):
-            raise ValueError(f"Expected checksummed hex address, but got {address}")
 
-        if not value.isdigit():
-            raise ValueError(f"Expected decimal number as value, but got {value}")
+def parse_address_value_pair(
+    address_value_pair: Sequence[str], line_number: int
+) -> Tuple[bytes, int]:
+    if len(address_value_pair) != 2:
+        raise ValueError(
+            f"Expected two values in line {line_number}, but got {len(address_value_pair)}"
+        )
 
-        canonical_address = to_canonical_address(address)
-        if canonical_address in addresses:
-            raise ValueError(f"Got address {address} multiple times")
-        addresses.add(canonical_address)
+    address, value = address_value_pair
+    if not is_address(address):
+        raise ValueError(
+            f"Expected checksummed hex address in line {line_number}, but got {address}"
+        )
+
+    if not value.isdigit():
+        raise ValueError(
+            f"Expected decimal number as value in line {line_number}, but got {value}"
+        )
+
+    return to_canonical_address(address), int(value)
+
+
+def validate_address_value_pairs(address_value_pairs):
+    addresses = set()
+    for address, _ in parse_address_value_pairs(address_value_pairs):
+        if address in addresses:
+            raise ValueError(
+                f"Got address {to_checksum_address(address)} multiple times"
+            )
+        addresses.add(address)
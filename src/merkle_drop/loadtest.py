@@ -0,0 +1,268 @@
+"""Load tests of the entitlement API
+
+Requests for a mix of eligible, ineligible and malformed addresses are sent
+to `/entitlement/<address>` from a number of concurrent connections. The
+server is either given by its URL, e.g. gunicorn with a worker model to
+compare, or started from the airdrop file in a local process.
+"""
+import concurrent.futures
+import contextlib
+import http.client
+import logging
+import math
+import multiprocessing
+import queue
+import random
+import time
+import urllib.parse
+from typing import Any, Dict, Iterator, List, Mapping, NamedTuple, Optional
+
+from eth_utils import to_checksum_address
+
+from .airdrop import AirdropData
+from .hashing import ADDRESS_LENGTH
+
+ADDRESS_KINDS = ("eligible", "ineligible", "malformed")
+DEFAULT_ADDRESS_MIX = {"eligible": 0.8, "ineligible": 0.15, "malformed": 0.05}
+
+# The status the server answers with for requests of each kind of address
+EXPECTED_STATUS = {"eligible": 200, "ineligible": 200, "malformed": 400}
+
+DEFAULT_TIMEOUT = 10.0
+
+
+class RequestPath(NamedTuple):
+    kind: str
+    path: str
+
+
+class RequestResult(NamedTuple):
+    kind: str
+    # None if the request failed without a response
+    status: Optional[int]
+    latency: float
+
+
+def create_request_paths(
+    airdrop_data: AirdropData,
+    number_of_requests: int,
+    address_mix: Mapping[str, float] = DEFAULT_ADDRESS_MIX,
+    seed: int = 0,
+) -> List[RequestPath]:
+    """choose the addresses of the requests according to the weights of the mix
+
+    Eligible addresses are taken from the airdrop at random, ineligible ones
+    are random addresses and malformed ones are too short or not
+    hexadecimal."""
+    if len(airdrop_data) == 0 and address_mix.get("eligible", 0) > 0:
+        raise ValueError("Eligible addresses need an airdrop with at least one entry")
+    rng = random.Random(seed)
+    kinds = rng.choices(
+        list(address_mix), weights=list(address_mix.values()), k=number_of_requests
+    )
+    return [
+        RequestPath(kind, f"/entitlement/{_create_address(kind, airdrop_data, rng)}")
+        for kind in kinds
+    ]
+
+
+def _create_address(kind: str, airdrop_data: AirdropData, rng: random.Random) -> str:
+    if kind == "eligible":
+        offset = rng.randrange(len(airdrop_data)) * ADDRESS_LENGTH
+        return to_checksum_address(
+            airdrop_data.packed_addresses[offset : offset + ADDRESS_LENGTH]
+        )
+
+    address = to_checksum_address(rng.getrandbits(160).to_bytes(ADDRESS_LENGTH, "big"))
+    if kind == "ineligible":
+        # Practically never in the airdrop
+        return address
+    elif kind == "malformed":
+        if rng.random() < 0.5:
+            return address[:-1]
+        return address[:-1] + "x"
+    else:
+        raise ValueError(f"Unknown kind of address {kind}")
+
+
+def run_load_test(
+    url: str,
+    request_paths: List[RequestPath],
+    concurrency: int,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> Dict[str, Any]:
+    """send the requests from `concurrency` connections and report the results"""
+    url_parts = urllib.parse.urlsplit(url)
+    if url_parts.scheme not in ("http", "https"):
+        raise ValueError(f"Expected an http or https URL, but got {url}")
+
+    start_time = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as executor:
+        connection_results = executor.map(
+            _send_requests,
+            [url_parts] * concurrency,
+            [request_paths[index::concurrency] for index in range(concurrency)],
+            [timeout] * concurrency,
+        )
+        results = [
+            result
+            for connection_result in connection_results
+            for result in connection_result
+        ]
+    duration = time.perf_counter() - start_time
+
+    return summarize_results(url, concurrency, results, duration)
+
+
+def _send_requests(
+    url_parts: urllib.parse.SplitResult,
+    request_paths: List[RequestPath],
+    timeout: float,
+) -> List[RequestResult]:
+    connection_class = (
+        http.client.HTTPSConnection
+        if url_parts.scheme == "https"
+        else http.client.HTTPConnection
+    )
+    connection = connection_class(url_parts.netloc, timeout=timeout)
+    base_path = url_parts.path.rstrip("/")
+
+    results = []
+    try:
+        for kind, path in request_paths:
+            start_time = time.perf_counter()
+            status: Optional[int]
+            try:
+                # The connection is kept alive between requests
+                connection.request("GET", base_path + path)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                # Connect again with the next request
+                connection.close()
+                status = None
+            results.append(
+                RequestResult(kind, status, time.perf_counter() - start_time)
+            )
+    finally:
+        connection.close()
+
+    return results
+
+
+def summarize_results(
+    url: str, concurrency: int, results: List[RequestResult], duration: float
+) -> Dict[str, Any]:
+    """the JSON serializable report of the results of a load test
+
+    Requests are counted as errors if they did not get the status expected
+    for their kind of address."""
+    latencies = sorted(result.latency for result in results)
+    errors = [
+        result for result in results if result.status != EXPECTED_STATUS[result.kind]
+    ]
+    statuses: Dict[str, int] = {}
+    for result in results:
+        status = "failed" if result.status is None else str(result.status)
+        statuses[status] = statuses.get(status, 0) + 1
+
+    return {
+        "url": url,
+        "concurrency": concurrency,
+        "requests": len(results),
+        "duration_seconds": duration,
+        "throughput": len(results) / duration if duration > 0 else 0.0,
+        "latency_seconds": {
+            "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "p99": _percentile(latencies, 99),
+            "max": latencies[-1] if latencies else 0.0,
+        },
+        "errors": len(errors),
+        "error_rate": len(errors) / len(results) if results else 0.0,
+        "statuses": statuses,
+        "kinds": {
+            kind: {
+                "requests": sum(1 for result in results if result.kind == kind),
+                "errors": sum(1 for result in errors if result.kind == kind),
+            }
+            for kind in ADDRESS_KINDS
+        },
+    }
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    # Nearest rank
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(percentile / 100 * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+@contextlib.contextmanager
+def start_local_server(
+    airdrop_file_name: str,
+    decay_start_time: int,
+    decay_duration_in_seconds: int,
+    precompute: bool = False,
+    cache_size: int = 0,
+) -> Iterator[str]:
+    """serve the Flask application in a local process and yield its URL
+
+    It runs in its own process, so that it does not compete with the load
+    test for the GIL."""
+    port_queue: multiprocessing.Queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=_serve,
+        args=(
+            airdrop_file_name,
+            decay_start_time,
+            decay_duration_in_seconds,
+            precompute,
+            cache_size,
+            port_queue,
+        ),
+        daemon=True,
+    )
+    process.start()
+    try:
+        # Building the tree of a large airdrop takes a while
+        while True:
+            try:
+                port = port_queue.get(timeout=1)
+                break
+            except queue.Empty:
+                if not process.is_alive():
+                    raise RuntimeError("The local server exited during startup")
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        process.join()
+
+
+def _serve(
+    airdrop_file_name: str,
+    decay_start_time: int,
+    decay_duration_in_seconds: int,
+    precompute: bool,
+    cache_size: int,
+    port_queue: multiprocessing.Queue,
+) -> None:
+    from werkzeug.serving import make_server
+
+    from . import server
+
+    # Do not log every request
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server.init(
+        airdrop_file_name,
+        decay_start_time,
+        decay_duration_in_seconds,
+        precompute=precompute,
+        cache_size=cache_size,
+    )
+    http_server = make_server("127.0.0.1", 0, server.app, threaded=True)
+    port_queue.put(http_server.socket.getsockname()[1])
+    http_server.serve_forever()
@@ -1,6 +1,27 @@
-from typing import List, NamedTuple, Optional
-
-from eth_utils import is_canonical_address, keccak
+import concurrent.futures
+import itertools
+import math
+from typing import (
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from eth_utils import is_canonical_address
+
+from .hashing import (
+    ADDRESS_LENGTH,
+    HASH_LENGTH,
+    VALUE_LENGTH,
+    hash_leaves,
+    hash_parents,
+    keccak,
+)
 
 
 class Item(NamedTuple):
@@ -8,63 +29,303 @@ class Item(NamedTuple):
     value: int
 
 
-class Tree:
-    def __init__(self, root, leaves: List["Node"]):
-        self.root = root
-        self.leaves = leaves
+class FlatTree:
+    """Merkle tree storing every level as one buffer of concatenated hashes.
+
+    `levels[0]` holds the leaf hashes in sorted item order and `levels[-1]`
+    only the root hash. The sibling of the node at index `i` is at `i ^ 1`
+    and its parent at `i // 2` on the next level. The last node of a level
+    with an odd number of nodes has no sibling and is promoted unchanged.
+
+    `addresses` holds the concatenated addresses of the leaves in the same
+    order, so that leaves can be found with a binary search.
+    """
+
+    def __init__(self, levels: Sequence[bytes], addresses: bytes):
+        self.levels = levels
+        self.addresses = addresses
+
+    @property
+    def root_hash(self) -> bytes:
+        return bytes(self.levels[-1])
+
+    @property
+    def depth(self) -> int:
+        return len(self.levels) - 1
+
+    def __len__(self) -> int:
+        return len(self.levels[0]) // HASH_LENGTH
+
+    def get_hash(self, level: int, index: int) -> bytes:
+        offset = index * HASH_LENGTH
+        return bytes(self.levels[level][offset : offset + HASH_LENGTH])
+
+    def get_address(self, index: int) -> bytes:
+        offset = index * ADDRESS_LENGTH
+        return bytes(self.addresses[offset : offset + ADDRESS_LENGTH])
+
+    def find_address(self, address: bytes) -> Optional[int]:
+        index = bisect_packed(self.addresses, ADDRESS_LENGTH, address)
+        if index < len(self) and self.get_address(index) == address:
+            return index
+        return None
+
+    def find_leaf(self, item: Item) -> Optional[int]:
+        leaf_hash = compute_leaf_hash(item)
+        index = self.find_address(item.address)
+        if index is None:
+            return None
+
+        # Items with the same address are next to each other
+        while index < len(self) and self.get_address(index) == item.address:
+            if self.get_hash(0, index) == leaf_hash:
+                return index
+            index += 1
+
+        return None
+
+
+def compute_merkle_root(items: List[Item]) -> bytes:
+
+    return compute_root_from_leaf_hashes(
+        compute_leaf_hash(item) for item in sorted(items)
+    )
+
+
+def compute_root_from_leaf_hashes(leaf_hashes: Iterable[bytes]) -> bytes:
+    """Compute the root of the tree of the sorted leaf hashes in one pass
+
+    Only one pending hash per level is kept, waiting for its right sibling,
+    so the memory use is logarithmic in the number of leaves.
+    """
+    _keccak = keccak
+    pending_hashes: List[Optional[bytes]] = []
+    for leaf_hash in leaf_hashes:
+        node_hash = leaf_hash
+        for level, pending_hash in enumerate(pending_hashes):
+            if pending_hash is None:
+                pending_hashes[level] = node_hash
+                break
+            if pending_hash < node_hash:
+                node_hash = _keccak(pending_hash + node_hash)
+            else:
+                node_hash = _keccak(node_hash + pending_hash)
+            pending_hashes[level] = None
+        else:
+            pending_hashes.append(node_hash)
+
+    # A pending hash is the last node of an odd level. Without a node from
+    # a lower level to pair with, it is promoted like in the complete tree.
+    root_hash = None
+    for pending_hash in pending_hashes:
+        if pending_hash is None:
+            continue
+        if root_hash is None:
+            root_hash = pending_hash
+        else:
+            root_hash = compute_parent_hash(pending_hash, root_hash)
+
+    if root_hash is None:
+        raise ValueError("Can not compute root without leaves")
+
+    return root_hash
 
 
-class Node:
-    def __init__(
-        self,
-        hash: bytes,
-        *,
-        parent: "Node" = None,
-        # left and right is arbitrary
-        left_child: "Node" = None,
-        right_child: "Node" = None,
-    ):
-        self.hash = hash
-        self.parent = parent
-        self.left_child = left_child
-        self.right_child = right_child
+def build_tree(items: List[Item], workers: int = 1) -> FlatTree:
 
-    def __repr__(self):
-        return f"Node({self.hash!r}, {self.parent!r}, {self.left_child!r}, {self.right_child!r})"
+    if len(items) == 0:
+        raise ValueError("Can not build tree without items")
 
+    addresses, values = _pack_items(sorted(items))
+    return build_packed_tree(addresses, values, workers)
 
-def compute_merkle_root(items: List[Item]):
 
-    return build_tree(items).root.hash
+def build_packed_tree(addresses: bytes, values: bytes, workers: int = 1) -> FlatTree:
+    """Build the tree of packed items, which must already be sorted by address
 
+    The tree shares the address buffer instead of copying it.
+    """
+    number_of_leaves = len(addresses) // ADDRESS_LENGTH
+    if number_of_leaves == 0:
+        raise ValueError("Can not build tree without items")
 
-def build_tree(items: List[Item]) -> Tree:
+    if workers > 1 and number_of_leaves > 1:
+        levels = _build_levels_in_parallel(addresses, values, workers)
+    else:
+        levels = _build_levels(addresses, values)
 
-    current_nodes = leaves = _build_leaves(items)
-    next_nodes = []
+    return FlatTree(levels, addresses)
 
-    while len(current_nodes) > 1:
 
-        for (node1, node2) in zip(current_nodes[0::2], current_nodes[1::2]):
-            parent = Node(
-                compute_parent_hash(node1.hash, node2.hash),
-                # left and right is arbitrary
-                left_child=node1,
-                right_child=node2,
+def _pack_items(sorted_items: List[Item]) -> Tuple[bytes, bytes]:
+    addresses = [address for address, _ in sorted_items]
+    if set(map(len, addresses)) != {ADDRESS_LENGTH}:
+        raise ValueError("Address must be a canonical address")
+
+    try:
+        packed_addresses = b"".join(addresses)
+        packed_values = b"".join(
+            value.to_bytes(VALUE_LENGTH, "big") for _, value in sorted_items
+        )
+    except TypeError as e:
+        raise ValueError("Address must be a canonical address") from e
+    except OverflowError as e:
+        raise ValueError("value is negative or too large") from e
+
+    return packed_addresses, packed_values
+
+
+def _build_levels(addresses: bytes, values: bytes) -> List[bytes]:
+    levels = [hash_leaves(addresses, values)]
+    _add_levels_up_to_root(levels)
+    return levels
+
+
+def _build_subtree_levels(addresses: bytes, values: bytes, height: int) -> List[bytes]:
+    levels = [hash_leaves(addresses, values)]
+    for _ in range(height):
+        levels.append(hash_parents(levels[-1]))
+    return levels
+
+
+def _add_levels_up_to_root(levels: List[bytes]) -> None:
+    while len(levels[-1]) > HASH_LENGTH:
+        levels.append(hash_parents(levels[-1]))
+
+
+def _build_levels_in_parallel(
+    addresses: bytes, values: bytes, workers: int
+) -> List[bytes]:
+    # The nodes of a subtree with 2 ** height leaves starting at a multiple of
+    # 2 ** height are only paired among each other up to its root. A smaller
+    # last subtree has the same levels as in the complete tree as well, since
+    # its last node gets promoted on both.
+    number_of_leaves = len(addresses) // ADDRESS_LENGTH
+    height = max(0, math.ceil(math.log2(number_of_leaves / workers)))
+    subtree_size = 2 ** height
+    starts = range(0, number_of_leaves, subtree_size)
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        subtrees = list(
+            executor.map(
+                _build_subtree_levels,
+                (
+                    addresses[
+                        start * ADDRESS_LENGTH : (start + subtree_size) * ADDRESS_LENGTH
+                    ]
+                    for start in starts
+                ),
+                (
+                    values[start * VALUE_LENGTH : (start + subtree_size) * VALUE_LENGTH]
+                    for start in starts
+                ),
+                itertools.repeat(height),
             )
-            node1.parent = parent
-            node2.parent = parent
-            next_nodes.append(parent)
+        )
+
+    levels = [
+        b"".join(subtree_levels[level] for subtree_levels in subtrees)
+        for level in range(height + 1)
+    ]
+    _add_levels_up_to_root(levels)
+
+    return levels
+
+
+def update_tree(tree: FlatTree, changes: Mapping[bytes, Optional[int]]) -> FlatTree:
+    """Apply value changes, inserts and removals to the tree of an airdrop
+
+    `changes` maps addresses to their new values, or to `None` to remove
+    them. Only the paths from changed leaves to the root are rehashed, plus
+    all nodes from the first inserted or removed leaf onward, since their
+    positions shift. The result is the same tree as a full rebuild.
+    """
+    address_parts = []
+    leaf_hash_parts = []
+    changed_indices = []
+    # The index of the first leaf, whose position shifts
+    shift_start: Optional[int] = None
+    old_index = 0
+    new_length = 0
+
+    for address in sorted(changes):
+        if len(address) != ADDRESS_LENGTH:
+            raise ValueError("Address must be a canonical address")
+
+        index = bisect_packed(tree.addresses, ADDRESS_LENGTH, address)
+        exists = index < len(tree) and tree.get_address(index) == address
+        if exists and index + 1 < len(tree) and tree.get_address(index + 1) == address:
+            raise ValueError("Can not update an address contained multiple times")
+
+        address_parts.append(
+            tree.addresses[old_index * ADDRESS_LENGTH : index * ADDRESS_LENGTH]
+        )
+        leaf_hash_parts.append(
+            tree.levels[0][old_index * HASH_LENGTH : index * HASH_LENGTH]
+        )
+        new_length += index - old_index
+        old_index = index + 1 if exists else index
+
+        value = changes[address]
+        if value is None:
+            if not exists:
+                raise ValueError("Can not remove missing address")
+        else:
+            address_parts.append(address)
+            leaf_hash_parts.append(compute_leaf_hash(Item(address, value)))
+            changed_indices.append(new_length)
+            new_length += 1
+
+        if not exists or value is None:
+            if shift_start is None:
+                shift_start = new_length - 1 if value is not None else new_length
+
+    address_parts.append(tree.addresses[old_index * ADDRESS_LENGTH :])
+    leaf_hash_parts.append(tree.levels[0][old_index * HASH_LENGTH :])
+    new_length += len(tree) - old_index
+    if new_length == 0:
+        raise ValueError("Can not build tree without items")
+
+    levels = [b"".join(leaf_hash_parts)]
+    while len(levels[-1]) > HASH_LENGTH:
+        level = levels[-1]
+        level_length = len(level) // HASH_LENGTH
+        if shift_start is None:
+            # The number of nodes is unchanged, so there is no shift
+            parent_shift_start = (level_length + 1) // 2
+        else:
+            # A removal at the end changes, whether the last node is promoted
+            shift_start = min(shift_start, level_length - 1)
+            parent_shift_start = shift_start // 2
+            shift_start = parent_shift_start
+
+        old_parents = (
+            tree.levels[len(levels)] if len(levels) < len(tree.levels) else b""
+        )
+        parents = bytearray(old_parents[: parent_shift_start * HASH_LENGTH])
+        parents += hash_parents(level[2 * parent_shift_start * HASH_LENGTH :])
+
+        changed_indices = sorted(
+            {index // 2 for index in changed_indices if index // 2 < parent_shift_start}
+        )
+        for index in changed_indices:
+            offset = index * HASH_LENGTH
+            parents[offset : offset + HASH_LENGTH] = _hash_parent(level, index)
 
-        if len(current_nodes) % 2 != 0:
-            next_nodes.append(current_nodes[-1])
+        levels.append(bytes(parents))
 
-        current_nodes = next_nodes
-        next_nodes = []
+    return FlatTree(levels, b"".join(address_parts))
 
-    tree = Tree(current_nodes[0], leaves)
 
-    return tree
+def _hash_parent(level: bytes, index: int) -> bytes:
+    left_offset = 2 * index * HASH_LENGTH
+    right_offset = left_offset + HASH_LENGTH
+    left_hash = bytes(level[left_offset:right_offset])
+    if right_offset == len(level):
+        return left_hash
+    return compute_parent_hash(
+        left_hash, bytes(level[right_offset : right_offset + HASH_LENGTH])
+    )
 
 
 def compute_leaf_hash(item: Item) -> bytes:
@@ -78,10 +339,15 @@ def compute_leaf_hash(item: Item) -> bytes:
     return keccak(address + value.to_bytes(32, "big"))
 
 
-def _build_leaves(items: List[Item]) -> List[Node]:
-    sorted_items = sorted(items)
-    hashes = [compute_leaf_hash(item) for item in sorted_items]
-    return [Node(h) for h in hashes]
+def bisect_packed(buffer: bytes, width: int, key: bytes) -> int:
+    low, high = 0, len(buffer) // width
+    while low < high:
+        middle = (low + high) // 2
+        if bytes(buffer[middle * width : (middle + 1) * width]) < key:
+            low = middle + 1
+        else:
+            high = middle
+    return low
 
 
 def compute_parent_hash(left_hash: bytes, right_hash: bytes) -> bytes:
@@ -89,51 +355,57 @@ def compute_parent_hash(left_hash: bytes, right_hash: bytes) -> bytes:
     return keccak(little_child_hash + big_child_hash)
 
 
-def in_tree(item: Item, root: Node) -> bool:
-    def _in_tree(item_hash: bytes, root: Optional[Node]) -> bool:
+def in_tree(item: Item, tree: FlatTree) -> bool:
 
-        if root is None:
-            return False
+    return tree.find_leaf(item) is not None
 
-        if root.hash == item_hash:
-            return True
 
-        return _in_tree(item_hash, root.left_child) or _in_tree(
-            item_hash, root.right_child
-        )
+def create_proof(item: Item, tree: FlatTree) -> List[bytes]:
 
-    return _in_tree(compute_leaf_hash(item), root)
+    index = tree.find_leaf(item)
 
+    if index is None:
+        raise ValueError("Can not create proof for missing item")
 
-def create_proof(item: Item, tree: Tree) -> List[bytes]:
+    return create_proof_at_index(index, tree)
 
-    leaf_hash = compute_leaf_hash(item)
-    leaf = next((leave for leave in tree.leaves if leave.hash == leaf_hash), None)
 
-    proof = []
+def create_proof_at_index(index: int, tree: FlatTree) -> List[bytes]:
 
-    if leaf is None:
-        raise ValueError("Can not create proof for missing item")
+    if not 0 <= index < len(tree):
+        raise IndexError("Leaf index out of range")
+
+    proof = []
 
-    while leaf.parent is not None:
-        parent = leaf.parent
+    for level in range(tree.depth):
+        sibling_index = index ^ 1
+        # The last node of a level with an odd number of nodes has no sibling
+        if sibling_index * HASH_LENGTH < len(tree.levels[level]):
+            proof.append(tree.get_hash(level, sibling_index))
+        index //= 2
 
-        if parent.left_child == leaf:
-            if parent.right_child is None:
-                raise RuntimeError("Right child was none, invalid tree")
+    return proof
 
-            proof.append(parent.right_child.hash)
-        elif parent.right_child == leaf:
-            if parent.left_child is None:
-                raise RuntimeError("Left child was none, invalid tree")
 
-            proof.append(parent.left_child.hash)
-        else:
-            raise RuntimeError("Item was not child of parent, invalid tree")
+def create_all_proofs(tree: FlatTree) -> Iterator[List[bytes]]:
+    """create the proofs of all leaves in index order in a single pass
 
-        leaf = leaf.parent
+    Consecutive leaves share the siblings of the upper levels, so the sibling
+    on a level is only looked up again when the index moves to the next node
+    of that level."""
+    siblings: List[Optional[bytes]] = [None] * tree.depth
 
-    return proof
+    for index in range(len(tree)):
+        for level in range(tree.depth):
+            if index % (1 << level) != 0:
+                break
+            sibling_index = (index >> level) ^ 1
+            # The last node of a level with an odd number of nodes has no sibling
+            if sibling_index * HASH_LENGTH < len(tree.levels[level]):
+                siblings[level] = tree.get_hash(level, sibling_index)
+            else:
+                siblings[level] = None
+        yield [sibling for sibling in siblings if sibling is not None]
 
 
 def validate_proof(item: Item, proof: List[bytes], root_hash: bytes):
@@ -144,3 +416,147 @@ def validate_proof(item: Item, proof: List[bytes], root_hash: bytes):
         hash = compute_parent_hash(hash, h)
 
     return hash == root_hash
+
+
+def validate_proofs(
+    items_and_proofs: Iterable[Tuple[Item, Sequence[bytes]]], root_hash: bytes
+) -> Iterator[bool]:
+    """Validate many proofs, like `validate_proof` for each of them
+
+    The parent hashes of the previous proof are reused where a proof takes
+    the same path. For proofs in the order of the leaves, like the ones
+    written by the `proofs` command, this takes about two hashes per proof
+    instead of one per level.
+    """
+    _keccak = keccak
+    # The child hashes and the parent hash of the previous proof per level
+    previous_path: List[Tuple[bytes, bytes, bytes]] = []
+    for item, proof in items_and_proofs:
+        hash_ = compute_leaf_hash(item)
+        for level, sibling_hash in enumerate(proof):
+            if level < len(previous_path):
+                previous_hash, previous_sibling_hash, parent_hash = previous_path[level]
+                if previous_hash == hash_ and previous_sibling_hash == sibling_hash:
+                    hash_ = parent_hash
+                    continue
+
+            if hash_ < sibling_hash:
+                parent_hash = _keccak(hash_ + sibling_hash)
+            else:
+                parent_hash = _keccak(sibling_hash + hash_)
+            if level < len(previous_path):
+                previous_path[level] = (hash_, sibling_hash, parent_hash)
+            else:
+                previous_path.append((hash_, sibling_hash, parent_hash))
+            hash_ = parent_hash
+
+        yield hash_ == root_hash
+
+
+# The steps of a multiproof, see `MultiProof`
+HASH_WITH_PROOF = 0
+HASH_WITH_NODE = 1
+PROMOTE = 2
+
+
+class MultiProof(NamedTuple):
+    """A proof for many items at once, as verified by `verifyMultiProof`
+
+    The known nodes, starting with the leaf hashes of the items in the order
+    of the tree, form a queue. Every flag takes the next node from the queue
+    and either hashes it with the next hash of `proof`, hashes it with the
+    node after it, or promotes it unchanged as the last node of a level with
+    an odd number of nodes. The parent is appended to the queue, so the
+    nodes are processed level by level and the last parent is the root.
+    Siblings shared by the items are only part of the proof once, and
+    siblings that follow from the items are not part of it at all.
+    """
+
+    proof: List[bytes]
+    flags: bytes
+
+
+def create_multiproof(items: Iterable[Item], tree: FlatTree) -> MultiProof:
+    """create a multiproof for the items, which are verified in sorted order"""
+    indices = []
+    for item in items:
+        index = tree.find_leaf(item)
+        if index is None:
+            raise ValueError("Can not create multiproof for missing item")
+        indices.append(index)
+
+    return create_multiproof_at_indices(indices, tree)
+
+
+def create_multiproof_at_indices(indices: Iterable[int], tree: FlatTree) -> MultiProof:
+    level_indices = sorted(indices)
+    if not level_indices:
+        raise ValueError("Can not create multiproof without items")
+    if len(set(level_indices)) != len(level_indices):
+        raise ValueError("Can not create multiproof for the same item twice")
+    if not 0 <= level_indices[0] <= level_indices[-1] < len(tree):
+        raise IndexError("Leaf index out of range")
+
+    proof = []
+    flags = bytearray()
+    for level in range(tree.depth):
+        level_size = len(tree.levels[level]) // HASH_LENGTH
+        parent_indices = []
+        position = 0
+        while position < len(level_indices):
+            index = level_indices[position]
+            sibling_index = index ^ 1
+            if sibling_index == level_size:
+                flags.append(PROMOTE)
+                position += 1
+            elif (
+                position + 1 < len(level_indices)
+                and level_indices[position + 1] == sibling_index
+            ):
+                flags.append(HASH_WITH_NODE)
+                position += 2
+            else:
+                flags.append(HASH_WITH_PROOF)
+                proof.append(tree.get_hash(level, sibling_index))
+                position += 1
+            parent_indices.append(index // 2)
+        level_indices = parent_indices
+
+    return MultiProof(proof, bytes(flags))
+
+
+def validate_multiproof(
+    items: Sequence[Item], multiproof: MultiProof, root_hash: bytes
+) -> bool:
+    """Validate a multiproof of the items in sorted order, like the contract"""
+    nodes = [compute_leaf_hash(item) for item in items]
+    if not nodes:
+        return False
+
+    node_position = 0
+    proof_position = 0
+    for flag in multiproof.flags:
+        if node_position == len(nodes):
+            return False
+        hash_ = nodes[node_position]
+        node_position += 1
+        if flag == HASH_WITH_PROOF:
+            if proof_position == len(multiproof.proof):
+                return False
+            hash_ = compute_parent_hash(hash_, multiproof.proof[proof_position])
+            proof_position += 1
+        elif flag == HASH_WITH_NODE:
+            if node_position == len(nodes):
+                return False
+            hash_ = compute_parent_hash(hash_, nodes[node_position])
+            node_position += 1
+        elif flag != PROMOTE:
+            return False
+        nodes.append(hash_)
+
+    # Every node except the root and every hash of the proof has to be used
+    return (
+        node_position == len(nodes) - 1
+        and proof_position == len(multiproof.proof)
+        and nodes[-1] == root_hash
+    )
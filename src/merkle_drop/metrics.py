@@ -0,0 +1,146 @@
+"""Prometheus metrics of the entitlement API
+
+The metrics are only collected if prometheus_client is installed, e.g. with
+`pip install merkle-drop[metrics]`. Otherwise all functions do nothing and
+`available` is False.
+
+With several gunicorn workers, set the environment variable
+PROMETHEUS_MULTIPROC_DIR to an empty directory before starting gunicorn, so
+that the metrics of all workers are collected from there.
+"""
+import os
+import time
+from typing import Optional, Tuple
+
+from .entitlement import EntitlementCache, EntitlementState
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+available = prometheus_client is not None
+
+METRICS_PATH = "/metrics"
+
+# Most requests are answered in well below a millisecond
+LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    10.0,
+)
+
+if prometheus_client is not None:
+    REQUESTS = prometheus_client.Counter(
+        "merkle_drop_requests",
+        "Number of requests by endpoint and status",
+        ["endpoint", "status"],
+    )
+    REQUEST_DURATION = prometheus_client.Histogram(
+        "merkle_drop_request_duration_seconds",
+        "Time to answer requests by endpoint",
+        ["endpoint"],
+        buckets=LATENCY_BUCKETS,
+    )
+    PROOF_DURATION = prometheus_client.Histogram(
+        "merkle_drop_proof_duration_seconds",
+        "Time to create the proof and encode the entitlement of an address",
+        buckets=LATENCY_BUCKETS,
+    )
+    # The cache counters start from zero when the state is loaded
+    CACHE_HITS = prometheus_client.Gauge(
+        "merkle_drop_entitlement_cache_hits",
+        "Number of entitlements found in the cache",
+        multiprocess_mode="livesum",
+    )
+    CACHE_MISSES = prometheus_client.Gauge(
+        "merkle_drop_entitlement_cache_misses",
+        "Number of entitlements not found in the cache",
+        multiprocess_mode="livesum",
+    )
+    CACHE_EVICTIONS = prometheus_client.Gauge(
+        "merkle_drop_entitlement_cache_evictions",
+        "Number of entitlements evicted from the cache",
+        multiprocess_mode="livesum",
+    )
+    TREE_ENTRIES = prometheus_client.Gauge(
+        "merkle_drop_tree_entries",
+        "Number of entries of the merkle tree",
+        multiprocess_mode="liveall",
+    )
+    TREE_DEPTH = prometheus_client.Gauge(
+        "merkle_drop_tree_depth",
+        "Depth of the merkle tree, which is the maximum length of a proof",
+        multiprocess_mode="liveall",
+    )
+    LOAD_DURATION = prometheus_client.Gauge(
+        "merkle_drop_load_duration_seconds",
+        "Time spent loading and building the merkle tree",
+        multiprocess_mode="liveall",
+    )
+
+
+def observe_request(endpoint: str, status: int, start_time: float) -> None:
+    """record a request started at `start_time` of `time.perf_counter`"""
+    if prometheus_client is None:
+        return
+    REQUESTS.labels(endpoint, str(status)).inc()
+    REQUEST_DURATION.labels(endpoint).observe(time.perf_counter() - start_time)
+
+
+def observe_proof(start_time: float) -> None:
+    if prometheus_client is None:
+        return
+    PROOF_DURATION.observe(time.perf_counter() - start_time)
+
+
+def observe_cache(entitlement_cache: Optional[EntitlementCache]) -> None:
+    if prometheus_client is None or entitlement_cache is None:
+        return
+    CACHE_HITS.set(entitlement_cache.hits)
+    CACHE_MISSES.set(entitlement_cache.misses)
+    CACHE_EVICTIONS.set(entitlement_cache.evictions)
+
+
+def observe_state(state: EntitlementState, load_duration: float) -> None:
+    """record the tree of a newly loaded state and the time it took to load"""
+    if prometheus_client is None:
+        return
+    TREE_ENTRIES.set(len(state.tree))
+    TREE_DEPTH.set(state.tree.depth)
+    LOAD_DURATION.set(load_duration)
+    observe_cache(state.entitlement_cache)
+
+
+def generate_metrics() -> Tuple[bytes, str]:
+    """the metrics in the text format and its content type"""
+    assert prometheus_client is not None, "prometheus_client is not installed"
+    if _get_multiprocess_directory() is None:
+        registry = prometheus_client.REGISTRY
+    else:
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return (
+        prometheus_client.generate_latest(registry),
+        prometheus_client.CONTENT_TYPE_LATEST,
+    )
+
+
+def _get_multiprocess_directory() -> Optional[str]:
+    # The lower case name is used by prometheus_client before 0.10
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR") or os.environ.get(
+        "prometheus_multiproc_dir"
+    )
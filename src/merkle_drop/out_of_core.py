@@ -0,0 +1,322 @@
+"""Out-of-core build of snapshots for airdrops larger than the memory.
+
+The airdrop file is read in runs fitting into the memory budget, which are
+sorted by address and written to run files. The runs are merged into the
+addresses, values and leaf hashes of the snapshot file. The levels are then
+hashed one after another, reading the previous level from the snapshot
+file itself.
+
+All intermediate files are kept in a work directory together with a
+manifest of the completed steps, so that an interrupted build continues
+where it stopped when it is started again with the same work directory.
+"""
+import csv
+import heapq
+import json
+import os
+import shutil
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Tuple
+
+from .hashing import ADDRESS_LENGTH, HASH_LENGTH, hash_leaves, hash_parents
+from .load_csv import (
+    LINE_NUMBER_LENGTH,
+    RECORD_LENGTH,
+    AirdropFileError,
+    encode_record,
+    open_airdrop_file,
+    parse_address_value_pair,
+    skip_duplicate_records,
+)
+from .snapshot import level_lengths, section_offsets, write_header
+
+DEFAULT_MEMORY_BUDGET = 256 * 1024 ** 2
+
+MANIFEST_FILE_NAME = "manifest.json"
+PARTIAL_SNAPSHOT_FILE_NAME = "snapshot.partial"
+RUN_FILE_PREFIX = "run-"
+
+# The run records are those of load_csv.encode_record. The estimated memory
+# of a record while sorting a run, including the overhead of the bytes object
+# and the list entry
+_RECORD_MEMORY = 128
+_BATCH_SIZE = 65536
+
+Manifest = Dict[str, Any]
+
+
+def build_snapshot_out_of_core(
+    airdrop_file_name: str,
+    snapshot_file_name: str,
+    work_directory: str,
+    decay_start_time: int,
+    decay_duration_in_seconds: int,
+    memory_budget: int = DEFAULT_MEMORY_BUDGET,
+) -> bytes:
+    """build a snapshot of the airdrop file and return its merkle root"""
+    os.makedirs(work_directory, exist_ok=True)
+    manifest = _load_manifest(work_directory, _fingerprint(airdrop_file_name))
+    partial_file_name = os.path.join(work_directory, PARTIAL_SNAPSHOT_FILE_NAME)
+
+    if not manifest["sorted"]:
+        _sort_into_runs(airdrop_file_name, work_directory, manifest, memory_budget)
+
+    number_of_entries = manifest["number_of_entries"]
+    if number_of_entries == 0:
+        raise ValueError("Can not build tree without items")
+
+    if not manifest["merged"]:
+        _merge_runs(partial_file_name, work_directory, manifest, memory_budget)
+
+    _hash_levels(partial_file_name, work_directory, manifest, memory_budget)
+
+    offsets = section_offsets(number_of_entries)
+    with open(partial_file_name, "r+b") as file:
+        file.seek(offsets[-2])
+        root_hash = file.read(HASH_LENGTH)
+        file.seek(0)
+        write_header(
+            file,
+            number_of_entries,
+            len(level_lengths(number_of_entries)) - 1,
+            decay_start_time,
+            decay_duration_in_seconds,
+        )
+        file.write(root_hash)
+
+    os.remove(os.path.join(work_directory, MANIFEST_FILE_NAME))
+    shutil.move(partial_file_name, snapshot_file_name)
+
+    return root_hash
+
+
+def _fingerprint(airdrop_file_name: str) -> Dict[str, Any]:
+    stat = os.stat(airdrop_file_name)
+    return {
+        "path": os.path.abspath(airdrop_file_name),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def _load_manifest(work_directory: str, fingerprint: Dict[str, Any]) -> Manifest:
+    try:
+        with open(os.path.join(work_directory, MANIFEST_FILE_NAME)) as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        manifest = None
+
+    if manifest is not None and manifest["airdrop_file"] == fingerprint:
+        return manifest
+
+    # Start from scratch, the airdrop file might have changed
+    for entry in os.scandir(work_directory):
+        if entry.name.startswith(RUN_FILE_PREFIX):
+            os.remove(entry.path)
+
+    return {
+        "airdrop_file": fingerprint,
+        "runs": [],
+        "lines_read": 0,
+        "number_of_entries": 0,
+        "sorted": False,
+        "merged": False,
+        "hashed_levels": 0,
+    }
+
+
+def _save_manifest(work_directory: str, manifest: Manifest) -> None:
+    manifest_file_name = os.path.join(work_directory, MANIFEST_FILE_NAME)
+    with open(manifest_file_name + ".tmp", "w") as file:
+        json.dump(manifest, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(manifest_file_name + ".tmp", manifest_file_name)
+
+
+def _sort_into_runs(
+    airdrop_file_name: str,
+    work_directory: str,
+    manifest: Manifest,
+    memory_budget: int,
+) -> None:
+    records_per_run = max(1, memory_budget // _RECORD_MEMORY)
+    errors: List[Tuple[int, str]] = []
+    run: List[bytes] = []
+
+    with open_airdrop_file(airdrop_file_name) as file:
+        reader = csv.reader(file)
+        for address_value_pair in reader:
+            line_number = reader.line_num
+            if line_number <= manifest["lines_read"]:
+                # Already in a run of an earlier attempt
+                continue
+
+            try:
+                address, value = parse_address_value_pair(
+                    address_value_pair, line_number
+                )
+                record = encode_record(line_number, address, value)
+            except ValueError as e:
+                errors.append((line_number, str(e)))
+                continue
+            except OverflowError:
+                errors.append(
+                    (
+                        line_number,
+                        f"Expected value below 2 ** 256 in line {line_number}, "
+                        f"but got {value}",
+                    )
+                )
+                continue
+
+            run.append(record)
+            if len(run) == records_per_run:
+                _write_run(work_directory, manifest, run)
+                # After an error, the runs are only written to find the
+                # duplicates, so that a new attempt reports the errors again
+                if not errors:
+                    manifest["lines_read"] = line_number
+                    _save_manifest(work_directory, manifest)
+                run = []
+
+    if run:
+        _write_run(work_directory, manifest, run)
+
+    if errors:
+        # Report the duplicate addresses of the valid lines as well
+        run_file_names = [
+            os.path.join(work_directory, run_file_name)
+            for run_file_name in manifest["runs"]
+        ]
+        for _ in skip_duplicate_records(
+            _merge_records(run_file_names, memory_budget), errors
+        ):
+            pass
+        raise AirdropFileError([message for _, message in sorted(errors)])
+
+    manifest["sorted"] = True
+    _save_manifest(work_directory, manifest)
+
+
+def _write_run(work_directory: str, manifest: Manifest, run: List[bytes]) -> None:
+    run.sort()
+    run_file_name = f"{RUN_FILE_PREFIX}{len(manifest['runs'])}"
+    with open(os.path.join(work_directory, run_file_name), "wb") as file:
+        file.writelines(run)
+        file.flush()
+        os.fsync(file.fileno())
+
+    manifest["runs"].append(run_file_name)
+    manifest["number_of_entries"] += len(run)
+
+
+def _read_run(run_file_name: str, buffer_size: int) -> Iterator[bytes]:
+    with open(run_file_name, "rb") as file:
+        for chunk in iter(lambda: file.read(buffer_size), b""):
+            for offset in range(0, len(chunk), RECORD_LENGTH):
+                yield chunk[offset : offset + RECORD_LENGTH]
+
+
+def _merge_runs(
+    partial_file_name: str,
+    work_directory: str,
+    manifest: Manifest,
+    memory_budget: int,
+) -> None:
+    number_of_entries = manifest["number_of_entries"]
+    offsets = section_offsets(number_of_entries)
+    with open(partial_file_name, "wb") as file:
+        file.truncate(offsets[-1])
+
+    run_file_names = [
+        os.path.join(work_directory, run_file_name)
+        for run_file_name in manifest["runs"]
+    ]
+    errors: List[Tuple[int, str]] = []
+    records = skip_duplicate_records(
+        _merge_records(run_file_names, memory_budget), errors
+    )
+
+    with open(partial_file_name, "r+b") as addresses_file, open(
+        partial_file_name, "r+b"
+    ) as values_file, open(partial_file_name, "r+b") as leaves_file:
+        addresses_file.seek(offsets[1])
+        values_file.seek(offsets[2])
+        leaves_file.seek(offsets[3])
+
+        addresses: List[bytes] = []
+        values: List[bytes] = []
+        for record in records:
+            addresses.append(record[:ADDRESS_LENGTH])
+            values.append(record[ADDRESS_LENGTH + LINE_NUMBER_LENGTH :])
+            if len(addresses) == _BATCH_SIZE:
+                _write_leaves(
+                    addresses_file, values_file, leaves_file, addresses, values
+                )
+                addresses, values = [], []
+
+        _write_leaves(addresses_file, values_file, leaves_file, addresses, values)
+        for file in (addresses_file, values_file, leaves_file):
+            file.flush()
+            os.fsync(file.fileno())
+
+    if errors:
+        raise AirdropFileError([message for _, message in sorted(errors)])
+
+    manifest["merged"] = True
+    _save_manifest(work_directory, manifest)
+    for run_file_name in run_file_names:
+        os.remove(run_file_name)
+
+
+def _merge_records(run_file_names: List[str], memory_budget: int) -> Iterable[bytes]:
+    records_per_buffer = max(
+        1, memory_budget // (2 * max(1, len(run_file_names)) * RECORD_LENGTH)
+    )
+    return heapq.merge(
+        *(
+            _read_run(run_file_name, records_per_buffer * RECORD_LENGTH)
+            for run_file_name in run_file_names
+        )
+    )
+
+
+def _write_leaves(
+    addresses_file: BinaryIO,
+    values_file: BinaryIO,
+    leaves_file: BinaryIO,
+    addresses: List[bytes],
+    values: List[bytes],
+) -> None:
+    packed_addresses = b"".join(addresses)
+    packed_values = b"".join(values)
+    addresses_file.write(packed_addresses)
+    values_file.write(packed_values)
+    leaves_file.write(hash_leaves(packed_addresses, packed_values))
+
+
+def _hash_levels(
+    partial_file_name: str,
+    work_directory: str,
+    manifest: Manifest,
+    memory_budget: int,
+) -> None:
+    lengths = level_lengths(manifest["number_of_entries"])
+    level_offsets = section_offsets(manifest["number_of_entries"])[3:]
+    # An even number of hashes, so that no pair is split between blocks
+    hashes_per_block = max(2, memory_budget // (4 * HASH_LENGTH) * 2)
+
+    with open(partial_file_name, "r+b") as file:
+        for level in range(manifest["hashed_levels"], len(lengths) - 1):
+            for start in range(0, lengths[level], hashes_per_block):
+                file.seek(level_offsets[level] + start * HASH_LENGTH)
+                hashes = file.read(
+                    min(hashes_per_block, lengths[level] - start) * HASH_LENGTH
+                )
+                file.seek(level_offsets[level + 1] + start // 2 * HASH_LENGTH)
+                file.write(hash_parents(hashes))
+
+            file.flush()
+            os.fsync(file.fileno())
+            manifest["hashed_levels"] = level + 1
+            _save_manifest(work_directory, manifest)
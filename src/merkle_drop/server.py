@@ -1,22 +1,49 @@
+import concurrent.futures
+import functools
 import logging
-import math
+import pickle
+import signal
+import threading
 import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
 import pendulum
-from eth_utils import encode_hex, is_address, to_canonical_address, to_checksum_address
-from flask import Flask, abort, jsonify
+from flask import Flask, Response, abort, g, jsonify, request
 from flask_cors import CORS
 
-from merkle_drop.airdrop import get_balance, get_item, to_items
+from merkle_drop import entitlement, metrics
+from merkle_drop.airdrop import AirdropData, build_airdrop_tree
+from merkle_drop.cache import BuildCache
+from merkle_drop.entitlement import (
+    DEFAULT_MAX_BATCH_SIZE,
+    MAX_REQUEST_SIZE_PER_ADDRESS,
+    EntitlementCache,
+    EntitlementState,
+    InvalidAddressError,
+    InvalidBatchError,
+    PrecomputedEntitlement,
+    get_encoded_entitlement,
+    iter_encoded_entitlements,
+    parse_batch,
+    precompute_entitlements,
+)
 from merkle_drop.load_csv import load_airdrop_file
-from merkle_drop.merkle_tree import build_tree, create_proof
+from merkle_drop.merkle_tree import FlatTree
+from merkle_drop.snapshot import load_snapshot
 
 app = Flask("Merkle Airdrop Backend Server")
 
-airdrop_dict = None
-airdrop_tree = None
-decay_start_time = -1
-decay_duration_in_seconds = -1
+# Shared with the ASGI application in merkle_drop.asgi
+state: Optional[EntitlementState] = None
+# The maximum number of addresses of a request to /entitlements
+max_batch_size = DEFAULT_MAX_BATCH_SIZE
+
+# Loads the state again like the last call to init or init_from_snapshot
+_state_loader: Optional[Callable[..., EntitlementState]] = None
+_reload_lock = threading.Lock()
+
+# The number of precomputed entitlements unpickled at once after a reload
+_PRECOMPUTED_CHUNK_SIZE = 10_000
 
 
 def init_gunicorn_logging():
@@ -41,23 +68,265 @@ def init(
     airdrop_filename: str,
     decay_start_time_param: int,
     decay_duration_in_seconds_param: int,
+    build_cache: Optional[BuildCache] = None,
+    build_workers: int = 1,
+    precompute: bool = False,
+    cache_size: int = 0,
 ):
-    global airdrop_dict
-    global airdrop_tree
-    global decay_start_time
-    global decay_duration_in_seconds
-    decay_start = pendulum.from_timestamp(decay_start_time_param)
-    decay_end = pendulum.from_timestamp(
-        decay_start_time_param + decay_duration_in_seconds_param
+    """initialize from the airdrop file
+
+    With `precompute`, the responses of all eligible addresses are encoded
+    up front, which takes memory for the proofs of all addresses but leaves
+    only the decay of the balance to compute per request. Alternatively,
+    the responses of the `cache_size` most recently requested addresses
+    are kept."""
+    global state, _state_loader
+    _state_loader = functools.partial(
+        _load_state,
+        airdrop_filename,
+        decay_start_time_param,
+        decay_duration_in_seconds_param,
+        build_cache,
+        build_workers,
+        precompute,
+        cache_size,
     )
+    state = _load(_state_loader)
+
+
+def init_from_snapshot(
+    snapshot_filename: str, precompute: bool = False, cache_size: int = 0
+):
+    """initialize from a snapshot written by `merkle-drop build`
+
+    The snapshot is memory mapped read only, so that all worker processes
+    share the same pages instead of building their own tree. See `init`
+    for `precompute` and `cache_size`."""
+    global state, _state_loader
+    _state_loader = functools.partial(
+        _load_state_from_snapshot, snapshot_filename, precompute, cache_size
+    )
+    state = _load(_state_loader)
+
+
+def reload_in_background() -> Optional[threading.Thread]:
+    """load the state again in a background thread and swap it in when done
+
+    The files passed to the last call to `init` or `init_from_snapshot` are
+    read again, so they can be replaced in place. Requests are served from
+    the previous state until the new one is complete. If loading fails, the
+    previous state is kept. The tree and the precomputed entitlements are
+    built in a subprocess, so the reload does not hold the GIL for long.
+    Returns the thread, or None if a reload is already running."""
+    if _state_loader is None:
+        raise RuntimeError("The server is not initialized")
+    if not _reload_lock.acquire(blocking=False):
+        return None
+
+    thread = threading.Thread(
+        target=_reload, args=(_state_loader,), name="merkle-drop-reload", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def install_reload_signal_handler(signal_number: int = signal.SIGHUP) -> None:
+    """reload the state on the signal, see `reload_in_background`
+
+    Signal handlers are per process, so with gunicorn this is called in
+    every worker, e.g. from the `post_worker_init` hook."""
+    signal.signal(signal_number, lambda signum, frame: reload_in_background())
+
+
+def _reload(state_loader: Callable[..., EntitlementState]) -> None:
+    global state
+    try:
+        new_state = _load(state_loader, build_in_subprocess=True)
+    except Exception:
+        app.logger.exception("Reloading failed, keeping the previous state")
+    else:
+        # Requests take the state once, so they see either the old or the new one
+        state = new_state
+        app.logger.info("Reloaded merkle tree")
+    finally:
+        _reload_lock.release()
+
+
+def _load(
+    state_loader: Callable[..., EntitlementState], build_in_subprocess: bool = False
+) -> EntitlementState:
+    start_time = time.perf_counter()
+    new_state = state_loader(build_in_subprocess=build_in_subprocess)
+    load_duration = time.perf_counter() - start_time
+    app.logger.info(f"Loaded merkle tree in {load_duration:.1f} seconds")
+    metrics.observe_state(new_state, load_duration)
+    return new_state
+
+
+def _load_state(
+    airdrop_filename: str,
+    decay_start_time: int,
+    decay_duration_in_seconds: int,
+    build_cache: Optional[BuildCache],
+    build_workers: int,
+    precompute: bool,
+    cache_size: int,
+    build_in_subprocess: bool = False,
+) -> EntitlementState:
+    decay_start = pendulum.from_timestamp(decay_start_time)
+    decay_end = pendulum.from_timestamp(decay_start_time + decay_duration_in_seconds)
 
     app.logger.info(f"Initializing merkle tree from file {airdrop_filename}")
     app.logger.info(f"Decay from {decay_start} to {decay_end}")
-    airdrop_dict = load_airdrop_file(airdrop_filename)
-    app.logger.info(f"Building merkle tree from {len(airdrop_dict)} entries")
-    airdrop_tree = build_tree(to_items(airdrop_dict))
-    decay_start_time = decay_start_time_param
-    decay_duration_in_seconds = decay_duration_in_seconds_param
+    if build_in_subprocess:
+        (
+            airdrop_data,
+            airdrop_tree,
+            precomputed_entitlements,
+        ) = _load_airdrop_in_subprocess(
+            airdrop_filename, build_cache, build_workers, precompute
+        )
+    else:
+        airdrop_data, airdrop_tree = _load_airdrop(
+            airdrop_filename, build_cache, build_workers
+        )
+        precomputed_entitlements = (
+            _precompute_entitlements(airdrop_data, airdrop_tree) if precompute else None
+        )
+
+    return EntitlementState(
+        airdrop_data,
+        airdrop_tree,
+        decay_start_time,
+        decay_duration_in_seconds,
+        precomputed_entitlements,
+        EntitlementCache(cache_size) if cache_size > 0 else None,
+    )
+
+
+def _load_airdrop(
+    airdrop_filename: str, build_cache: Optional[BuildCache], build_workers: int
+) -> Tuple[AirdropData, FlatTree]:
+    if build_cache is None:
+        airdrop_data = load_airdrop_file(airdrop_filename, build_workers)
+        app.logger.info(f"Building merkle tree from {len(airdrop_data)} entries")
+        return airdrop_data, build_airdrop_tree(airdrop_data, build_workers)
+
+    app.logger.info(f"Loading merkle tree from cache {build_cache.directory}")
+    return build_cache.load(airdrop_filename, build_workers)
+
+
+def _load_airdrop_in_subprocess(
+    airdrop_filename: str,
+    build_cache: Optional[BuildCache],
+    build_workers: int,
+    precompute: bool,
+) -> Tuple[AirdropData, FlatTree, Optional[Dict[str, PrecomputedEntitlement]]]:
+    # Keep the hashing and the precomputation from competing with the
+    # requests for the GIL
+    with concurrent.futures.ProcessPoolExecutor(1) as executor:
+        loaded_airdrop, pickled_chunks = executor.submit(
+            _load_airdrop_and_precompute,
+            airdrop_filename,
+            build_cache,
+            build_workers,
+            precompute,
+        ).result()
+
+    if loaded_airdrop is None:
+        # Memory maps can not be passed between processes, so the subprocess
+        # only filled the cache, which is then loaded here
+        loaded_airdrop = _load_airdrop(airdrop_filename, build_cache, build_workers)
+    return (
+        *loaded_airdrop,
+        _unpickle_precomputed_entitlements(pickled_chunks)
+        if pickled_chunks is not None
+        else None,
+    )
+
+
+def _load_airdrop_and_precompute(
+    airdrop_filename: str,
+    build_cache: Optional[BuildCache],
+    build_workers: int,
+    precompute: bool,
+) -> Tuple[Optional[Tuple[AirdropData, FlatTree]], Optional[List[bytes]]]:
+    airdrop_data, airdrop_tree = _load_airdrop(
+        airdrop_filename, build_cache, build_workers
+    )
+    pickled_chunks = (
+        _pickle_precomputed_entitlements(airdrop_data, airdrop_tree)
+        if precompute
+        else None
+    )
+    if build_cache is not None:
+        return None, pickled_chunks
+    return (airdrop_data, airdrop_tree), pickled_chunks
+
+
+def _pickle_precomputed_entitlements(
+    airdrop_data: AirdropData, airdrop_tree: FlatTree
+) -> List[bytes]:
+    items = list(_precompute_entitlements(airdrop_data, airdrop_tree).items())
+    return [
+        pickle.dumps(items[start : start + _PRECOMPUTED_CHUNK_SIZE])
+        for start in range(0, len(items), _PRECOMPUTED_CHUNK_SIZE)
+    ]
+
+
+def _unpickle_precomputed_entitlements(
+    pickled_chunks: List[bytes],
+) -> Dict[str, PrecomputedEntitlement]:
+    precomputed_entitlements: Dict[str, PrecomputedEntitlement] = {}
+    for pickled_chunk in pickled_chunks:
+        precomputed_entitlements.update(pickle.loads(pickled_chunk))
+        # Unpickling holds the GIL, so let the requests run between the chunks
+        time.sleep(0)
+    return precomputed_entitlements
+
+
+def _load_state_from_snapshot(
+    snapshot_filename: str,
+    precompute: bool,
+    cache_size: int,
+    build_in_subprocess: bool = False,
+) -> EntitlementState:
+    # Memory mapping the snapshot is cheap, even while serving requests
+    app.logger.info(f"Loading merkle tree snapshot from file {snapshot_filename}")
+    snapshot = load_snapshot(snapshot_filename)
+    app.logger.info(
+        f"Decay from {pendulum.from_timestamp(snapshot.decay_start_time)} to "
+        f"{pendulum.from_timestamp(snapshot.decay_start_time + snapshot.decay_duration_in_seconds)}"
+    )
+    app.logger.info(f"Loaded merkle tree with {len(snapshot.tree)} entries")
+
+    precomputed_entitlements = None
+    if precompute and build_in_subprocess:
+        with concurrent.futures.ProcessPoolExecutor(1) as executor:
+            pickled_chunks = executor.submit(
+                _precompute_snapshot_entitlements, snapshot_filename
+            ).result()
+        precomputed_entitlements = _unpickle_precomputed_entitlements(pickled_chunks)
+    elif precompute:
+        precomputed_entitlements = _precompute_entitlements(
+            snapshot.airdrop_data, snapshot.tree
+        )
+
+    return EntitlementState(
+        *snapshot,
+        precomputed_entitlements,
+        EntitlementCache(cache_size) if cache_size > 0 else None,
+    )
+
+
+def _precompute_snapshot_entitlements(snapshot_filename: str) -> List[bytes]:
+    snapshot = load_snapshot(snapshot_filename)
+    return _pickle_precomputed_entitlements(snapshot.airdrop_data, snapshot.tree)
+
+
+def _precompute_entitlements(airdrop_data, airdrop_tree):
+    app.logger.info(f"Precomputing responses for {len(airdrop_data)} entries")
+    return precompute_entitlements(airdrop_data, airdrop_tree)
 
 
 @app.errorhandler(404)
@@ -75,41 +344,75 @@ def internal_server_error(e):
     return jsonify(error=500, message="There was an internal server error"), 500
 
 
+@app.before_request
+def start_request_timer():
+    g.start_time = time.perf_counter()
+
+
+@app.after_request
+def observe_request(response):
+    metrics.observe_request(
+        request.endpoint or "unknown", response.status_code, g.start_time
+    )
+    return response
+
+
 @app.route("/entitlement/<string:address>", methods=["GET"])
 def get_entitlement_for(address):
-    if not is_address(address):
-        abort(400, "The address is not in checksum-case or invalid")
-    canonical_address = to_canonical_address(address)
-
-    eligible_tokens = get_balance(canonical_address, airdrop_dict)
-    if eligible_tokens == 0:
-        proof = []
-        decayed_tokens = 0
-    else:
-        proof = create_proof(get_item(canonical_address, airdrop_dict), airdrop_tree)
-        decayed_tokens = decay_tokens(eligible_tokens)
-    return jsonify(
-        {
-            "address": to_checksum_address(address),
-            "originalTokenBalance": str(eligible_tokens),
-            "currentTokenBalance": str(decayed_tokens),
-            "proof": [encode_hex(hash_) for hash_ in proof],
-        }
+    current_state = state
+    assert current_state is not None, "The server is not initialized"
+    start_time = time.perf_counter()
+    try:
+        encoded_entitlement = get_encoded_entitlement(
+            current_state, address, int(time.time())
+        )
+    except InvalidAddressError as e:
+        abort(400, str(e))
+    metrics.observe_proof(start_time)
+    metrics.observe_cache(current_state.entitlement_cache)
+    return Response(encoded_entitlement, mimetype="application/json")
+
+
+@app.route("/entitlements", methods=["POST"])
+def get_entitlements_for():
+    # Use the same state for the whole response
+    current_state = state
+    assert current_state is not None, "The server is not initialized"
+    body = request.stream.read(max_batch_size * MAX_REQUEST_SIZE_PER_ADDRESS + 1)
+    try:
+        addresses = parse_batch(body, max_batch_size)
+    except (InvalidAddressError, InvalidBatchError) as e:
+        abort(400, str(e))
+
+    return Response(
+        _stream_entitlements(current_state, addresses, int(time.time())),
+        mimetype="application/json",
     )
 
 
-# See also MerkleDrop.sol:61
+def _stream_entitlements(
+    current_state: EntitlementState, addresses: List[str], now: int
+) -> Iterator[bytes]:
+    try:
+        yield from iter_encoded_entitlements(
+            current_state, addresses, now, metrics.observe_proof
+        )
+    finally:
+        # The entitlements are only looked up while the response is streamed
+        metrics.observe_cache(current_state.entitlement_cache)
+
+
+@app.route(metrics.METRICS_PATH, methods=["GET"])
+def get_metrics():
+    if not metrics.available:
+        abort(404)
+    body, content_type = metrics.generate_metrics()
+    return Response(body, content_type=content_type)
+
+
 def decay_tokens(tokens: int) -> int:
-    now = int(time.time())
-    if now <= decay_start_time:
-        return tokens
-    elif now >= decay_start_time + decay_duration_in_seconds:
-        return 0
-    else:
-        time_decayed = now - decay_start_time
-        decay = math.ceil(tokens * time_decayed / decay_duration_in_seconds)
-        assert decay <= tokens
-        return tokens - decay
+    assert state is not None, "The server is not initialized"
+    return entitlement.decay_tokens(state, tokens, int(time.time()))
 
 
 # Only for testing
@@ -0,0 +1,140 @@
+"""Binary snapshot of an airdrop with its merkle tree.
+
+The snapshot can be memory mapped read only, so that all server processes
+share one copy of the data via the page cache. All integers are big endian.
+
+Layout, with n the number of entries and d the depth of the tree:
+
+    header     magic, version, n, d, decay start time and decay duration
+    root       32 bytes
+    addresses  n * 20 bytes, sorted
+    values     n * 32 bytes, in the order of the addresses
+    levels     d + 1 levels of concatenated 32 byte hashes from the leaves
+               to the root, level i holding ceil(n / 2 ** i) hashes
+"""
+import mmap
+import struct
+from typing import BinaryIO, List, NamedTuple
+
+from .airdrop import AirdropData
+from .hashing import ADDRESS_LENGTH, HASH_LENGTH, VALUE_LENGTH
+from .merkle_tree import FlatTree
+
+MAGIC = b"MRKLDROP"
+VERSION = 1
+
+_HEADER = struct.Struct(">8sIQIQQ")
+
+
+class Snapshot(NamedTuple):
+    airdrop_data: AirdropData
+    tree: FlatTree
+    decay_start_time: int
+    decay_duration_in_seconds: int
+
+
+def level_lengths(number_of_entries: int) -> List[int]:
+    lengths = [number_of_entries]
+    while lengths[-1] > 1:
+        lengths.append((lengths[-1] + 1) // 2)
+    return lengths
+
+
+def section_offsets(number_of_entries: int) -> List[int]:
+    """offsets of the root, the addresses, the values and the levels
+
+    The last offset is the size of the snapshot file.
+    """
+    offsets = [_HEADER.size]
+    for size in [
+        HASH_LENGTH,
+        number_of_entries * ADDRESS_LENGTH,
+        number_of_entries * VALUE_LENGTH,
+        *(length * HASH_LENGTH for length in level_lengths(number_of_entries)),
+    ]:
+        offsets.append(offsets[-1] + size)
+    return offsets
+
+
+def write_snapshot(
+    file_name: str,
+    airdrop_data: AirdropData,
+    tree: FlatTree,
+    decay_start_time: int,
+    decay_duration_in_seconds: int,
+) -> None:
+    if airdrop_data.packed_addresses != tree.addresses:
+        raise ValueError("The tree does not match the airdrop data")
+
+    with open(file_name, "wb") as file:
+        write_header(
+            file, len(tree), tree.depth, decay_start_time, decay_duration_in_seconds
+        )
+        file.write(tree.root_hash)
+        file.write(tree.addresses)
+        file.write(airdrop_data.packed_values)
+        for level in tree.levels:
+            file.write(level)
+
+
+def write_header(
+    file: BinaryIO,
+    number_of_entries: int,
+    depth: int,
+    decay_start_time: int,
+    decay_duration_in_seconds: int,
+) -> None:
+    file.write(
+        _HEADER.pack(
+            MAGIC,
+            VERSION,
+            number_of_entries,
+            depth,
+            decay_start_time,
+            decay_duration_in_seconds,
+        )
+    )
+
+
+def load_snapshot(file_name: str) -> Snapshot:
+    with open(file_name, "rb") as file:
+        # The mapping stays valid after closing the file
+        buffer = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    if len(buffer) < _HEADER.size:
+        raise ValueError("The file is too short to be a snapshot")
+
+    (
+        magic,
+        version,
+        number_of_entries,
+        depth,
+        decay_start_time,
+        decay_duration_in_seconds,
+    ) = _HEADER.unpack(buffer[: _HEADER.size])
+
+    if magic != MAGIC:
+        raise ValueError("The file is not a merkle drop snapshot")
+    if version != VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}")
+
+    if depth != len(level_lengths(number_of_entries)) - 1:
+        raise ValueError("The snapshot header is inconsistent")
+
+    offsets = section_offsets(number_of_entries)
+    if offsets[-1] != len(buffer):
+        raise ValueError("The snapshot file size does not match its header")
+
+    root, addresses, values, *levels = (
+        buffer[start:end] for start, end in zip(offsets, offsets[1:])
+    )
+    tree = FlatTree(levels, addresses)
+    if tree.root_hash != root:
+        raise ValueError("The snapshot root does not match its tree")
+
+    return Snapshot(
+        AirdropData(addresses, values),
+        tree,
+        decay_start_time,
+        decay_duration_in_seconds,
+    )
@@ -0,0 +1,162 @@
+"""Deterministic synthetic airdrops for benchmarks and load tests
+
+Every entry is derived from the seed and its index with one keccak256 hash,
+instead of from a private key like in gen-airdrop-list. The first 20 bytes
+of the hash are the address and the remaining 12 bytes select the value
+from the distribution. So the same seed always gives the same airdrop, and
+chunks of entries can be generated independently in parallel.
+"""
+import collections
+import concurrent.futures
+import heapq
+from typing import Callable, Deque, Iterator, List, NamedTuple, TypeVar
+
+from eth_utils import to_checksum_address
+
+from .airdrop import AirdropData
+from .hashing import ADDRESS_LENGTH, VALUE_LENGTH, checksum_encode, keccak
+from .load_csv import open_airdrop_file
+from .merkle_tree import Item
+
+DISTRIBUTIONS = ("uniform", "log-uniform", "constant")
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+_FRACTION_BITS = 96
+_RECORD_LENGTH = ADDRESS_LENGTH + VALUE_LENGTH
+
+T = TypeVar("T")
+
+
+class SyntheticAirdrop(NamedTuple):
+    """The parameters of a synthetic airdrop
+
+    The values are distributed between `min_value` and `max_value`, either
+    uniformly, uniformly on a logarithmic scale, which gives many small and
+    few large values, or all of them are `max_value` with "constant".
+    """
+
+    number_of_entries: int
+    seed: int = 0
+    distribution: str = "uniform"
+    min_value: int = 1
+    max_value: int = 10 ** 24
+
+
+def validate_synthetic_airdrop(airdrop: SyntheticAirdrop) -> None:
+    if airdrop.number_of_entries < 1:
+        raise ValueError("A synthetic airdrop needs at least one entry")
+    if airdrop.distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution {airdrop.distribution}")
+    if not 0 <= airdrop.min_value <= airdrop.max_value < 2 ** 256:
+        raise ValueError("Expected 0 <= min value <= max value < 2 ** 256")
+    if airdrop.distribution == "log-uniform" and airdrop.min_value == 0:
+        raise ValueError("The log-uniform distribution needs a min value above 0")
+
+
+def synthetic_item(airdrop: SyntheticAirdrop, index: int) -> Item:
+    digest = keccak(airdrop.seed.to_bytes(32, "big") + index.to_bytes(32, "big"))
+    fraction = int.from_bytes(digest[ADDRESS_LENGTH:], "big")
+    return Item(digest[:ADDRESS_LENGTH], _get_value(airdrop, fraction))
+
+
+def _get_value(airdrop: SyntheticAirdrop, fraction: int) -> int:
+    min_value, max_value = airdrop.min_value, airdrop.max_value
+    if airdrop.distribution == "uniform":
+        return min_value + (fraction * (max_value - min_value + 1) >> _FRACTION_BITS)
+    elif airdrop.distribution == "log-uniform":
+        value = int(
+            min_value * (max_value / min_value) ** (fraction / 2 ** _FRACTION_BITS)
+        )
+        # Rounding of the float might leave the range
+        return max(min_value, min(value, max_value))
+    else:
+        return max_value
+
+
+def write_synthetic_airdrop_file(
+    file_name: str,
+    airdrop: SyntheticAirdrop,
+    workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> None:
+    """write the airdrop as CSV file, compressed based on the suffix of the file
+
+    The entries are in the order of their index, not sorted by address."""
+    validate_synthetic_airdrop(airdrop)
+    with open_airdrop_file(file_name, "wt") as file:
+        for lines in _map_chunks(_format_chunk, airdrop, workers, chunk_size):
+            file.write(lines)
+
+
+def generate_synthetic_airdrop_data(
+    airdrop: SyntheticAirdrop, workers: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> AirdropData:
+    """generate the airdrop sorted by address, e.g. to build a snapshot of it"""
+    validate_synthetic_airdrop(airdrop)
+    sorted_chunks = list(
+        _map_chunks(_generate_sorted_chunk, airdrop, workers, chunk_size)
+    )
+
+    addresses: List[bytes] = []
+    values: List[bytes] = []
+    for record in heapq.merge(*(_iter_records(chunk) for chunk in sorted_chunks)):
+        address = record[:ADDRESS_LENGTH]
+        if addresses and addresses[-1] == address:
+            raise ValueError(
+                f"Generated address {to_checksum_address(address)} multiple times"
+            )
+        addresses.append(address)
+        values.append(record[ADDRESS_LENGTH:])
+
+    return AirdropData(b"".join(addresses), b"".join(values))
+
+
+def _map_chunks(
+    function: Callable[[SyntheticAirdrop, int, int], T],
+    airdrop: SyntheticAirdrop,
+    workers: int,
+    chunk_size: int,
+) -> Iterator[T]:
+    """apply the function to all chunks of entries and yield the results in order"""
+    chunks = (
+        (start, min(start + chunk_size, airdrop.number_of_entries))
+        for start in range(0, airdrop.number_of_entries, chunk_size)
+    )
+    if workers == 1:
+        for start, end in chunks:
+            yield function(airdrop, start, end)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        # Only a few chunks ahead are generated, so that a slow consumer
+        # like a compressed file does not keep all of them in memory
+        futures: Deque[concurrent.futures.Future] = collections.deque()
+        for start, end in chunks:
+            futures.append(executor.submit(function, airdrop, start, end))
+            if len(futures) > 2 * workers:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+
+
+def _format_chunk(airdrop: SyntheticAirdrop, start: int, end: int) -> str:
+    lines = []
+    for index in range(start, end):
+        address, value = synthetic_item(airdrop, index)
+        lines.append(f"{checksum_encode(address)},{value}\n")
+    return "".join(lines)
+
+
+def _generate_sorted_chunk(airdrop: SyntheticAirdrop, start: int, end: int) -> bytes:
+    records = []
+    for index in range(start, end):
+        address, value = synthetic_item(airdrop, index)
+        records.append(address + value.to_bytes(VALUE_LENGTH, "big"))
+    records.sort()
+    return b"".join(records)
+
+
+def _iter_records(chunk: bytes) -> Iterator[bytes]:
+    for offset in range(0, len(chunk), _RECORD_LENGTH):
+        yield chunk[offset : offset + _RECORD_LENGTH]
@@ -0,0 +1,191 @@
+"""Verification of exported proofs against a merkle root
+
+The proofs are read from JSON lines as written by the `proofs` command. An
+uncompressed file is split into chunks at line boundaries, which are
+verified in a process pool with `validate_proofs`.
+"""
+import concurrent.futures
+import itertools
+import json
+import os
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from .airdrop import AirdropData, get_balance
+from .hashing import ADDRESS_LENGTH, HASH_LENGTH, checksum_encode
+from .load_csv import is_compressed, open_airdrop_file, split_into_chunks
+from .merkle_tree import Item, validate_proofs
+
+# Chunks are read into memory as a whole
+_MAX_CHUNK_SIZE = 64 * 1024 ** 2
+_BATCH_SIZE = 65536
+_ENCODED_HASH_LENGTH = len("0x") + 2 * HASH_LENGTH
+
+
+class ProofsVerification(NamedTuple):
+    number_of_proofs: int
+    # The line numbers and checksum addresses of entries without value and
+    # proof, e.g. of addresses not in the airdrop
+    entries_without_proof: List[Tuple[int, str]]
+    errors: List[str]
+
+
+class _VerifiedChunk(NamedTuple):
+    number_of_lines: int
+    number_of_proofs: int
+    # The line numbers are relative to the start of the chunk
+    entries_without_proof: List[Tuple[int, str]]
+    errors: List[Tuple[int, str]]
+
+
+def verify_proofs_file(
+    proofs_file: str,
+    root_hash: bytes,
+    workers: int = 1,
+    airdrop_data: Optional[AirdropData] = None,
+) -> ProofsVerification:
+    """verify all proofs of the file, reporting every invalid entry
+
+    With the airdrop data, entries without proof are reported as errors if
+    their address is eligible."""
+    if workers > 1 and not is_compressed(proofs_file):
+        number_of_chunks = max(
+            workers, -(-os.path.getsize(proofs_file) // _MAX_CHUNK_SIZE)
+        )
+        chunks = split_into_chunks(proofs_file, number_of_chunks)
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            return _combine_chunks(
+                executor.map(
+                    _verify_chunk,
+                    itertools.repeat(proofs_file),
+                    (start for start, _ in chunks),
+                    (end for _, end in chunks),
+                    itertools.repeat(root_hash),
+                ),
+                airdrop_data,
+            )
+
+    with open_airdrop_file(proofs_file) as file:
+        batches = iter(lambda: list(itertools.islice(file, _BATCH_SIZE)), [])
+        return _combine_chunks(
+            (_verify_lines(batch, root_hash) for batch in batches), airdrop_data
+        )
+
+
+def _combine_chunks(
+    verified_chunks: Iterable[_VerifiedChunk], airdrop_data: Optional[AirdropData]
+) -> ProofsVerification:
+    number_of_proofs = 0
+    entries_without_proof: List[Tuple[int, str]] = []
+    errors: List[Tuple[int, str]] = []
+    lines_before_chunk = 0
+    for verified_chunk in verified_chunks:
+        number_of_proofs += verified_chunk.number_of_proofs
+        entries_without_proof.extend(
+            (lines_before_chunk + line_number, checksum_address)
+            for line_number, checksum_address in verified_chunk.entries_without_proof
+        )
+        errors.extend(
+            (lines_before_chunk + line_number, message)
+            for line_number, message in verified_chunk.errors
+        )
+        lines_before_chunk += verified_chunk.number_of_lines
+
+    if airdrop_data is not None:
+        # The airdrop data is not sent to the worker processes, as there are
+        # usually only a few entries without proof
+        errors.extend(
+            (line_number, f"The eligible address {checksum_address} has no proof")
+            for line_number, checksum_address in entries_without_proof
+            if get_balance(bytes.fromhex(checksum_address[2:]), airdrop_data) != 0
+        )
+        errors.sort()
+
+    return ProofsVerification(
+        number_of_proofs,
+        entries_without_proof,
+        [f"{message} in line {line_number}" for line_number, message in errors],
+    )
+
+
+def _verify_chunk(
+    proofs_file: str, start: int, end: int, root_hash: bytes
+) -> _VerifiedChunk:
+    with open(proofs_file, "rb") as file:
+        file.seek(start)
+        lines = file.read(end - start).decode().splitlines()
+    return _verify_lines(lines, root_hash)
+
+
+def _verify_lines(lines: List[str], root_hash: bytes) -> _VerifiedChunk:
+    errors = []
+    entries_without_proof = []
+    line_numbers = []
+    checksum_addresses = []
+    items_and_proofs = []
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            checksum_address, item, proof = _parse_proof_entry(line)
+        except ValueError:
+            errors.append((line_number, "Invalid proof entry"))
+            continue
+
+        if item.value == 0 and not proof:
+            entries_without_proof.append((line_number, checksum_address))
+            continue
+
+        line_numbers.append(line_number)
+        checksum_addresses.append(checksum_address)
+        items_and_proofs.append((item, proof))
+
+    for line_number, checksum_address, valid in zip(
+        line_numbers, checksum_addresses, validate_proofs(items_and_proofs, root_hash)
+    ):
+        if not valid:
+            errors.append(
+                (
+                    line_number,
+                    f"The proof of {checksum_address} does not match the root",
+                )
+            )
+
+    errors.sort()
+    return _VerifiedChunk(
+        len(lines), len(items_and_proofs), entries_without_proof, errors
+    )
+
+
+def _parse_proof_entry(line: str) -> Tuple[str, Item, List[bytes]]:
+    try:
+        entry = json.loads(line)
+        checksum_address = entry["address"]
+        value = int(entry["value"])
+        # All hashes of the proof are decoded at once
+        hashes = "".join(entry["proof"])
+        number_of_hashes = len(entry["proof"])
+        if (
+            not isinstance(checksum_address, str)
+            or not isinstance(entry["proof"], list)
+            or len(hashes) != _ENCODED_HASH_LENGTH * number_of_hashes
+            or hashes[::_ENCODED_HASH_LENGTH] != "0" * number_of_hashes
+            or hashes[1::_ENCODED_HASH_LENGTH] != "x" * number_of_hashes
+        ):
+            raise ValueError("Invalid proof entry")
+        address = bytes.fromhex(checksum_address[2:])
+        packed_proof = bytes.fromhex(hashes.replace("0x", ""))
+    except (KeyError, TypeError) as e:
+        raise ValueError("Invalid proof entry") from e
+
+    if (
+        len(address) != ADDRESS_LENGTH
+        or checksum_encode(address) != checksum_address
+        or not 0 <= value < 2 ** 256
+    ):
+        raise ValueError("Invalid proof entry")
+
+    proof = [
+        packed_proof[offset : offset + HASH_LENGTH]
+        for offset in range(0, len(packed_proof), HASH_LENGTH)
+    ]
+    return checksum_address, Item(address, value), proof
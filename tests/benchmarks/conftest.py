@@ -0,0 +1,156 @@
+"""Benchmarks of the time and peak memory across airdrop sizes
+
+The benchmarks are skipped unless pytest is run with --benchmarks, see the
+options in tests/conftest.py. Every benchmark measures one call of a
+function with the `measure` fixture. The time is the mean of repeated calls
+for at least 0.2 seconds. The peak memory is measured with tracemalloc in
+a separate call, since tracing slows down allocations.
+"""
+import json
+import os
+import platform
+import timeit
+import tracemalloc
+from typing import Any, Dict, List
+
+import pytest
+
+from merkle_drop.airdrop import AirdropData, build_airdrop_tree
+from merkle_drop.entitlement import EntitlementState
+from merkle_drop.merkle_tree import build_tree
+from merkle_drop.synthetic import (
+    SyntheticAirdrop,
+    synthetic_item,
+    write_synthetic_airdrop_file,
+)
+
+results: List[Dict[str, Any]] = []
+
+
+def pytest_generate_tests(metafunc):
+    if "airdrop_size" in metafunc.fixturenames:
+        sizes = metafunc.config.getoption("--benchmarks-sizes")
+        metafunc.parametrize(
+            "airdrop_size", [int(size) for size in sizes.split(",")], scope="session"
+        )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmarks"):
+        return
+    skip = pytest.mark.skip(reason="Benchmarks are only run with --benchmarks")
+    for item in items:
+        if "airdrop_size" in getattr(item, "fixturenames", ()):
+            item.add_marker(skip)
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not results:
+        return
+    terminalreporter.section("benchmarks")
+    for result in results:
+        terminalreporter.write_line(
+            f"{result['name']:<50} {result['seconds']:>14.6f} s "
+            f"{result['peak_memory'] / 1024 ** 2:>12.3f} MiB"
+        )
+
+
+@pytest.fixture(scope="session")
+def benchmark_results(request):
+    baseline = {}
+    baseline_file_name = request.config.getoption("--benchmarks-baseline")
+    if baseline_file_name is not None:
+        with open(baseline_file_name) as file:
+            baseline = {result["name"]: result for result in json.load(file)["results"]}
+
+    yield baseline
+
+    json_file_name = request.config.getoption("--benchmarks-json")
+    if json_file_name is not None:
+        with open(json_file_name, "w") as file:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+
+
+@pytest.fixture
+def measure(request, benchmark_results):
+    """measure a call of the function with the arguments
+
+    Fails if the time or peak memory exceeds the one of the baseline by more
+    than the tolerance."""
+    baseline = benchmark_results.get(request.node.name)
+    tolerance = request.config.getoption("--benchmarks-tolerance")
+
+    def measure(function, *args):
+        number, total_seconds = timeit.Timer(lambda: function(*args)).autorange()
+
+        tracemalloc.start()
+        try:
+            function(*args)
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        result = {
+            "name": request.node.name,
+            "seconds": total_seconds / number,
+            "peak_memory": peak_memory,
+        }
+        results.append(result)
+
+        if baseline is not None:
+            regressions = [
+                f"{key} {result[key]} exceeds {baseline[key]} of the baseline"
+                for key in ("seconds", "peak_memory")
+                # Measurements of almost no memory vary relatively a lot
+                if result[key] > baseline[key] * (1 + tolerance)
+                and not (key == "peak_memory" and result[key] < 1024)
+            ]
+            if regressions:
+                pytest.fail(f"Regression of {request.node.name}: {regressions}")
+
+    return measure
+
+
+@pytest.fixture(scope="session")
+def synthetic_airdrop(airdrop_size):
+    return SyntheticAirdrop(airdrop_size, distribution="log-uniform")
+
+
+@pytest.fixture(scope="session")
+def airdrop_items(synthetic_airdrop):
+    return [
+        synthetic_item(synthetic_airdrop, index)
+        for index in range(synthetic_airdrop.number_of_entries)
+    ]
+
+
+@pytest.fixture(scope="session")
+def airdrop_file(tmp_path_factory, synthetic_airdrop):
+    file_path = tmp_path_factory.mktemp("benchmarks") / "airdrop.csv"
+    write_synthetic_airdrop_file(str(file_path), synthetic_airdrop, os.cpu_count())
+    yield str(file_path)
+    file_path.unlink()
+
+
+@pytest.fixture(scope="session")
+def airdrop_tree(airdrop_items):
+    return build_tree(airdrop_items)
+
+
+@pytest.fixture(scope="session")
+def entitlement_state(airdrop_items):
+    airdrop_data = AirdropData.from_mapping(dict(airdrop_items))
+    return EntitlementState(
+        airdrop_data,
+        build_airdrop_tree(airdrop_data),
+        decay_start_time=0,
+        decay_duration_in_seconds=2 ** 40,
+    )
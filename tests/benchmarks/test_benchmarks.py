@@ -0,0 +1,48 @@
+import itertools
+
+from eth_utils import to_checksum_address
+
+from merkle_drop import server
+from merkle_drop.load_csv import load_airdrop_file
+from merkle_drop.merkle_tree import (
+    build_tree,
+    compute_merkle_root,
+    create_proof,
+    validate_proof,
+)
+
+
+def test_load_airdrop_file(measure, airdrop_file):
+    measure(load_airdrop_file, airdrop_file)
+
+
+def test_build_tree(measure, airdrop_items):
+    measure(build_tree, airdrop_items)
+
+
+def test_compute_merkle_root(measure, airdrop_items):
+    measure(compute_merkle_root, airdrop_items)
+
+
+def test_create_proof(measure, airdrop_items, airdrop_tree):
+    items = itertools.cycle(airdrop_items[:1000])
+    measure(lambda: create_proof(next(items), airdrop_tree))
+
+
+def test_validate_proof(measure, airdrop_items, airdrop_tree):
+    item = airdrop_items[len(airdrop_items) // 2]
+    proof = create_proof(item, airdrop_tree)
+    measure(validate_proof, item, proof, airdrop_tree.root_hash)
+
+
+def test_entitlement_request(measure, airdrop_items, entitlement_state, monkeypatch):
+    monkeypatch.setattr(server, "state", entitlement_state)
+    client = server.app.test_client()
+    paths = itertools.cycle(
+        [
+            f"/entitlement/{to_checksum_address(address)}"
+            for address, _ in airdrop_items[:1000]
+        ]
+    )
+
+    measure(lambda: client.get(next(paths)))
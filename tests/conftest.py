@@ -9,6 +9,32 @@ assert eth_tester.backends.pyevm.main.GENESIS_GAS_LIMIT < 8 * 10 ** 6
 eth_tester.backends.pyevm.main.GENESIS_GAS_LIMIT = 8 * 10 ** 6
 
 
+def pytest_addoption(parser):
+    # Options of the benchmarks in tests/benchmarks, which are only run with
+    # --benchmarks
+    group = parser.getgroup("benchmarks")
+    group.addoption("--benchmarks", action="store_true", help="run the benchmarks")
+    group.addoption(
+        "--benchmarks-sizes",
+        default="1000,100000,1000000,10000000",
+        help="comma separated numbers of airdrop entries to run the benchmarks with",
+    )
+    group.addoption(
+        "--benchmarks-json", metavar="PATH", help="save the results as JSON to PATH"
+    )
+    group.addoption(
+        "--benchmarks-baseline",
+        metavar="PATH",
+        help="fail benchmarks which regressed compared to the results saved in PATH",
+    )
+    group.addoption(
+        "--benchmarks-tolerance",
+        type=float,
+        default=0.2,
+        help="the allowed relative regression of time and memory, default 0.2",
+    )
+
+
 @pytest.fixture(scope="session")
 def canonical_addresses(accounts):
     """Canonical address list of the test accounts.
@@ -55,7 +81,7 @@ def proofs_for_tree_data(tree_data):
     proofs = [create_proof(item, tree) for item in tree_data]
 
     assert all(
-        validate_proof(item, proof, tree.root.hash)
+        validate_proof(item, proof, tree.root_hash)
         for item, proof in zip(tree_data, proofs)
     )
 
@@ -68,7 +94,7 @@ def proofs_for_tree_data_small_values(tree_data_small_values):
     proofs = [create_proof(item, tree) for item in tree_data_small_values]
 
     assert all(
-        validate_proof(item, proof, tree.root.hash)
+        validate_proof(item, proof, tree.root_hash)
         for item, proof in zip(tree_data_small_values, proofs)
     )
 
@@ -93,13 +119,13 @@ def proof_0(proofs_for_tree_data):
 @pytest.fixture(scope="session")
 def root_hash_for_tree_data(tree_data):
     tree = build_tree(tree_data)
-    return tree.root.hash
+    return tree.root_hash
 
 
 @pytest.fixture(scope="session")
 def root_hash_for_tree_data_small_values(tree_data_small_values):
     tree = build_tree(tree_data_small_values)
-    return tree.root.hash
+    return tree.root_hash
 
 
 @pytest.fixture(scope="session")
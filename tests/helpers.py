@@ -0,0 +1,18 @@
+"""Airdrops shared by the tests that do not need a chain"""
+from typing import Iterable, List, Tuple
+
+from eth_utils import to_checksum_address
+
+from merkle_drop.merkle_tree import Item
+
+
+def create_items(number_of_items: int = 11) -> List[Item]:
+    """items with distinct addresses, sorted like in the tree"""
+    return [Item(bytes([i]) * 20, i * 1000) for i in range(1, number_of_items + 1)]
+
+
+def write_airdrop_file(file_path, items: Iterable[Tuple[bytes, int]]):
+    file_path.write_text(
+        "".join(f"{to_checksum_address(address)},{value}\n" for address, value in items)
+    )
+    return file_path
@@ -0,0 +1,107 @@
+import pytest
+
+from merkle_drop.airdrop import (
+    AirdropData,
+    build_airdrop_tree,
+    compute_airdrop_root,
+    get_balance,
+    get_item,
+    iter_leaf_hashes,
+    to_items,
+    update_airdrop,
+    update_airdrop_data,
+)
+from merkle_drop.merkle_tree import build_tree
+
+from .helpers import create_items
+
+
+@pytest.fixture
+def tree_data():
+    # Not sorted by address
+    return create_items()[::-1]
+
+
+@pytest.fixture
+def airdrop_data(tree_data):
+    return AirdropData.from_mapping(dict(tree_data))
+
+
+def test_airdrop_data_is_sorted_by_address(airdrop_data, tree_data):
+    assert list(airdrop_data) == sorted(address for address, _ in tree_data)
+    assert to_items(airdrop_data) == sorted(tree_data)
+
+
+def test_airdrop_data_equals_dict(airdrop_data, tree_data):
+    assert airdrop_data == dict(tree_data)
+    assert len(airdrop_data) == len(tree_data)
+
+
+def test_airdrop_data_is_packed(airdrop_data, tree_data):
+    assert len(airdrop_data.packed_addresses) == 20 * len(tree_data)
+    assert len(airdrop_data.packed_values) == 32 * len(tree_data)
+
+
+def test_get_item(airdrop_data, tree_data):
+    for item in tree_data:
+        assert get_item(item.address, airdrop_data) == item
+
+
+def test_get_balance(airdrop_data):
+    assert get_balance(b"\x05" * 20, airdrop_data) == 5000
+    assert get_balance(b"\x00" * 20, airdrop_data) == 0
+    assert get_balance(b"\xff" * 20, airdrop_data) == 0
+
+
+def test_build_airdrop_tree(airdrop_data, tree_data):
+    tree = build_airdrop_tree(airdrop_data)
+
+    assert tree.root_hash == build_tree(tree_data).root_hash
+    # The tree shares the address buffer with the airdrop data
+    assert tree.addresses is airdrop_data.packed_addresses
+
+
+def test_compute_airdrop_root(airdrop_data, tree_data):
+    assert compute_airdrop_root(airdrop_data) == build_tree(tree_data).root_hash
+
+
+def test_iter_leaf_hashes_in_batches(airdrop_data):
+    leaf_hashes = b"".join(iter_leaf_hashes(airdrop_data, batch_size=3))
+
+    assert leaf_hashes == build_airdrop_tree(airdrop_data).levels[0]
+
+
+def test_empty_airdrop_data_has_no_tree():
+    with pytest.raises(ValueError):
+        build_airdrop_tree(AirdropData.from_mapping({}))
+
+
+@pytest.mark.parametrize(
+    "mapping", [{b"\x01" * 19: 1}, {b"\x01" * 20: -1}, {b"\x01" * 20: 2 ** 256}]
+)
+def test_invalid_airdrop_data(mapping):
+    with pytest.raises(ValueError):
+        AirdropData.from_mapping(mapping)
+
+
+def test_mismatching_packed_buffers():
+    with pytest.raises(ValueError):
+        AirdropData(b"\x01" * 40, b"\x00" * 32)
+
+
+def test_update_airdrop(airdrop_data, tree_data):
+    changes = {b"\x01" * 20: None, b"\x05" * 20: 1, b"\x20" * 20: 2}
+    updated_data = {**dict(tree_data), **changes}
+    del updated_data[b"\x01" * 20]
+
+    updated_airdrop_data, updated_tree = update_airdrop(
+        airdrop_data, build_airdrop_tree(airdrop_data), changes
+    )
+
+    assert updated_airdrop_data == updated_data
+    assert updated_tree.root_hash == build_airdrop_tree(updated_airdrop_data).root_hash
+
+
+def test_can_not_remove_missing_address(airdrop_data):
+    with pytest.raises(ValueError):
+        update_airdrop_data(airdrop_data, {b"\xff" * 20: None})
@@ -0,0 +1,129 @@
+import asyncio
+import json
+
+import pytest
+from eth_utils import to_checksum_address
+
+from merkle_drop import asgi, server
+from merkle_drop.airdrop import AirdropData, build_airdrop_tree
+from merkle_drop.entitlement import EntitlementState
+
+
+@pytest.fixture(autouse=True)
+def state(monkeypatch):
+    airdrop_data = AirdropData.from_mapping({b"\x01" * 20: 1000, b"\x02" * 20: 2000})
+    state = EntitlementState(
+        airdrop_data,
+        build_airdrop_tree(airdrop_data),
+        decay_start_time=2 ** 40,
+        decay_duration_in_seconds=100,
+    )
+    monkeypatch.setattr(server, "state", state)
+    monkeypatch.setattr(asgi, "cors_origins", [])
+    return state
+
+
+def request(method, path, headers=(), body=b""):
+    messages = []
+    # Receive the body in two parts
+    body_parts = [body[:10], body[10:]]
+
+    async def receive():
+        body_part = body_parts.pop(0)
+        return {
+            "type": "http.request",
+            "body": body_part,
+            "more_body": bool(body_parts),
+        }
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "headers": list(headers)}
+    asyncio.run(asgi.app(scope, receive, send))
+
+    start, *body_messages = messages
+    assert all(message["more_body"] for message in body_messages[:-1])
+    return (
+        start["status"],
+        dict(start["headers"]),
+        b"".join(message["body"] for message in body_messages),
+    )
+
+
+def test_get_entitlement():
+    address = to_checksum_address(b"\x02" * 20)
+    status, headers, body = request("GET", f"/entitlement/{address}")
+
+    assert status == 200
+    assert headers[b"content-type"] == b"application/json"
+    assert json.loads(body)["originalTokenBalance"] == "2000"
+    assert json.loads(body)["currentTokenBalance"] == "2000"
+
+
+@pytest.mark.parametrize(
+    ("method", "path", "status"),
+    [
+        ("GET", "/entitlement/0xinvalid", 400),
+        ("GET", "/entitlement/", 404),
+        ("GET", "/other", 404),
+        ("POST", f"/entitlement/{to_checksum_address(b'1' * 20)}", 405),
+        ("GET", "/entitlements", 405),
+    ],
+)
+def test_errors(method, path, status):
+    response_status, _, body = request(method, path)
+
+    assert response_status == status
+    assert json.loads(body)["error"] == status
+
+
+def test_internal_server_error(monkeypatch):
+    monkeypatch.setattr(server, "state", None)
+    status, _, body = request("GET", f"/entitlement/{to_checksum_address(b'1' * 20)}")
+
+    assert status == 500
+    assert json.loads(body) == {
+        "error": 500,
+        "message": "There was an internal server error",
+    }
+
+
+@pytest.mark.parametrize(
+    ("origins", "origin", "allowed_origin"),
+    [
+        ("*", b"http://example.com", b"*"),
+        ("http://example.com", b"http://example.com", b"http://example.com"),
+        (["http://example.com"], b"http://other.com", None),
+    ],
+)
+def test_cors(origins, origin, allowed_origin):
+    asgi.init_cors(origins=origins)
+    _, headers, _ = request("GET", "/other", headers=[(b"origin", origin)])
+
+    assert headers.get(b"access-control-allow-origin") == allowed_origin
+
+
+def test_get_entitlements(monkeypatch):
+    monkeypatch.setattr(asgi, "STREAM_CHUNK_SIZE", 100)
+    addresses = [to_checksum_address(b"\x02" * 20), to_checksum_address(b"\x03" * 20)]
+    status, _, body = request(
+        "POST", "/entitlements", body=json.dumps(addresses * 10).encode()
+    )
+
+    assert status == 200
+    entitlements = json.loads(body)
+    assert [entitlement["address"] for entitlement in entitlements] == addresses * 10
+    assert entitlements[0]["originalTokenBalance"] == "2000"
+    assert entitlements[1]["originalTokenBalance"] == "0"
+
+
+def test_get_too_many_entitlements(monkeypatch):
+    monkeypatch.setattr(server, "max_batch_size", 2)
+    addresses = [to_checksum_address(b"\x02" * 20)] * 3
+    status, _, body = request(
+        "POST", "/entitlements", body=json.dumps(addresses).encode()
+    )
+
+    assert status == 400
+    assert json.loads(body)["message"] == "Expected at most 2 addresses"
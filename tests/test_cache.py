@@ -0,0 +1,107 @@
+import os
+
+import pytest
+
+import merkle_drop.cache
+from merkle_drop.airdrop import compute_airdrop_root
+from merkle_drop.cache import BuildCache, get_default_cache_directory
+from merkle_drop.merkle_tree import build_tree
+
+from .helpers import create_items, write_airdrop_file
+
+
+@pytest.fixture
+def tree_data():
+    return create_items()
+
+
+@pytest.fixture
+def airdrop_file(tmp_path, tree_data):
+    return write_airdrop_file(tmp_path / "airdrop.csv", tree_data)
+
+
+@pytest.fixture
+def build_cache(tmp_path):
+    return BuildCache(str(tmp_path / "cache"))
+
+
+def cache_files(build_cache):
+    return sorted(os.listdir(build_cache.directory))
+
+
+def test_default_cache_directory(monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", "/some/cache")
+
+    assert get_default_cache_directory() == "/some/cache/merkle-drop"
+
+
+def test_cache_miss(build_cache, airdrop_file, tree_data):
+    airdrop_data, tree = build_cache.load(str(airdrop_file))
+
+    assert airdrop_data == dict(tree_data)
+    assert tree.root_hash == build_tree(tree_data).root_hash
+    assert len(cache_files(build_cache)) == 1
+
+
+def test_cache_hit(build_cache, airdrop_file, tree_data, monkeypatch):
+    build_cache.load(str(airdrop_file))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("The airdrop file should not be loaded again")
+
+    monkeypatch.setattr(merkle_drop.cache, "load_airdrop_file", fail)
+    airdrop_data, tree = build_cache.load(str(airdrop_file))
+
+    assert airdrop_data == dict(tree_data)
+    assert tree.root_hash == build_tree(tree_data).root_hash
+
+
+def test_root_of_cached_airdrop_data(build_cache, airdrop_file, tree_data):
+    build_cache.load(str(airdrop_file))
+    airdrop_data, _ = build_cache.load(str(airdrop_file))
+
+    assert compute_airdrop_root(airdrop_data) == build_tree(tree_data).root_hash
+
+
+def test_changed_file_is_not_cached(build_cache, airdrop_file, tree_data):
+    build_cache.load(str(airdrop_file))
+    write_airdrop_file(airdrop_file, tree_data[:-1])
+    airdrop_data, _ = build_cache.load(str(airdrop_file))
+
+    assert airdrop_data == dict(tree_data[:-1])
+    assert len(cache_files(build_cache)) == 2
+
+
+def test_corrupt_entry_is_rebuilt(build_cache, airdrop_file, tree_data):
+    build_cache.load(str(airdrop_file))
+    (cache_file,) = cache_files(build_cache)
+    with open(os.path.join(build_cache.directory, cache_file), "r+b") as file:
+        file.truncate(10)
+
+    airdrop_data, _ = build_cache.load(str(airdrop_file))
+
+    assert airdrop_data == dict(tree_data)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, tree_data):
+    build_cache = BuildCache(str(tmp_path / "cache"))
+    airdrop_files = [
+        write_airdrop_file(tmp_path / f"airdrop{i}.csv", tree_data[i:])
+        for i in range(3)
+    ]
+    build_cache.load(str(airdrop_files[0]))
+    (entry_size,) = (
+        os.path.getsize(os.path.join(build_cache.directory, name))
+        for name in cache_files(build_cache)
+    )
+
+    first_entry = merkle_drop.cache.hash_file(str(airdrop_files[0])) + ".snapshot"
+    # Make sure the first entry is the least recently used one
+    os.utime(os.path.join(build_cache.directory, first_entry), (0, 0))
+
+    build_cache.max_size = 2 * entry_size
+    build_cache.load(str(airdrop_files[1]))
+    build_cache.load(str(airdrop_files[2]))
+
+    assert len(cache_files(build_cache)) == 2
+    assert first_entry not in cache_files(build_cache)
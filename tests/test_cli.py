@@ -1,13 +1,32 @@
+import bz2
+import gzip
+import json
+import lzma
+
 import pendulum
 import pytest
 from click.testing import CliRunner
 from deploy_tools.cli import connect_to_json_rpc
 from deploy_tools.deploy import deploy_compiled_contract, load_contracts_json
-from eth_utils import is_hex, to_checksum_address, to_normalized_address
+from eth_utils import (
+    encode_hex,
+    is_hex,
+    to_canonical_address,
+    to_checksum_address,
+    to_normalized_address,
+)
 from web3.contract import Contract
 
 from merkle_drop.cli import main
-from merkle_drop.load_csv import load_airdrop_file, validate_address_value_pairs
+from merkle_drop.load_csv import (
+    AirdropFileError,
+    load_airdrop_file,
+    load_diff_file,
+    read_airdrop_file,
+    validate_address_value_pairs,
+)
+from merkle_drop.merkle_tree import Item, build_tree, validate_proof
+from merkle_drop.snapshot import load_snapshot
 
 A_ADDRESS = b"\xaa" * 20
 B_ADDRESS = b"\xbb" * 20
@@ -131,12 +150,103 @@ def test_merkle_root_cli(runner, airdrop_list_file):
     assert is_encoded_hash32(result_without_newline)
 
 
+def test_merkle_root_cli_with_jobs(runner, airdrop_list_file):
+    result = runner.invoke(main, ["--jobs", "2", "root", str(airdrop_list_file)])
+    serial_result = runner.invoke(main, ["root", str(airdrop_list_file)])
+
+    assert result.exit_code == 0
+    assert result.output == serial_result.output
+
+
 def test_read_csv_file(airdrop_list_file, airdrop_data):
 
     data = load_airdrop_file(airdrop_list_file)
     assert data == airdrop_data
 
 
+@pytest.mark.parametrize(
+    ("suffix", "compress"),
+    [(".gz", gzip.compress), (".bz2", bz2.compress), (".xz", lzma.compress)],
+)
+def test_read_compressed_csv_file(
+    tmp_path, airdrop_list_file, airdrop_data, suffix, compress
+):
+    compressed_file = tmp_path / f"airdrop_list.csv{suffix}"
+    compressed_file.write_bytes(compress(airdrop_list_file.read_bytes()))
+
+    data = load_airdrop_file(str(compressed_file))
+    assert data == airdrop_data
+
+
+def test_read_csv_file_streams_lines(airdrop_list_file, tree_data):
+    lines = read_airdrop_file(airdrop_list_file)
+
+    assert next(lines) == tuple(tree_data[0])
+    assert list(lines) == [tuple(item) for item in tree_data[1:]]
+
+
+def test_read_csv_file_with_duplicate(tmp_path, airdrop_list_file):
+    duplicate_file = tmp_path / "duplicate.csv"
+    content = airdrop_list_file.read_text()
+    duplicate_file.write_text(content + "\n" + content.splitlines()[0])
+
+    with pytest.raises(ValueError, match="multiple times"):
+        load_airdrop_file(duplicate_file)
+
+
+def test_read_invalid_csv_file_reports_line(tmp_path, airdrop_list_file):
+    invalid_file = tmp_path / "invalid.csv"
+    invalid_file.write_text(airdrop_list_file.read_text() + "\n0xinvalid,1")
+
+    with pytest.raises(ValueError, match="line 6"):
+        load_airdrop_file(invalid_file)
+
+
+@pytest.mark.parametrize("workers", [2, 3, 8])
+def test_read_csv_file_in_parallel(airdrop_list_file, airdrop_data, workers):
+    data = load_airdrop_file(airdrop_list_file, workers=workers)
+    assert data == airdrop_data
+
+
+@pytest.mark.parametrize("workers", [1, 2, 3])
+def test_read_invalid_csv_file_reports_all_errors(tmp_path, airdrop_list_file, workers):
+    lines = airdrop_list_file.read_text().splitlines()
+    lines[1] = "0xinvalid,1"
+    lines[3] = lines[0]
+    invalid_file = tmp_path / "invalid.csv"
+    invalid_file.write_text("\n".join(lines + ["", lines[2].split(",")[0] + ",-1"]))
+
+    with pytest.raises(AirdropFileError) as exception_info:
+        load_airdrop_file(invalid_file, workers=workers)
+
+    errors = exception_info.value.errors
+    assert len(errors) == 4
+    assert all(
+        f"line {line_number}" in error
+        for line_number, error in zip([2, 4, 6, 7], errors)
+    )
+
+
+def test_read_csv_file_in_sorted_runs(
+    tmp_path, airdrop_list_file, airdrop_data, monkeypatch
+):
+    monkeypatch.setattr("merkle_drop.load_csv._RUN_SIZE", 2)
+    assert load_airdrop_file(airdrop_list_file) == airdrop_data
+
+    lines = airdrop_list_file.read_text().splitlines()
+    address = lines[0].split(",")[0]
+    invalid_file = tmp_path / "invalid.csv"
+    invalid_file.write_text("\n".join(lines + [lines[0], f"{address},{2 ** 256}"]))
+
+    with pytest.raises(AirdropFileError) as exception_info:
+        load_airdrop_file(invalid_file)
+
+    errors = exception_info.value.errors
+    assert len(errors) == 2
+    assert f"multiple times in line {len(lines) + 1}" in errors[0]
+    assert f"below 2 ** 256 in line {len(lines) + 2}" in errors[1]
+
+
 @pytest.mark.parametrize(
     "address_value_pairs",
     [
@@ -170,6 +280,19 @@ def test_invalid_airdrop_file_validation(address_value_pairs):
         validate_address_value_pairs(address_value_pairs)
 
 
+def test_merkle_root_cli_with_cache(runner, tmp_path, airdrop_list_file):
+    cache_directory = tmp_path / "cache"
+    args = ["--cache", "--cache-dir", str(cache_directory), "root"]
+
+    result = runner.invoke(main, args + [str(airdrop_list_file)])
+    cached_result = runner.invoke(main, args + [str(airdrop_list_file)])
+    uncached_result = runner.invoke(main, ["root", str(airdrop_list_file)])
+
+    assert result.exit_code == cached_result.exit_code == 0
+    assert result.output == cached_result.output == uncached_result.output
+    assert len(list(cache_directory.iterdir())) == 1
+
+
 def test_merkle_balance_cli(runner, airdrop_list_file, airdrop_data):
     address = next(iter(airdrop_data.keys()))
     result = runner.invoke(
@@ -208,6 +331,300 @@ def test_not_existing_merkle_proof_cli(runner, airdrop_list_file):
     assert result.exit_code == 2
 
 
+def test_merkle_proofs_cli(runner, airdrop_list_file, airdrop_data, tree_data):
+    result = runner.invoke(main, ["proofs", str(airdrop_list_file)])
+    assert result.exit_code == 0
+
+    entries = [json.loads(line) for line in result.output.splitlines()]
+    assert {entry["address"] for entry in entries} == {
+        to_checksum_address(address) for address in airdrop_data
+    }
+
+    root_result = runner.invoke(main, ["root", str(airdrop_list_file)])
+    root = bytes.fromhex(root_result.output.strip()[2:])
+    for entry in entries:
+        item = Item(to_canonical_address(entry["address"]), int(entry["value"]))
+        proof = [bytes.fromhex(hash_[2:]) for hash_ in entry["proof"]]
+        assert validate_proof(item, proof, root)
+
+
+def test_merkle_proofs_cli_with_addresses(
+    runner, tmp_path, airdrop_list_file, airdrop_data
+):
+    eligible_address = list(airdrop_data.keys())[1]
+    addresses_file = tmp_path / "addresses.txt"
+    addresses_file.write_text(
+        f"{to_checksum_address(eligible_address)}\n{to_checksum_address(C_ADDRESS)}\n"
+    )
+    output_file = tmp_path / "proofs.jsonl"
+
+    result = runner.invoke(
+        main,
+        [
+            "proofs",
+            "--addresses",
+            str(addresses_file),
+            "--output",
+            str(output_file),
+            str(airdrop_list_file),
+        ],
+    )
+    assert result.exit_code == 0
+
+    eligible_entry, not_eligible_entry = (
+        json.loads(line) for line in output_file.read_text().splitlines()
+    )
+    assert eligible_entry["value"] == str(airdrop_data[eligible_address])
+    assert len(eligible_entry["proof"]) == 3
+    assert not_eligible_entry == {
+        "address": to_checksum_address(C_ADDRESS),
+        "value": "0",
+        "proof": [],
+    }
+
+
+def test_merkle_proofs_cli_invalid_address(runner, tmp_path, airdrop_list_file):
+    addresses_file = tmp_path / "addresses.txt"
+    addresses_file.write_text("0xinvalid\n")
+
+    result = runner.invoke(
+        main, ["proofs", "--addresses", str(addresses_file), str(airdrop_list_file)]
+    )
+    assert result.exit_code == 2
+
+
+def test_verify_proofs_cli(runner, tmp_path, airdrop_list_file):
+    proofs_file = tmp_path / "proofs.jsonl"
+    runner.invoke(
+        main, ["proofs", "--output", str(proofs_file), str(airdrop_list_file)]
+    )
+
+    result = runner.invoke(
+        main,
+        ["verify-proofs", "--airdrop-file", str(airdrop_list_file), str(proofs_file)],
+    )
+    assert result.exit_code == 0
+    assert "All proofs match" in result.output
+
+    root = runner.invoke(main, ["root", str(airdrop_list_file)]).output.strip()
+    lines = proofs_file.read_text().splitlines()
+    entry = json.loads(lines[1])
+    entry["value"] = str(int(entry["value"]) + 1)
+    lines[1] = json.dumps(entry)
+    proofs_file.write_text("\n".join(lines) + "\n")
+
+    result = runner.invoke(main, ["verify-proofs", "--root", root, str(proofs_file)])
+    assert result.exit_code == 1
+    assert f"The proof of {entry['address']} does not match the root in line 2" in (
+        result.output
+    )
+
+
+def test_verify_proofs_cli_with_eligible_address_without_proof(
+    runner, tmp_path, airdrop_list_file
+):
+    proofs_file = tmp_path / "proofs.jsonl"
+    runner.invoke(
+        main, ["proofs", "--output", str(proofs_file), str(airdrop_list_file)]
+    )
+    lines = proofs_file.read_text().splitlines()
+    entry = json.loads(lines[0])
+    entry.update(value="0", proof=[])
+    lines[0] = json.dumps(entry)
+    proofs_file.write_text("\n".join(lines) + "\n")
+    root = runner.invoke(main, ["root", str(airdrop_list_file)]).output.strip()
+
+    result = runner.invoke(main, ["verify-proofs", "--root", root, str(proofs_file)])
+    assert result.exit_code == 0
+    assert f"{entry['address']} in line 1" in result.output
+
+    result = runner.invoke(
+        main,
+        ["verify-proofs", "--airdrop-file", str(airdrop_list_file), str(proofs_file)],
+    )
+    assert result.exit_code == 1
+    assert (
+        f"The eligible address {entry['address']} has no proof in line 1"
+        in result.output
+    )
+
+
+def test_verify_proofs_cli_needs_one_root(runner, tmp_path, airdrop_list_file):
+    proofs_file = tmp_path / "proofs.jsonl"
+    proofs_file.write_text("")
+
+    result = runner.invoke(main, ["verify-proofs", str(proofs_file)])
+    assert result.exit_code == 2
+
+    result = runner.invoke(
+        main, ["verify-proofs", "--root", "0x1234", str(proofs_file)]
+    )
+    assert result.exit_code == 2
+
+
+def test_build_cli(runner, tmp_path, airdrop_list_file, airdrop_data):
+    snapshot_file = tmp_path / "airdrop.snapshot"
+    result = runner.invoke(
+        main,
+        args=f"build --output {snapshot_file} --decay-start-time 123456789 "
+        f"--decay-duration 1000 {airdrop_list_file}",
+    )
+    assert result.exit_code == 0
+
+    snapshot = load_snapshot(str(snapshot_file))
+    assert snapshot.airdrop_data == airdrop_data
+    assert snapshot.decay_start_time == 123456789
+    assert snapshot.decay_duration_in_seconds == 1000
+    assert encode_hex(snapshot.tree.root_hash) in result.output
+
+
+def test_build_cli_out_of_core(runner, tmp_path, airdrop_list_file, airdrop_data):
+    snapshot_file = tmp_path / "airdrop.snapshot"
+    result = runner.invoke(
+        main,
+        args=f"build --output {snapshot_file} --work-dir {tmp_path / 'work'} "
+        f"--memory-budget 1000 --decay-start-time 123456789 {airdrop_list_file}",
+    )
+    assert result.exit_code == 0
+
+    snapshot = load_snapshot(str(snapshot_file))
+    assert snapshot.airdrop_data == airdrop_data
+    assert snapshot.decay_start_time == 123456789
+    assert encode_hex(snapshot.tree.root_hash) in result.output
+
+
+def test_gen_synthetic_cli(runner, tmp_path):
+    airdrop_file = tmp_path / "airdrop.csv.gz"
+    result = runner.invoke(
+        main, args=f"gen-synthetic --output {airdrop_file} --seed 3 100"
+    )
+    assert result.exit_code == 0
+
+    airdrop_data = load_airdrop_file(str(airdrop_file))
+    assert len(airdrop_data) == 100
+    assert all(1 <= value <= 10 ** 24 for value in airdrop_data.values())
+
+    snapshot_file = tmp_path / "airdrop.snapshot"
+    result = runner.invoke(
+        main,
+        args=f"gen-synthetic --output {snapshot_file} --format snapshot --seed 3 "
+        f"--decay-start-time 123456789 100",
+    )
+    assert result.exit_code == 0
+
+    snapshot = load_snapshot(str(snapshot_file))
+    assert snapshot.airdrop_data == airdrop_data
+    assert snapshot.decay_start_time == 123456789
+    assert encode_hex(snapshot.tree.root_hash) in result.output
+
+
+def test_gen_synthetic_cli_invalid_values(runner, tmp_path):
+    result = runner.invoke(
+        main,
+        args=f"gen-synthetic --output {tmp_path / 'airdrop.csv'} "
+        f"--min-value 10 --max-value 1 100",
+    )
+    assert result.exit_code == 2
+
+
+def test_loadtest_cli(runner, tmp_path, airdrop_list_file):
+    output_file = tmp_path / "results.json"
+    result = runner.invoke(
+        main,
+        args=f"loadtest --concurrency 2 --requests 50 --output {output_file} "
+        f"{airdrop_list_file}",
+    )
+    assert result.exit_code == 0
+    assert "Errors: 0" in result.output
+
+    results = json.loads(output_file.read_text())
+    assert results["requests"] == 50
+    assert results["errors"] == 0
+
+
+def test_loadtest_cli_with_empty_airdrop(runner, tmp_path):
+    airdrop_file = tmp_path / "airdrop.csv"
+    airdrop_file.write_text("")
+
+    result = runner.invoke(main, args=f"loadtest --url http://localhost {airdrop_file}")
+    assert result.exit_code == 2
+    assert "at least one entry" in result.output
+
+
+def test_load_diff_file(tmp_path):
+    diff_file = tmp_path / "diff.csv"
+    diff_file.write_text(
+        f"{to_checksum_address(A_ADDRESS)},10\n{to_checksum_address(B_ADDRESS)},\n"
+    )
+
+    assert load_diff_file(str(diff_file)) == {A_ADDRESS: 10, B_ADDRESS: None}
+
+
+def test_load_invalid_diff_file(tmp_path):
+    diff_file = tmp_path / "diff.csv"
+    diff_file.write_text(
+        f"{to_checksum_address(A_ADDRESS)},10\n"
+        f"0xdead,\n"
+        f"{to_checksum_address(A_ADDRESS)},\n"
+    )
+
+    with pytest.raises(AirdropFileError) as exception_info:
+        load_diff_file(str(diff_file))
+
+    assert len(exception_info.value.errors) == 2
+
+
+def test_apply_diff_cli(runner, tmp_path, airdrop_list_file, tree_data):
+    snapshot_file = tmp_path / "airdrop.snapshot"
+    updated_snapshot_file = tmp_path / "updated.snapshot"
+    diff_file = tmp_path / "diff.csv"
+    removed_address, _ = tree_data[0]
+    changed_address, _ = tree_data[1]
+    diff_file.write_text(
+        f"{to_checksum_address(removed_address)},\n"
+        f"{to_checksum_address(changed_address)},42\n"
+        f"{to_checksum_address(D_ADDRESS)},7\n"
+    )
+    expected_airdrop_data = dict(tree_data[1:])
+    expected_airdrop_data[changed_address] = 42
+    expected_airdrop_data[D_ADDRESS] = 7
+
+    runner.invoke(
+        main,
+        args=f"build --output {snapshot_file} --decay-start-time 123456789 "
+        f"{airdrop_list_file}",
+    )
+    result = runner.invoke(
+        main,
+        args=f"apply-diff --output {updated_snapshot_file} {snapshot_file} {diff_file}",
+    )
+    assert result.exit_code == 0
+
+    snapshot = load_snapshot(str(updated_snapshot_file))
+    expected_tree = build_tree(
+        [Item(address, value) for address, value in expected_airdrop_data.items()]
+    )
+    assert snapshot.airdrop_data == expected_airdrop_data
+    assert snapshot.tree.levels == expected_tree.levels
+    assert encode_hex(expected_tree.root_hash) in result.output
+
+
+def test_apply_diff_cli_can_not_overwrite_snapshot(runner, tmp_path, airdrop_list_file):
+    snapshot_file = tmp_path / "airdrop.snapshot"
+    diff_file = tmp_path / "diff.csv"
+    diff_file.write_text(f"{to_checksum_address(D_ADDRESS)},7\n")
+
+    runner.invoke(
+        main,
+        args=f"build --output {snapshot_file} --decay-start-time 123456789 "
+        f"{airdrop_list_file}",
+    )
+    result = runner.invoke(
+        main, args=f"apply-diff --output {snapshot_file} {snapshot_file} {diff_file}"
+    )
+    assert result.exit_code == 2
+
+
 def test_deploy_cli(runner, airdrop_list_file):
     result = runner.invoke(
         main,
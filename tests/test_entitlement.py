@@ -0,0 +1,216 @@
+import json
+
+import pytest
+from eth_utils import to_checksum_address
+from flask import Flask, jsonify
+
+from merkle_drop.airdrop import AirdropData, build_airdrop_tree
+from merkle_drop.entitlement import (
+    EntitlementCache,
+    EntitlementState,
+    InvalidAddressError,
+    InvalidBatchError,
+    PrecomputedEntitlement,
+    decay_tokens,
+    encode_entitlement,
+    get_encoded_entitlement,
+    get_entitlement,
+    iter_encoded_entitlements,
+    parse_batch,
+    precompute_entitlements,
+)
+from merkle_drop.merkle_tree import validate_proof
+
+from .helpers import create_items
+
+
+@pytest.fixture
+def tree_data():
+    return create_items()
+
+
+@pytest.fixture
+def state(tree_data):
+    airdrop_data = AirdropData.from_mapping(dict(tree_data))
+    return EntitlementState(
+        airdrop_data,
+        build_airdrop_tree(airdrop_data),
+        decay_start_time=1000,
+        decay_duration_in_seconds=100,
+    )
+
+
+def test_get_entitlement(state, tree_data):
+    item = tree_data[4]
+    entitlement = get_entitlement(state, to_checksum_address(item.address), 1050)
+
+    assert entitlement["address"] == to_checksum_address(item.address)
+    assert entitlement["originalTokenBalance"] == "5000"
+    assert entitlement["currentTokenBalance"] == "2500"
+    assert validate_proof(
+        item,
+        [bytes.fromhex(hash_[2:]) for hash_ in entitlement["proof"]],
+        state.tree.root_hash,
+    )
+
+
+def test_get_entitlement_of_ineligible_address(state):
+    entitlement = get_entitlement(state, to_checksum_address(b"\xff" * 20), 1050)
+
+    assert entitlement["originalTokenBalance"] == "0"
+    assert entitlement["currentTokenBalance"] == "0"
+    assert entitlement["proof"] == []
+
+
+@pytest.mark.parametrize(
+    "address", [to_checksum_address(b"\x05" * 20), to_checksum_address(b"\xff" * 20)]
+)
+def test_entitlement_is_encoded_like_jsonify(state, address):
+    entitlement = get_entitlement(state, address, 1050)
+
+    with Flask(__name__).app_context():
+        assert encode_entitlement(entitlement) == jsonify(entitlement).get_data()
+
+
+def test_get_entitlement_of_invalid_address(state):
+    with pytest.raises(InvalidAddressError):
+        get_entitlement(state, "0xinvalid", 1050)
+
+
+@pytest.mark.parametrize(
+    ("now", "decayed_tokens"), [(0, 1000), (1000, 1000), (1001, 990), (1100, 0)]
+)
+def test_decay_tokens(state, now, decayed_tokens):
+    assert decay_tokens(state, 1000, now) == decayed_tokens
+
+
+@pytest.fixture
+def precomputed_state(state):
+    return state._replace(
+        precomputed_entitlements=precompute_entitlements(state.airdrop_data, state.tree)
+    )
+
+
+@pytest.mark.parametrize("now", [0, 1050, 2000])
+def test_precomputed_entitlements_are_encoded_the_same(
+    state, precomputed_state, tree_data, now
+):
+    for address, _ in tree_data:
+        checksum_address = to_checksum_address(address)
+        assert checksum_address in precomputed_state.precomputed_entitlements
+
+        assert get_encoded_entitlement(
+            precomputed_state, checksum_address, now
+        ) == encode_entitlement(get_entitlement(state, checksum_address, now))
+
+
+@pytest.mark.parametrize(
+    "address",
+    [
+        to_checksum_address(b"\x05" * 20).lower(),
+        to_checksum_address(b"\xff" * 20),
+    ],
+)
+def test_entitlements_without_precomputed_response(state, precomputed_state, address):
+    assert get_encoded_entitlement(
+        precomputed_state, address, 1050
+    ) == encode_entitlement(get_entitlement(state, address, 1050))
+
+
+def test_addresses_without_tokens_are_not_precomputed():
+    airdrop_data = AirdropData.from_mapping({b"\x01" * 20: 0, b"\x02" * 20: 1})
+
+    precomputed_entitlements = precompute_entitlements(
+        airdrop_data, build_airdrop_tree(airdrop_data)
+    )
+
+    assert list(precomputed_entitlements) == [to_checksum_address(b"\x02" * 20)]
+
+
+def test_entitlement_cache_evicts_least_recently_used():
+    entitlement_cache = EntitlementCache(max_size=2)
+    entry = PrecomputedEntitlement(b"", 1, b"")
+    entitlement_cache.put(b"a", entry)
+    entitlement_cache.put(b"b", entry)
+    entitlement_cache.get(b"a")
+    entitlement_cache.put(b"c", entry)
+
+    assert len(entitlement_cache) == 2
+    assert entitlement_cache.get(b"b") is None
+    assert entitlement_cache.get(b"a") == entry
+    assert entitlement_cache.get(b"c") == entry
+    assert entitlement_cache.hits == 3
+    assert entitlement_cache.misses == 1
+    assert entitlement_cache.evictions == 1
+
+
+def test_cached_entitlements_are_encoded_the_same(state, tree_data):
+    cached_state = state._replace(entitlement_cache=EntitlementCache(max_size=3))
+    addresses = [to_checksum_address(address) for address, _ in tree_data]
+
+    for address in addresses + addresses[-2:]:
+        assert get_encoded_entitlement(
+            cached_state, address, 1050
+        ) == encode_entitlement(get_entitlement(state, address, 1050))
+
+    assert cached_state.entitlement_cache.hits == 2
+    assert cached_state.entitlement_cache.misses == len(tree_data)
+    assert cached_state.entitlement_cache.evictions == len(tree_data) - 3
+
+
+def test_cache_skips_ineligible_and_invalid_addresses(state):
+    cached_state = state._replace(entitlement_cache=EntitlementCache(max_size=3))
+    ineligible_address = to_checksum_address(b"\xff" * 20)
+
+    assert get_encoded_entitlement(
+        cached_state, ineligible_address, 1050
+    ) == encode_entitlement(get_entitlement(state, ineligible_address, 1050))
+    assert len(cached_state.entitlement_cache) == 0
+    with pytest.raises(InvalidAddressError):
+        get_encoded_entitlement(cached_state, "0xinvalid", 1050)
+
+
+def test_parse_batch():
+    addresses = [to_checksum_address(b"\x01" * 20), to_checksum_address(b"\x02" * 20)]
+
+    assert parse_batch(json.dumps(addresses).encode(), max_batch_size=2) == addresses
+
+
+@pytest.mark.parametrize(
+    ("body", "exception"),
+    [
+        (b"not json", InvalidBatchError),
+        (b'{"addresses": []}', InvalidBatchError),
+        (b"[1, 2]", InvalidBatchError),
+        (
+            json.dumps([to_checksum_address(b"\x01" * 20)] * 3).encode(),
+            InvalidBatchError,
+        ),
+        (b" " * 1000 + b"[]", InvalidBatchError),
+        (b'["0xinvalid"]', InvalidAddressError),
+    ],
+)
+def test_parse_invalid_batch(body, exception):
+    with pytest.raises(exception):
+        parse_batch(body, max_batch_size=2)
+
+
+def test_iter_encoded_entitlements(state, tree_data):
+    addresses = [to_checksum_address(address) for address, _ in tree_data] + [
+        to_checksum_address(b"\xff" * 20)
+    ]
+
+    encoded_entitlements = b"".join(iter_encoded_entitlements(state, addresses, 1050))
+
+    entitlements = [get_entitlement(state, address, 1050) for address in addresses]
+    with Flask(__name__).app_context():
+        assert encoded_entitlements == jsonify(entitlements).get_data()
+
+
+def test_iter_encoded_entitlements_observes_every_entitlement(state, tree_data):
+    addresses = [to_checksum_address(address) for address, _ in tree_data]
+    start_times = []
+
+    b"".join(iter_encoded_entitlements(state, addresses, 1050, start_times.append))
+
+    assert len(start_times) == len(addresses)
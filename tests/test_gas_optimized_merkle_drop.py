@@ -0,0 +1,147 @@
+import random
+
+import eth_tester.exceptions
+import pytest
+
+from merkle_drop.merkle_tree import Item, compute_leaf_hash, compute_parent_hash
+
+
+@pytest.fixture()
+def deploy_merkle_drop_with_token(
+    deploy_contract, premint_token_owner, decay_start_time, decay_duration
+):
+    """Deploy a MerkleDrop contract with its own token to drop"""
+
+    def deploy(contract_name, root_hash, value):
+        token_contract = deploy_contract(
+            "DroppedToken",
+            constructor_args=("droppedToken", "DTN", 18, premint_token_owner, value),
+        )
+        contract = deploy_contract(
+            contract_name,
+            constructor_args=(
+                token_contract.address,
+                value,
+                root_hash,
+                decay_start_time,
+                decay_duration,
+            ),
+        )
+        token_contract.functions.transfer(contract.address, value).transact(
+            {"from": premint_token_owner}
+        )
+        return contract, token_contract
+
+    return deploy
+
+
+@pytest.fixture()
+def gas_optimized_merkle_drop_contract(
+    deploy_merkle_drop_with_token, root_hash_for_tree_data, premint_token_value
+):
+    contract, _ = deploy_merkle_drop_with_token(
+        "GasOptimizedMerkleDrop", root_hash_for_tree_data, premint_token_value
+    )
+    return contract
+
+
+def test_same_entitlements_as_merkle_drop(
+    gas_optimized_merkle_drop_contract,
+    merkle_drop_contract,
+    tree_data,
+    other_data,
+    proofs_for_tree_data,
+):
+    entitlements = []
+    for item, proof in zip(tree_data, proofs_for_tree_data):
+        entitlements.append((item.address, item.value, proof))
+        entitlements.append((item.address, item.value + 1234, proof))
+        entitlements.append((other_data[0].address, other_data[0].value, proof))
+    entitlements.append((tree_data[0].address, tree_data[0].value, []))
+
+    for entitlement in entitlements:
+        assert (
+            gas_optimized_merkle_drop_contract.functions.verifyEntitled(
+                *entitlement
+            ).call()
+            == merkle_drop_contract.functions.verifyEntitled(*entitlement).call()
+        )
+
+    assert all(
+        gas_optimized_merkle_drop_contract.functions.verifyEntitled(
+            item.address, item.value, proof
+        ).call()
+        for item, proof in zip(tree_data, proofs_for_tree_data)
+    )
+
+
+def test_withdraw(
+    deploy_merkle_drop_with_token,
+    root_hash_for_tree_data,
+    premint_token_value,
+    eligible_address_0,
+    eligible_value_0,
+    proof_0,
+):
+    contract, token_contract = deploy_merkle_drop_with_token(
+        "GasOptimizedMerkleDrop", root_hash_for_tree_data, premint_token_value
+    )
+
+    contract.functions.withdraw(eligible_value_0, proof_0).transact(
+        {"from": eligible_address_0}
+    )
+
+    assert token_contract.functions.balanceOf(eligible_address_0).call() == (
+        eligible_value_0
+    )
+    with pytest.raises(eth_tester.exceptions.TransactionFailed):
+        contract.functions.withdraw(eligible_value_0, proof_0).transact(
+            {"from": eligible_address_0}
+        )
+
+
+def test_withdraw_wrong_proof(gas_optimized_merkle_drop_contract, other_data, proof_0):
+    with pytest.raises(eth_tester.exceptions.TransactionFailed):
+        gas_optimized_merkle_drop_contract.functions.withdraw(
+            other_data[0].value, proof_0
+        ).transact({"from": other_data[0].address})
+
+
+@pytest.mark.parametrize("proof_length", [5, 10, 15, 20, 25])
+def test_gas_comparison(
+    deploy_merkle_drop_with_token,
+    web3,
+    eligible_address_0,
+    eligible_value_0,
+    proof_length,
+    record_property,
+):
+    # A proof of a tree with 2 ** proof_length leaves, without building the tree
+    rng = random.Random(proof_length)
+    proof = [rng.getrandbits(256).to_bytes(32, "big") for _ in range(proof_length)]
+    root_hash = compute_leaf_hash(Item(eligible_address_0, eligible_value_0))
+    for hash_ in proof:
+        root_hash = compute_parent_hash(root_hash, hash_)
+
+    gas = {}
+    for contract_name in ["MerkleDrop", "GasOptimizedMerkleDrop"]:
+        contract, token_contract = deploy_merkle_drop_with_token(
+            contract_name, root_hash, eligible_value_0
+        )
+        verify_gas = contract.functions.verifyEntitled(
+            eligible_address_0, eligible_value_0, proof
+        ).estimateGas()
+        transaction_hash = contract.functions.withdraw(
+            eligible_value_0, proof
+        ).transact({"from": eligible_address_0})
+        withdraw_gas = web3.eth.waitForTransactionReceipt(transaction_hash).gasUsed
+        assert token_contract.functions.balanceOf(contract.address).call() == 0
+
+        gas[contract_name] = (verify_gas, withdraw_gas)
+        record_property(f"{contract_name}_verify_gas", verify_gas)
+        record_property(f"{contract_name}_withdraw_gas", withdraw_gas)
+
+    verify_gas, withdraw_gas = gas["MerkleDrop"]
+    optimized_verify_gas, optimized_withdraw_gas = gas["GasOptimizedMerkleDrop"]
+    assert optimized_verify_gas < verify_gas
+    assert optimized_withdraw_gas < withdraw_gas
@@ -0,0 +1,56 @@
+import pytest
+from eth_utils import keccak as eth_utils_keccak, to_checksum_address
+
+from merkle_drop.hashing import checksum_encode, hash_leaves, hash_parents, keccak
+from merkle_drop.merkle_tree import Item, compute_leaf_hash, compute_parent_hash
+
+
+@pytest.fixture
+def items():
+    return [Item(bytes([i]) * 20, i ** 40) for i in range(1, 8)]
+
+
+@pytest.mark.parametrize("data", [b"", b"\xaa", b"\xbb" * 64, bytes(range(256))])
+def test_keccak(data):
+    assert keccak(data) == eth_utils_keccak(data)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_checksum_encode(seed):
+    address = keccak(bytes([seed]))[:20]
+    assert checksum_encode(address) == to_checksum_address(address)
+
+
+def test_hash_leaves(items):
+    addresses = b"".join(item.address for item in items)
+    values = b"".join(item.value.to_bytes(32, "big") for item in items)
+
+    assert hash_leaves(addresses, values) == b"".join(
+        compute_leaf_hash(item) for item in items
+    )
+
+
+def test_hash_leaves_with_missing_value(items):
+    addresses = b"".join(item.address for item in items)
+    values = b"".join(item.value.to_bytes(32, "big") for item in items[:-1])
+
+    with pytest.raises(ValueError):
+        hash_leaves(addresses, values)
+
+
+@pytest.mark.parametrize("number_of_hashes", [1, 2, 3, 6, 7])
+def test_hash_parents(number_of_hashes):
+    hashes = [keccak(bytes([i])) for i in range(number_of_hashes)]
+    parents = [
+        compute_parent_hash(left_hash, right_hash)
+        for left_hash, right_hash in zip(hashes[0::2], hashes[1::2])
+    ]
+    if number_of_hashes % 2 != 0:
+        parents.append(hashes[-1])
+
+    assert hash_parents(b"".join(hashes)) == b"".join(parents)
+
+
+def test_hash_parents_of_invalid_level():
+    with pytest.raises(ValueError):
+        hash_parents(b"\xaa" * 33)
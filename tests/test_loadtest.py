@@ -0,0 +1,119 @@
+import socket
+import threading
+
+import pytest
+from eth_utils import is_address, is_checksum_address, to_canonical_address
+from werkzeug.serving import make_server
+
+from merkle_drop import server
+from merkle_drop.airdrop import AirdropData, build_airdrop_tree
+from merkle_drop.entitlement import EntitlementState
+from merkle_drop.loadtest import (
+    RequestResult,
+    create_request_paths,
+    run_load_test,
+    summarize_results,
+)
+
+from .helpers import create_items
+
+
+@pytest.fixture
+def airdrop_data():
+    return AirdropData.from_mapping(dict(create_items(19)))
+
+
+@pytest.fixture
+def server_url(airdrop_data, monkeypatch):
+    monkeypatch.setattr(
+        server,
+        "state",
+        EntitlementState(
+            airdrop_data,
+            build_airdrop_tree(airdrop_data),
+            decay_start_time=2 ** 40,
+            decay_duration_in_seconds=100,
+        ),
+    )
+    http_server = make_server("127.0.0.1", 0, server.app, threaded=True)
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{http_server.socket.getsockname()[1]}"
+    http_server.shutdown()
+
+
+def test_create_request_paths(airdrop_data):
+    request_paths = create_request_paths(
+        airdrop_data, 1000, {"eligible": 2, "ineligible": 1, "malformed": 1}
+    )
+
+    kinds = [kind for kind, _ in request_paths]
+    assert 400 < kinds.count("eligible") < 600
+    assert 150 < kinds.count("malformed") < 350
+    for kind, path in request_paths:
+        address = path[len("/entitlement/") :]
+        if kind == "malformed":
+            assert not is_address(address)
+        else:
+            assert is_checksum_address(address)
+            assert (to_canonical_address(address) in airdrop_data) == (
+                kind == "eligible"
+            )
+
+
+def test_create_request_paths_of_empty_airdrop():
+    empty_airdrop_data = AirdropData.from_mapping({})
+
+    with pytest.raises(ValueError, match="at least one entry"):
+        create_request_paths(empty_airdrop_data, 10)
+    request_paths = create_request_paths(
+        empty_airdrop_data, 10, {"ineligible": 1, "malformed": 1}
+    )
+    assert len(request_paths) == 10
+
+
+def test_create_request_paths_is_deterministic(airdrop_data):
+    assert create_request_paths(airdrop_data, 10, seed=1) == create_request_paths(
+        airdrop_data, 10, seed=1
+    )
+
+
+def test_summarize_results():
+    results = [RequestResult("eligible", 200, latency / 100) for latency in range(100)]
+    results.append(RequestResult("malformed", 200, 2.0))
+    results.append(RequestResult("ineligible", None, 3.0))
+
+    summary = summarize_results("http://localhost", 2, results, 2.0)
+
+    assert summary["requests"] == 102
+    assert summary["throughput"] == 51
+    assert summary["latency_seconds"]["p50"] == 0.5
+    assert summary["latency_seconds"]["p99"] == 2.0
+    assert summary["latency_seconds"]["max"] == 3.0
+    assert summary["errors"] == 2
+    assert summary["statuses"] == {"200": 101, "failed": 1}
+    assert summary["kinds"]["malformed"] == {"requests": 1, "errors": 1}
+
+
+def test_run_load_test(airdrop_data, server_url):
+    request_paths = create_request_paths(airdrop_data, 200)
+
+    summary = run_load_test(server_url, request_paths, concurrency=4)
+
+    assert summary["requests"] == 200
+    assert summary["errors"] == 0
+    assert summary["statuses"]["200"] + summary["statuses"].get("400", 0) == 200
+    assert 0 < summary["latency_seconds"]["p50"] <= summary["latency_seconds"]["p99"]
+
+
+def test_run_load_test_without_server(airdrop_data):
+    with socket.socket() as unused_socket:
+        unused_socket.bind(("127.0.0.1", 0))
+        port = unused_socket.getsockname()[1]
+
+    summary = run_load_test(
+        f"http://127.0.0.1:{port}", create_request_paths(airdrop_data, 10), 2
+    )
+
+    assert summary["errors"] == 10
+    assert summary["statuses"] == {"failed": 10}
@@ -1,10 +1,14 @@
+import itertools
 import math
+import random
 
 import eth_tester.exceptions
 import pytest
 from eth_utils import to_checksum_address
 from web3.exceptions import BadFunctionCallOutput
 
+from merkle_drop.merkle_tree import Item, build_tree, create_multiproof, create_proof
+
 
 @pytest.fixture()
 def merkle_drop_contract_already_withdrawn(
@@ -26,6 +30,49 @@ def merkle_drop_contract_already_withdrawn(
     return merkle_drop_contract
 
 
+@pytest.fixture(scope="session")
+def large_tree_data():
+    rng = random.Random(0)
+    return sorted(
+        Item(rng.getrandbits(160).to_bytes(20, "big"), rng.randrange(1, 10 ** 24))
+        for _ in range(1000)
+    )
+
+
+@pytest.fixture(scope="session")
+def merkle_drop_contract_large_tree(
+    deploy_contract,
+    large_tree_data,
+    dropped_token_contract,
+    decay_start_time,
+    decay_duration,
+):
+    # Only used to verify proofs, so it does not need any token
+    return deploy_contract(
+        "MerkleDrop",
+        constructor_args=(
+            dropped_token_contract.address,
+            sum(item.value for item in large_tree_data),
+            build_tree(large_tree_data).root_hash,
+            decay_start_time,
+            decay_duration,
+        ),
+    )
+
+
+def verify_multiproof(merkle_drop_contract, items, multiproof):
+    return merkle_drop_contract.functions.verifyMultiProof(
+        [item.address for item in items],
+        [item.value for item in items],
+        multiproof.proof,
+        multiproof.flags,
+    )
+
+
+def calldata_length(contract, function_name, args):
+    return len(bytes.fromhex(contract.encodeABI(fn_name=function_name, args=args)[2:]))
+
+
 @pytest.fixture()
 def time_travel_chain_to_decay_multiplier(chain, decay_start_time, decay_duration):
     def time_travel(decay_multiplier):
@@ -99,6 +146,89 @@ def test_incorrect_proof_entitlement(
     )
 
 
+def test_multiproof_entitlement(merkle_drop_contract, tree_data):
+    tree = build_tree(tree_data)
+
+    for subset in itertools.chain.from_iterable(
+        itertools.combinations(sorted(tree_data), size)
+        for size in range(1, len(tree_data) + 1)
+    ):
+        multiproof = create_multiproof(subset, tree)
+        assert verify_multiproof(merkle_drop_contract, subset, multiproof).call()
+
+
+def test_incorrect_multiproof_entitlement(merkle_drop_contract, tree_data, other_data):
+    tree = build_tree(tree_data)
+    items = sorted(tree_data)[1:4]
+    multiproof = create_multiproof(items, tree)
+
+    incorrect_items = [
+        items[::-1],
+        items[:2],
+        [items[0], items[1]._replace(value=items[1].value + 1234), items[2]],
+        [items[0], other_data[0], items[2]],
+    ]
+    for incorrect_item_list in incorrect_items:
+        assert (
+            verify_multiproof(
+                merkle_drop_contract, incorrect_item_list, multiproof
+            ).call()
+            is False
+        )
+
+    incorrect_multiproofs = [
+        multiproof._replace(proof=multiproof.proof[:-1]),
+        multiproof._replace(flags=multiproof.flags[:-1]),
+        multiproof._replace(flags=b"\x03" + multiproof.flags[1:]),
+    ]
+    for incorrect_multiproof in incorrect_multiproofs:
+        assert (
+            verify_multiproof(merkle_drop_contract, items, incorrect_multiproof).call()
+            is False
+        )
+
+
+def test_multiproof_savings(
+    merkle_drop_contract_large_tree, large_tree_data, record_property
+):
+    contract = merkle_drop_contract_large_tree
+    tree = build_tree(large_tree_data)
+    items = large_tree_data[100:150]
+    multiproof = create_multiproof(items, tree)
+    # One transaction with all proofs, so the base cost of a transaction is
+    # only paid once, like in a single call with the multiproof
+    base_gas = 21000
+
+    multiproof_calldata_length = calldata_length(
+        contract,
+        "verifyMultiProof",
+        (
+            [item.address for item in items],
+            [item.value for item in items],
+            multiproof.proof,
+            multiproof.flags,
+        ),
+    )
+    multiproof_gas = verify_multiproof(contract, items, multiproof).estimateGas()
+
+    individual_calldata_length = 0
+    individual_gas = base_gas
+    for item in items:
+        args = (item.address, item.value, create_proof(item, tree))
+        assert contract.functions.verifyEntitled(*args).call()
+        individual_calldata_length += calldata_length(contract, "verifyEntitled", args)
+        individual_gas += contract.functions.verifyEntitled(*args).estimateGas()
+        individual_gas -= base_gas
+
+    record_property("multiproof_calldata_length", multiproof_calldata_length)
+    record_property("individual_proofs_calldata_length", individual_calldata_length)
+    record_property("multiproof_gas", multiproof_gas)
+    record_property("individual_proofs_gas", individual_gas)
+    assert verify_multiproof(contract, items, multiproof).call()
+    assert multiproof_calldata_length < individual_calldata_length / 2
+    assert multiproof_gas < individual_gas
+
+
 def test_withdraw(
     merkle_drop_contract, tree_data, proofs_for_tree_data, dropped_token_contract
 ):
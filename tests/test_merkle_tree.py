@@ -1,3 +1,6 @@
+import itertools
+import math
+
 import pytest
 from eth_utils import keccak
 
@@ -7,9 +10,16 @@ from merkle_drop.merkle_tree import (
     compute_leaf_hash,
     compute_merkle_root,
     compute_parent_hash,
+    compute_root_from_leaf_hashes,
+    create_all_proofs,
+    create_multiproof,
     create_proof,
+    create_proof_at_index,
     in_tree,
+    update_tree,
+    validate_multiproof,
     validate_proof,
+    validate_proofs,
 )
 
 
@@ -66,13 +76,13 @@ def test_invalid_leaf_hash(item):
 def test_in_tree(tree_data):
     tree = build_tree(tree_data)
 
-    assert all(in_tree(item, tree.root) for item in tree_data)
+    assert all(in_tree(item, tree) for item in tree_data)
 
 
 def test_not_in_tree(tree_data, other_data):
     tree = build_tree(tree_data)
 
-    assert not any(in_tree(item, tree.root) for item in other_data)
+    assert not any(in_tree(item, tree) for item in other_data)
 
 
 def test_valid_proof(tree_data):
@@ -80,16 +90,26 @@ def test_valid_proof(tree_data):
     proofs = [create_proof(item, tree) for item in tree_data]
 
     assert all(
-        validate_proof(item, proof, tree.root.hash)
+        validate_proof(item, proof, tree.root_hash)
         for item, proof in zip(tree_data, proofs)
     )
 
 
+@pytest.mark.parametrize("number_of_items", [1, 2, 5, 13, 32])
+def test_create_all_proofs(number_of_items):
+    items = [Item(bytes([i]) * 20, i) for i in range(1, number_of_items + 1)]
+    tree = build_tree(items)
+
+    assert list(create_all_proofs(tree)) == [
+        create_proof_at_index(index, tree) for index in range(len(tree))
+    ]
+
+
 def test_invalid_proof(tree_data):
     tree = build_tree(tree_data)
 
     item = next(iter(tree_data))
-    assert not validate_proof(item, [], tree.root.hash)
+    assert not validate_proof(item, [], tree.root_hash)
 
 
 def test_wrong_proof(tree_data):
@@ -97,7 +117,7 @@ def test_wrong_proof(tree_data):
     proofs = [create_proof(item, tree) for item in tree_data]
 
     item = next(iter(tree_data))
-    assert not validate_proof(item, proofs[4], tree.root.hash)
+    assert not validate_proof(item, proofs[4], tree.root_hash)
 
 
 def test_wrong_value(tree_data, other_data):
@@ -105,7 +125,76 @@ def test_wrong_value(tree_data, other_data):
     proofs = [create_proof(item, tree) for item in tree_data]
 
     item = next(iter(other_data))
-    assert not validate_proof(item, proofs[0], tree.root.hash)
+    assert not validate_proof(item, proofs[0], tree.root_hash)
+
+
+@pytest.mark.parametrize("number_of_items", [1, 2, 5, 17])
+def test_validate_proofs(number_of_items):
+    items = [Item(bytes([i]) * 20, i) for i in range(1, number_of_items + 1)]
+    tree = build_tree(items)
+    items_and_proofs = [(item, create_proof(item, tree)) for item in items]
+    # A wrong value, a proof of another item and a proof out of order
+    items_and_proofs.insert(1, (items[0]._replace(value=0), items_and_proofs[0][1]))
+    items_and_proofs.append((items[0], items_and_proofs[-1][1]))
+    items_and_proofs.append(items_and_proofs[0])
+
+    assert list(validate_proofs(items_and_proofs, tree.root_hash)) == [
+        validate_proof(item, proof, tree.root_hash) for item, proof in items_and_proofs
+    ]
+
+
+@pytest.mark.parametrize("number_of_items", [1, 2, 5, 13])
+def test_validate_multiproof(number_of_items):
+    items = [Item(bytes([i]) * 20, i) for i in range(1, number_of_items + 1)]
+    tree = build_tree(items)
+
+    for subset in itertools.chain.from_iterable(
+        itertools.combinations(items, size) for size in range(1, len(items) + 1)
+    ):
+        multiproof = create_multiproof(reversed(subset), tree)
+        assert validate_multiproof(subset, multiproof, tree.root_hash)
+
+
+def test_multiproof_deduplicates_siblings():
+    items = [Item(i.to_bytes(20, "big"), i) for i in range(1, 1001)]
+    tree = build_tree(items)
+    subset = items[100:150]
+
+    multiproof = create_multiproof(subset, tree)
+
+    assert validate_multiproof(subset, multiproof, tree.root_hash)
+    assert len(multiproof.proof) < 20
+    assert sum(len(create_proof(item, tree)) for item in subset) == 500
+
+
+def test_invalid_multiproof(tree_data, other_data):
+    tree = build_tree(tree_data)
+    subset = tree_data[1:4]
+    multiproof = create_multiproof(subset, tree)
+    root_hash = tree.root_hash
+
+    assert not validate_multiproof(subset[::-1], multiproof, root_hash)
+    assert not validate_multiproof(subset[:2], multiproof, root_hash)
+    assert not validate_multiproof(
+        [subset[0], other_data[0], subset[2]], multiproof, root_hash
+    )
+    assert not validate_multiproof([], multiproof, root_hash)
+    for invalid_multiproof in [
+        multiproof._replace(proof=multiproof.proof[:-1]),
+        multiproof._replace(flags=multiproof.flags[:-1]),
+        multiproof._replace(flags=b"\x03" + multiproof.flags[1:]),
+    ]:
+        assert not validate_multiproof(subset, invalid_multiproof, root_hash)
+
+
+def test_can_not_create_multiproof_for_missing_item(tree_data, other_data):
+    tree = build_tree(tree_data)
+    with pytest.raises(ValueError):
+        create_multiproof([tree_data[0], other_data[0]], tree)
+    with pytest.raises(ValueError):
+        create_multiproof([tree_data[0], tree_data[0]], tree)
+    with pytest.raises(ValueError):
+        create_multiproof([], tree)
 
 
 def test_can_not_create_proof_for_missing_item(tree_data, other_data):
@@ -122,3 +211,155 @@ def test_tree_is_sorted(tree_data):
     reversed_root = compute_merkle_root(reversed_tree_data)
 
     assert reversed_root == root
+
+
+@pytest.mark.parametrize("number_of_items", [1, 2, 3, 4, 5, 6, 7, 8, 9, 17, 33])
+def test_tree_levels(number_of_items):
+    items = [Item(bytes([i + 1]) * 20, i) for i in range(number_of_items)]
+    tree = build_tree(items)
+
+    assert len(tree) == number_of_items
+    assert len(tree.levels[-1]) == 32
+    assert all(
+        len(level) == 32 * math.ceil(number_of_items / 2 ** i)
+        for i, level in enumerate(tree.levels)
+    )
+    assert all(
+        validate_proof(item, create_proof(item, tree), tree.root_hash) for item in items
+    )
+
+
+def test_odd_node_is_promoted(tree_data):
+    tree = build_tree(tree_data)
+    leaf_hashes = [compute_leaf_hash(item) for item in sorted(tree_data)]
+
+    first_parent = compute_parent_hash(
+        compute_parent_hash(leaf_hashes[0], leaf_hashes[1]),
+        compute_parent_hash(leaf_hashes[2], leaf_hashes[3]),
+    )
+    assert tree.root_hash == compute_parent_hash(first_parent, leaf_hashes[4])
+    assert create_proof(tree_data[4], tree) == [first_parent]
+
+
+def test_can_not_build_empty_tree():
+    with pytest.raises(ValueError):
+        build_tree([])
+
+
+def test_find_leaf(tree_data, other_data):
+    tree = build_tree(list(reversed(tree_data)))
+
+    assert [tree.find_leaf(item) for item in tree_data] == [0, 1, 2, 3, 4]
+    assert all(tree.find_leaf(item) is None for item in other_data)
+
+
+def test_find_leaf_with_wrong_value(tree_data):
+    tree = build_tree(tree_data)
+    address, value = tree_data[2]
+
+    assert tree.find_address(address) == 2
+    assert tree.find_leaf(Item(address, value + 1)) is None
+
+
+def test_proof_for_items_with_same_address():
+    items = [Item(b"\xaa" * 20, 1), Item(b"\xaa" * 20, 2), Item(b"\xbb" * 20, 3)]
+    tree = build_tree(items)
+
+    assert all(
+        validate_proof(item, create_proof(item, tree), tree.root_hash) for item in items
+    )
+
+
+@pytest.mark.parametrize("number_of_items", [2, 3, 5, 8, 9, 31, 33])
+@pytest.mark.parametrize("workers", [2, 3, 4])
+def test_parallel_build_tree(number_of_items, workers):
+    items = [Item(bytes([i + 1]) * 20, i) for i in range(number_of_items)]
+
+    tree = build_tree(items)
+    parallel_tree = build_tree(items, workers=workers)
+
+    assert parallel_tree.levels == tree.levels
+    assert parallel_tree.addresses == tree.addresses
+
+
+@pytest.mark.parametrize(
+    "items",
+    (
+        [Item(b"\xaa" * 19, 1)],
+        [Item(b"\xaa" * 19, 1), Item(b"\xbb" * 21, 1)],
+        [Item("a" * 20, 1)],  # type: ignore
+        [Item(b"\xcc" * 20, -1)],
+        [Item(b"\xcc" * 20, 2 ** 256)],
+    ),
+)
+def test_can_not_build_tree_with_invalid_items(items):
+    with pytest.raises(ValueError):
+        build_tree(items)
+
+
+@pytest.mark.parametrize(
+    "changes",
+    (
+        {},
+        {b"\xcc" * 20: 30},
+        {b"\xaa" * 20: 10, b"\xee" * 20: 50},
+        {b"\x00" * 20: 0},
+        {b"\xc0" * 20: 6},
+        {b"\xff" * 20: 6},
+        {b"\xaa" * 20: None},
+        {b"\xcc" * 20: None},
+        {b"\xee" * 20: None},
+        {b"\xbb" * 20: None, b"\xc0" * 20: 6, b"\xdd" * 20: 40},
+        {bytes([i]) * 20: i for i in range(1, 10)},
+        {
+            b"\xaa" * 20: None,
+            b"\xbb" * 20: None,
+            b"\xcc" * 20: None,
+            b"\xdd" * 20: None,
+        },
+    ),
+)
+def test_update_tree(tree_data, changes):
+    tree = build_tree(tree_data)
+    updated_data = {**dict(tree_data), **changes}
+    expected_tree = build_tree(
+        [
+            Item(address, value)
+            for address, value in updated_data.items()
+            if value is not None
+        ]
+    )
+
+    updated_tree = update_tree(tree, changes)
+
+    assert updated_tree.levels == expected_tree.levels
+    assert updated_tree.addresses == expected_tree.addresses
+
+
+@pytest.mark.parametrize(
+    "changes",
+    (
+        {b"\x00" * 20: None},
+        {b"\xaa" * 19: 1},
+        {b"\xaa" * 20: -1},
+        {bytes([byte]) * 20: None for byte in b"\xaa\xbb\xcc\xdd\xee"},
+    ),
+)
+def test_can_not_update_tree_with_invalid_changes(tree_data, changes):
+    with pytest.raises(ValueError):
+        update_tree(build_tree(tree_data), changes)
+
+
+@pytest.mark.parametrize("number_of_items", range(1, 70))
+def test_compute_root_from_leaf_hashes(number_of_items):
+    items = [Item(bytes([i + 1]) * 20, i) for i in range(number_of_items)]
+    tree = build_tree(items)
+
+    leaf_hashes = (tree.get_hash(0, index) for index in range(len(tree)))
+
+    assert compute_root_from_leaf_hashes(leaf_hashes) == tree.root_hash
+
+
+def test_compute_root_without_leaves():
+    with pytest.raises(ValueError):
+        compute_root_from_leaf_hashes(iter([]))
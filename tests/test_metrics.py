@@ -0,0 +1,125 @@
+import asyncio
+import json
+
+import pytest
+from eth_utils import to_checksum_address
+
+from merkle_drop import asgi, metrics, server
+from merkle_drop.airdrop import AirdropData, build_airdrop_tree
+from merkle_drop.entitlement import EntitlementCache, EntitlementState
+
+prometheus_client = pytest.importorskip("prometheus_client")
+
+
+@pytest.fixture(autouse=True)
+def state(monkeypatch):
+    airdrop_data = AirdropData.from_mapping({b"\x01" * 20: 1000, b"\x02" * 20: 2000})
+    state = EntitlementState(
+        airdrop_data,
+        build_airdrop_tree(airdrop_data),
+        decay_start_time=2 ** 40,
+        decay_duration_in_seconds=100,
+        entitlement_cache=EntitlementCache(10),
+    )
+    monkeypatch.setattr(server, "state", state)
+    monkeypatch.setattr(asgi, "cors_origins", [])
+    return state
+
+
+def get_sample_value(name, labels=None):
+    return prometheus_client.REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_flask_request_metrics():
+    client = server.app.test_client()
+    labels = {"endpoint": "get_entitlement_for", "status": "200"}
+    requests = get_sample_value("merkle_drop_requests_total", labels)
+    proofs = get_sample_value("merkle_drop_proof_duration_seconds_count")
+
+    address = to_checksum_address(b"\x01" * 20)
+    assert client.get(f"/entitlement/{address}").status_code == 200
+    assert client.get("/entitlement/0xinvalid").status_code == 400
+
+    assert get_sample_value("merkle_drop_requests_total", labels) == requests + 1
+    assert (
+        get_sample_value(
+            "merkle_drop_request_duration_seconds_count",
+            {"endpoint": "get_entitlement_for"},
+        )
+        > 0
+    )
+    assert get_sample_value("merkle_drop_proof_duration_seconds_count") == proofs + 1
+    assert get_sample_value("merkle_drop_entitlement_cache_misses") == 1
+
+
+def test_flask_batch_metrics():
+    client = server.app.test_client()
+    proofs = get_sample_value("merkle_drop_proof_duration_seconds_count")
+    addresses = [to_checksum_address(b"\x01" * 20), to_checksum_address(b"\x02" * 20)]
+
+    response = client.post("/entitlements", json=addresses)
+
+    assert response.status_code == 200
+    assert len(response.get_json()) == 2
+    assert get_sample_value("merkle_drop_proof_duration_seconds_count") == proofs + 2
+    # Observed after the streamed response, not before the lookups
+    assert get_sample_value("merkle_drop_entitlement_cache_misses") == 2
+
+
+def test_flask_metrics_endpoint(state):
+    metrics.observe_state(state, 1.5)
+
+    response = server.app.test_client().get("/metrics")
+
+    assert response.status_code == 200
+    assert response.content_type == prometheus_client.CONTENT_TYPE_LATEST
+    assert b"merkle_drop_tree_entries 2.0" in response.data
+    assert b"merkle_drop_tree_depth 1.0" in response.data
+    assert b"merkle_drop_load_duration_seconds 1.5" in response.data
+
+
+def test_asgi_metrics():
+    labels = {"endpoint": "get_entitlements_for", "status": "200"}
+    requests = get_sample_value("merkle_drop_requests_total", labels)
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"[]", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    for method, path in [("POST", "/entitlements"), ("GET", "/metrics")]:
+        scope = {"type": "http", "method": method, "path": path, "headers": []}
+        asyncio.run(asgi.app(scope, receive, send))
+
+    assert get_sample_value("merkle_drop_requests_total", labels) == requests + 1
+    start, body = messages[-2:]
+    assert start["status"] == 200
+    assert b"merkle_drop_requests_total" in body["body"]
+
+
+def test_asgi_batch_metrics():
+    proofs = get_sample_value("merkle_drop_proof_duration_seconds_count")
+    body = json.dumps([to_checksum_address(b"\x02" * 20)]).encode()
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "POST", "path": "/entitlements", "headers": []}
+    asyncio.run(asgi.app(scope, receive, send))
+
+    assert get_sample_value("merkle_drop_proof_duration_seconds_count") == proofs + 1
+    assert get_sample_value("merkle_drop_entitlement_cache_misses") == 1
+
+
+def test_multiprocess_metrics(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+
+    body, content_type = metrics.generate_metrics()
+
+    # No process wrote metrics into the directory yet
+    assert body == b""
@@ -0,0 +1,151 @@
+import os
+
+import pytest
+from eth_utils import to_checksum_address
+
+import merkle_drop.out_of_core
+from merkle_drop.load_csv import AirdropFileError
+from merkle_drop.merkle_tree import build_tree
+from merkle_drop.out_of_core import MANIFEST_FILE_NAME, build_snapshot_out_of_core
+from merkle_drop.snapshot import load_snapshot
+
+from .helpers import create_items, write_airdrop_file
+
+
+@pytest.fixture
+def tree_data():
+    # Not sorted by address
+    return create_items(39)[::-1]
+
+
+@pytest.fixture
+def airdrop_file(tmp_path, tree_data):
+    return write_airdrop_file(tmp_path / "airdrop.csv", tree_data)
+
+
+@pytest.fixture
+def work_directory(tmp_path):
+    return str(tmp_path / "work")
+
+
+def build(airdrop_file, tmp_path, work_directory, memory_budget):
+    snapshot_file = str(tmp_path / "airdrop.snapshot")
+    root_hash = build_snapshot_out_of_core(
+        str(airdrop_file), snapshot_file, work_directory, 123, 456, memory_budget
+    )
+    return root_hash, load_snapshot(snapshot_file)
+
+
+# The smaller budgets split the file into runs and the levels into blocks
+@pytest.mark.parametrize("memory_budget", [128, 1000, 10 ** 6])
+def test_out_of_core_build(
+    airdrop_file, tmp_path, work_directory, tree_data, memory_budget
+):
+    root_hash, snapshot = build(airdrop_file, tmp_path, work_directory, memory_budget)
+    tree = build_tree(tree_data)
+
+    assert root_hash == tree.root_hash
+    assert snapshot.airdrop_data == dict(tree_data)
+    assert list(snapshot.tree.levels) == tree.levels
+    assert snapshot.decay_start_time == 123
+    assert snapshot.decay_duration_in_seconds == 456
+    assert os.listdir(work_directory) == []
+
+
+def interrupt_build(airdrop_file, tmp_path, work_directory, monkeypatch):
+    hash_parents = merkle_drop.out_of_core.hash_parents
+    calls = []
+
+    def interrupted_hash_parents(level):
+        calls.append(level)
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        return hash_parents(level)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(merkle_drop.out_of_core, "hash_parents", interrupted_hash_parents)
+        with pytest.raises(KeyboardInterrupt):
+            build(airdrop_file, tmp_path, work_directory, 10 ** 6)
+
+    assert MANIFEST_FILE_NAME in os.listdir(work_directory)
+
+
+def test_resume_interrupted_build(
+    airdrop_file, tmp_path, work_directory, tree_data, monkeypatch
+):
+    interrupt_build(airdrop_file, tmp_path, work_directory, monkeypatch)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("The sorted runs should be reused")
+
+    monkeypatch.setattr(merkle_drop.out_of_core, "_sort_into_runs", fail)
+    monkeypatch.setattr(merkle_drop.out_of_core, "_merge_runs", fail)
+    root_hash, snapshot = build(airdrop_file, tmp_path, work_directory, 10 ** 6)
+
+    assert root_hash == build_tree(tree_data).root_hash
+    assert snapshot.airdrop_data == dict(tree_data)
+
+
+def test_changed_file_is_built_from_scratch(
+    airdrop_file, tmp_path, work_directory, tree_data, monkeypatch
+):
+    interrupt_build(airdrop_file, tmp_path, work_directory, monkeypatch)
+
+    write_airdrop_file(airdrop_file, tree_data[:-1])
+    os.utime(airdrop_file, ns=(0, 0))
+    root_hash, snapshot = build(airdrop_file, tmp_path, work_directory, 10 ** 6)
+
+    assert root_hash == build_tree(tree_data[:-1]).root_hash
+    assert snapshot.airdrop_data == dict(tree_data[:-1])
+
+
+def test_out_of_core_build_reports_invalid_lines(tmp_path, work_directory, tree_data):
+    airdrop_file = tmp_path / "airdrop.csv"
+    write_airdrop_file(airdrop_file, tree_data)
+    address = to_checksum_address(b"\x01" * 20)
+    with open(airdrop_file, "a") as file:
+        file.write("0xinvalid,1\n")
+        file.write(f"{address},{2 ** 256}\n")
+
+    with pytest.raises(AirdropFileError) as exception_info:
+        build(airdrop_file, tmp_path, work_directory, 128)
+
+    errors = exception_info.value.errors
+    assert len(errors) == 2
+    assert f"line {len(tree_data) + 1}" in errors[0]
+    assert f"line {len(tree_data) + 2}" in errors[1]
+
+
+@pytest.mark.parametrize("memory_budget", [128, 10 ** 6])
+def test_out_of_core_build_reports_invalid_lines_and_duplicates(
+    tmp_path, work_directory, tree_data, memory_budget
+):
+    airdrop_file = tmp_path / "airdrop.csv"
+    write_airdrop_file(airdrop_file, tree_data[:1] + tree_data)
+    with open(airdrop_file, "a") as file:
+        file.write("0xinvalid,1\n")
+
+    with pytest.raises(AirdropFileError) as exception_info:
+        build(airdrop_file, tmp_path, work_directory, memory_budget)
+
+    errors = exception_info.value.errors
+    assert len(errors) == 2
+    assert "multiple times in line 2" in errors[0]
+    assert f"line {len(tree_data) + 2}" in errors[1]
+
+    # A new attempt reports the same errors
+    with pytest.raises(AirdropFileError) as exception_info:
+        build(airdrop_file, tmp_path, work_directory, memory_budget)
+    assert exception_info.value.errors == errors
+
+
+def test_out_of_core_build_reports_duplicates(tmp_path, work_directory, tree_data):
+    airdrop_file = tmp_path / "airdrop.csv"
+    write_airdrop_file(airdrop_file, tree_data + tree_data[:2])
+
+    with pytest.raises(AirdropFileError) as exception_info:
+        build(airdrop_file, tmp_path, work_directory, 128)
+
+    errors = exception_info.value.errors
+    assert len(errors) == 2
+    assert f"line {len(tree_data) + 1}" in errors[0]
@@ -0,0 +1,139 @@
+import os
+import signal
+
+import pytest
+
+from merkle_drop import server
+from merkle_drop.airdrop import AirdropData, build_airdrop_tree
+from merkle_drop.cache import BuildCache
+from merkle_drop.entitlement import precompute_entitlements
+from merkle_drop.snapshot import write_snapshot
+
+from .helpers import create_items, write_airdrop_file
+
+
+@pytest.fixture(autouse=True)
+def reset_state(monkeypatch):
+    monkeypatch.setattr(server, "state", None)
+    monkeypatch.setattr(server, "_state_loader", None)
+
+
+def write_airdrop_snapshot(file_name, airdrop):
+    airdrop_data = AirdropData.from_mapping(airdrop)
+    write_snapshot(file_name, airdrop_data, build_airdrop_tree(airdrop_data), 0, 100)
+
+
+def reload():
+    thread = server.reload_in_background()
+    assert thread is not None
+    thread.join()
+
+
+@pytest.mark.parametrize("use_build_cache", [False, True])
+def test_reload_airdrop_file(tmp_path, use_build_cache):
+    airdrop_file = tmp_path / "airdrop.csv"
+    write_airdrop_file(airdrop_file, {b"\x01" * 20: 1000}.items())
+    build_cache = BuildCache(str(tmp_path / "cache")) if use_build_cache else None
+    server.init(str(airdrop_file), 0, 100, build_cache=build_cache, cache_size=10)
+    previous_state = server.state
+
+    write_airdrop_file(airdrop_file, {b"\x01" * 20: 1000, b"\x02" * 20: 2000}.items())
+    reload()
+
+    assert previous_state.airdrop_data == {b"\x01" * 20: 1000}
+    assert server.state.airdrop_data == {b"\x01" * 20: 1000, b"\x02" * 20: 2000}
+    assert server.state.tree.root_hash != previous_state.tree.root_hash
+    assert server.state.entitlement_cache is not previous_state.entitlement_cache
+
+
+def test_reload_snapshot(tmp_path):
+    snapshot_file = str(tmp_path / "airdrop.snapshot")
+    write_airdrop_snapshot(snapshot_file, {b"\x01" * 20: 1000})
+    server.init_from_snapshot(snapshot_file)
+    previous_state = server.state
+
+    # Replace the file like a deployment would, the old one stays mapped
+    new_snapshot_file = str(tmp_path / "new.snapshot")
+    write_airdrop_snapshot(new_snapshot_file, {b"\x02" * 20: 2000})
+    os.replace(new_snapshot_file, snapshot_file)
+    reload()
+
+    assert previous_state.airdrop_data == {b"\x01" * 20: 1000}
+    assert server.state.airdrop_data == {b"\x02" * 20: 2000}
+
+
+@pytest.mark.parametrize("use_build_cache", [False, True])
+def test_reload_airdrop_file_with_precompute(tmp_path, use_build_cache, monkeypatch):
+    # Unpickle the precomputed entitlements in more than one chunk
+    monkeypatch.setattr(server, "_PRECOMPUTED_CHUNK_SIZE", 1)
+    airdrop_file = tmp_path / "airdrop.csv"
+    write_airdrop_file(airdrop_file, {b"\x01" * 20: 1000}.items())
+    build_cache = BuildCache(str(tmp_path / "cache")) if use_build_cache else None
+    server.init(str(airdrop_file), 0, 100, build_cache=build_cache, precompute=True)
+
+    write_airdrop_file(airdrop_file, create_items(3))
+    reload()
+
+    assert server.state.airdrop_data == dict(create_items(3))
+    assert server.state.precomputed_entitlements == precompute_entitlements(
+        server.state.airdrop_data, server.state.tree
+    )
+
+
+def test_reload_snapshot_with_precompute(tmp_path):
+    snapshot_file = str(tmp_path / "airdrop.snapshot")
+    write_airdrop_snapshot(snapshot_file, {b"\x01" * 20: 1000})
+    server.init_from_snapshot(snapshot_file, precompute=True)
+
+    new_snapshot_file = str(tmp_path / "new.snapshot")
+    write_airdrop_snapshot(new_snapshot_file, dict(create_items(3)))
+    os.replace(new_snapshot_file, snapshot_file)
+    reload()
+
+    assert server.state.airdrop_data == dict(create_items(3))
+    assert server.state.precomputed_entitlements == precompute_entitlements(
+        server.state.airdrop_data, server.state.tree
+    )
+
+
+def test_failed_reload_keeps_state(tmp_path):
+    airdrop_file = tmp_path / "airdrop.csv"
+    write_airdrop_file(airdrop_file, {b"\x01" * 20: 1000}.items())
+    server.init(str(airdrop_file), 0, 100)
+    previous_state = server.state
+
+    airdrop_file.write_text("0xinvalid,1\n")
+    reload()
+
+    assert server.state is previous_state
+    # The lock is released again
+    write_airdrop_file(airdrop_file, {b"\x02" * 20: 2000}.items())
+    reload()
+    assert server.state.airdrop_data == {b"\x02" * 20: 2000}
+
+
+def test_no_concurrent_reloads(tmp_path):
+    snapshot_file = str(tmp_path / "airdrop.snapshot")
+    write_airdrop_snapshot(snapshot_file, {b"\x01" * 20: 1000})
+    server.init_from_snapshot(snapshot_file)
+
+    with server._reload_lock:
+        assert server.reload_in_background() is None
+
+
+def test_reload_uninitialized_server():
+    with pytest.raises(RuntimeError):
+        server.reload_in_background()
+
+
+def test_reload_signal_handler(tmp_path, monkeypatch):
+    reloads = []
+    monkeypatch.setattr(server, "reload_in_background", lambda: reloads.append(1))
+    previous_handler = signal.getsignal(signal.SIGHUP)
+    try:
+        server.install_reload_signal_handler()
+        os.kill(os.getpid(), signal.SIGHUP)
+    finally:
+        signal.signal(signal.SIGHUP, previous_handler)
+
+    assert reloads == [1]
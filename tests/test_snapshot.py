@@ -0,0 +1,81 @@
+import pytest
+
+from merkle_drop.airdrop import AirdropData
+from merkle_drop.merkle_tree import build_tree, create_proof
+from merkle_drop.snapshot import level_lengths, load_snapshot, write_snapshot
+
+from .helpers import create_items
+
+
+@pytest.fixture
+def tree_data():
+    return create_items()
+
+
+@pytest.fixture
+def snapshot_file(tmp_path, tree_data):
+    file_path = tmp_path / "airdrop.snapshot"
+    write_snapshot(
+        str(file_path),
+        AirdropData.from_mapping(dict(tree_data)),
+        build_tree(tree_data),
+        decay_start_time=1_600_000_000,
+        decay_duration_in_seconds=1000,
+    )
+    return file_path
+
+
+@pytest.mark.parametrize(
+    ("number_of_entries", "lengths"),
+    [(1, [1]), (2, [2, 1]), (5, [5, 3, 2, 1]), (8, [8, 4, 2, 1])],
+)
+def test_level_lengths(number_of_entries, lengths):
+    assert level_lengths(number_of_entries) == lengths
+
+
+def test_write_snapshot_with_mismatching_tree(tmp_path, tree_data):
+    with pytest.raises(ValueError):
+        write_snapshot(
+            str(tmp_path / "airdrop.snapshot"),
+            AirdropData.from_mapping(dict(tree_data)),
+            build_tree(tree_data[:-1]),
+            decay_start_time=0,
+            decay_duration_in_seconds=0,
+        )
+
+
+def test_load_snapshot(snapshot_file, tree_data):
+    snapshot = load_snapshot(str(snapshot_file))
+    tree = build_tree(tree_data)
+
+    assert snapshot.decay_start_time == 1_600_000_000
+    assert snapshot.decay_duration_in_seconds == 1000
+    assert snapshot.airdrop_data == dict(tree_data)
+    assert snapshot.tree.root_hash == tree.root_hash
+    assert all(
+        create_proof(item, snapshot.tree) == create_proof(item, tree)
+        for item in tree_data
+    )
+
+
+def test_get_missing_address_from_snapshot(snapshot_file):
+    snapshot = load_snapshot(str(snapshot_file))
+
+    assert snapshot.airdrop_data.get(b"\xff" * 20, 0) == 0
+    assert snapshot.tree.find_address(b"\xff" * 20) is None
+
+
+def test_load_snapshot_wrong_magic(snapshot_file):
+    content = snapshot_file.read_bytes()
+    snapshot_file.write_bytes(b"NOTADROP" + content[8:])
+
+    with pytest.raises(ValueError):
+        load_snapshot(str(snapshot_file))
+
+
+def test_load_truncated_snapshot(snapshot_file):
+    content = snapshot_file.read_bytes()
+    snapshot_file.write_bytes(content[:-1])
+
+    with pytest.raises(ValueError):
+        load_snapshot(str(snapshot_file))
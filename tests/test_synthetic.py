@@ -0,0 +1,67 @@
+import pytest
+
+from merkle_drop.load_csv import load_airdrop_file
+from merkle_drop.synthetic import (
+    SyntheticAirdrop,
+    generate_synthetic_airdrop_data,
+    synthetic_item,
+    write_synthetic_airdrop_file,
+)
+
+
+@pytest.fixture
+def airdrop():
+    return SyntheticAirdrop(250, seed=7, min_value=10, max_value=1000)
+
+
+def expected_airdrop_data(airdrop):
+    return dict(
+        synthetic_item(airdrop, index) for index in range(airdrop.number_of_entries)
+    )
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".csv.gz", ".csv.xz"])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_write_synthetic_airdrop_file(tmp_path, airdrop, suffix, workers):
+    file_name = str(tmp_path / f"airdrop{suffix}")
+    write_synthetic_airdrop_file(file_name, airdrop, workers, chunk_size=64)
+
+    assert load_airdrop_file(file_name) == expected_airdrop_data(airdrop)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_generate_synthetic_airdrop_data(airdrop, workers):
+    airdrop_data = generate_synthetic_airdrop_data(airdrop, workers, chunk_size=64)
+
+    assert airdrop_data == expected_airdrop_data(airdrop)
+    assert list(airdrop_data) == sorted(airdrop_data)
+
+
+def test_synthetic_airdrop_is_deterministic(airdrop):
+    assert synthetic_item(airdrop, 3) == synthetic_item(airdrop, 3)
+    assert synthetic_item(airdrop, 3) != synthetic_item(airdrop._replace(seed=8), 3)
+
+
+@pytest.mark.parametrize("distribution", ["uniform", "log-uniform", "constant"])
+def test_synthetic_values_in_range(airdrop, distribution):
+    values = expected_airdrop_data(airdrop._replace(distribution=distribution)).values()
+
+    assert all(10 <= value <= 1000 for value in values)
+    if distribution == "constant":
+        assert set(values) == {1000}
+    else:
+        assert len(set(values)) > 100
+
+
+@pytest.mark.parametrize(
+    "invalid_airdrop",
+    [
+        SyntheticAirdrop(0),
+        SyntheticAirdrop(10, distribution="normal"),
+        SyntheticAirdrop(10, min_value=2, max_value=1),
+        SyntheticAirdrop(10, distribution="log-uniform", min_value=0),
+    ],
+)
+def test_invalid_synthetic_airdrop(tmp_path, invalid_airdrop):
+    with pytest.raises(ValueError):
+        write_synthetic_airdrop_file(str(tmp_path / "airdrop.csv"), invalid_airdrop)
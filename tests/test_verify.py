@@ -0,0 +1,109 @@
+import json
+
+import pytest
+from eth_utils import encode_hex, to_checksum_address
+
+from merkle_drop.airdrop import AirdropData
+from merkle_drop.merkle_tree import build_tree, create_proof
+from merkle_drop.verify import verify_proofs_file
+
+from .helpers import create_items
+
+
+@pytest.fixture
+def items():
+    return create_items(49)
+
+
+@pytest.fixture
+def root_hash(items):
+    return build_tree(items).root_hash
+
+
+@pytest.fixture
+def proof_entries(items):
+    tree = build_tree(items)
+    entries = [
+        {
+            "address": to_checksum_address(item.address),
+            "value": str(item.value),
+            "proof": [encode_hex(hash_) for hash_ in create_proof(item, tree)],
+        }
+        for item in items
+    ]
+    entries.append(
+        {"address": to_checksum_address(b"\xff" * 20), "value": "0", "proof": []}
+    )
+    return entries
+
+
+def write_proofs_file(tmp_path, lines):
+    proofs_file = tmp_path / "proofs.jsonl"
+    proofs_file.write_text("".join(line + "\n" for line in lines))
+    return str(proofs_file)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_verify_proofs_file(tmp_path, proof_entries, root_hash, workers):
+    proofs_file = write_proofs_file(
+        tmp_path, [json.dumps(entry) for entry in proof_entries]
+    )
+
+    verification = verify_proofs_file(proofs_file, root_hash, workers)
+
+    assert verification.number_of_proofs == 49
+    assert verification.entries_without_proof == [
+        (50, to_checksum_address(b"\xff" * 20))
+    ]
+    assert verification.errors == []
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_verify_proofs_file_reports_errors(tmp_path, proof_entries, root_hash, workers):
+    proof_entries[3]["value"] = "1"
+    proof_entries[40]["proof"] = proof_entries[41]["proof"]
+    lines = [json.dumps(entry) for entry in proof_entries]
+    lines[10] = lines[10].lower()
+    lines[20] = "not json"
+    lines.insert(30, "")
+    proofs_file = write_proofs_file(tmp_path, lines)
+
+    verification = verify_proofs_file(proofs_file, root_hash, workers)
+
+    assert verification.number_of_proofs == 47
+    assert verification.errors == [
+        f"The proof of {proof_entries[3]['address']} does not match the root in line 4",
+        "Invalid proof entry in line 11",
+        "Invalid proof entry in line 21",
+        f"The proof of {proof_entries[40]['address']} does not match the root "
+        "in line 42",
+    ]
+
+
+def test_verify_proofs_file_with_wrong_root(tmp_path, proof_entries):
+    proofs_file = write_proofs_file(
+        tmp_path, [json.dumps(entry) for entry in proof_entries]
+    )
+
+    verification = verify_proofs_file(proofs_file, b"\x00" * 32)
+
+    assert len(verification.errors) == 49
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_verify_proofs_file_reports_eligible_addresses_without_proof(
+    tmp_path, items, proof_entries, root_hash, workers
+):
+    proof_entries[5].update(value="0", proof=[])
+    proofs_file = write_proofs_file(
+        tmp_path, [json.dumps(entry) for entry in proof_entries]
+    )
+    airdrop_data = AirdropData.from_mapping(dict(items))
+
+    verification = verify_proofs_file(proofs_file, root_hash, workers, airdrop_data)
+
+    assert len(verification.entries_without_proof) == 2
+    assert verification.errors == [
+        f"The eligible address {proof_entries[5]['address']} has no proof in line 6"
+    ]
+    assert verify_proofs_file(proofs_file, root_hash, workers).errors == []